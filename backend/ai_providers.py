@@ -1,7 +1,11 @@
 from typing import List, Dict, Any
 import os
+import time
 import httpx
 
+from backend.core import metrics
+from backend.core.logging import span
+
 class AIProviderError(Exception):
     pass
 
@@ -72,7 +76,7 @@ def call_anthropic(messages: List[Dict[str, str]], tools: List[Dict[str, Any]] |
         raise AIProviderError(f"anthropic {e.response.status_code if e.response else ''}: {body[:500]}")
 
 
-def call_llm(provider: str, model: str, messages: List[Dict[str, str]], functions: List[Dict[str, Any]] | None = None):
+def _dispatch(provider: str, model: str, messages: List[Dict[str, str]], functions: List[Dict[str, Any]] | None):
     if provider == "openai":
         return call_openai(messages, functions, model)
     if provider == "groq":
@@ -80,3 +84,28 @@ def call_llm(provider: str, model: str, messages: List[Dict[str, str]], function
     if provider == "anthropic":
         return call_anthropic(messages, functions, model)
     raise AIProviderError(f"Unknown provider {provider}")
+
+
+def _count_tokens(provider: str, model: str, resp: Dict[str, Any]) -> None:
+    usage = resp.get("usage") or {}
+    # OpenAI-compatible APIs report prompt/completion tokens, Anthropic input/output tokens
+    for kind, keys in (("prompt", ("prompt_tokens", "input_tokens")), ("completion", ("completion_tokens", "output_tokens"))):
+        n = next((usage[k] for k in keys if isinstance(usage.get(k), int)), 0)
+        if n:
+            metrics.llm_tokens.inc(n, provider=provider, model=model, kind=kind)
+
+
+def call_llm(provider: str, model: str, messages: List[Dict[str, str]], functions: List[Dict[str, Any]] | None = None):
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        with span(f"llm {provider}"):
+            resp = _dispatch(provider, model, messages, functions)
+        outcome = "ok"
+    finally:
+        metrics.llm_requests.observe(time.perf_counter() - started, provider=provider, model=model, outcome=outcome)
+        if outcome == "error":
+            metrics.llm_errors.inc(provider=provider, model=model)
+    if isinstance(resp, dict):
+        _count_tokens(provider, model, resp)
+    return resp
@@ -1,8 +1,10 @@
 import logging
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 
 from backend.api.deps import get_ai_service
+from backend.core.fileio import executor as io_pool
 from backend.models.ai import ChatRequest, ChatResponse
 from backend.services.ai_service import AIService
 from backend.ai_providers import AIProviderError
@@ -21,14 +23,15 @@ async def ai_chat(req: ChatRequest, svc: AIService = Depends(get_ai_service)):
         if req.messages:
             last = req.messages[-1]
             if last.get("role") == "user":
-                history.append("user", last.get("content", ""), session=req.session)
+                await io_pool.run("history", history.append, "user", last.get("content", ""), session=req.session)
 
-        result = svc.chat(req)
+        # provider calls and tools block; keep them off the event loop
+        result = await run_in_threadpool(svc.chat, req)
 
         # Persist assistant reply
         assistant_text = result.get("assistant", "")
         if assistant_text:
-            history.append("assistant", assistant_text, session=req.session)
+            await io_pool.run("history", history.append, "assistant", assistant_text, session=req.session)
 
         return result
     except AIProviderError as e:
@@ -39,20 +42,20 @@ async def ai_chat(req: ChatRequest, svc: AIService = Depends(get_ai_service)):
 @router.get("/api/ai/history")
 async def ai_history(limit: int | None = None, session: str | None = None):
     history = ChatHistoryService()
-    return {"messages": history.load(session=session, limit=limit)}
+    return {"messages": await io_pool.run("history", history.load, session=session, limit=limit)}
 
 
 @router.post("/api/ai/history/clear")
 async def ai_history_clear(session: str | None = None):
     history = ChatHistoryService()
-    history.clear(session=session)
+    await io_pool.run("history", history.clear, session=session)
     return {"success": True}
 
 
 @router.get("/api/ai/history/sessions")
 async def ai_history_sessions():
     history = ChatHistoryService()
-    return {"sessions": history.list_sessions()}
+    return {"sessions": await io_pool.run("history", history.list_sessions)}
 
 
 @router.post("/api/ai/history/sessions")
@@ -61,7 +64,7 @@ async def ai_history_create_session(data: dict):
     if not name:
         raise HTTPException(status_code=400, detail="Missing session name")
     history = ChatHistoryService()
-    history.create_session(name)
+    await io_pool.run("history", history.create_session, name)
     return {"success": True}
 
 
@@ -70,7 +73,7 @@ async def ai_history_delete_session(name: str):
     if not name:
         raise HTTPException(status_code=400, detail="Missing session name")
     history = ChatHistoryService()
-    history.delete_session(name)
+    await io_pool.run("history", history.delete_session, name)
     return {"success": True}
 
 
@@ -0,0 +1,240 @@
+"""`POST /api/batch`: many file operations in one round trip.
+
+Operations run in order. Runs of consecutive reads are independent of each
+other and execute concurrently; a mutation only starts once everything
+before it has finished. `mode` decides what a failure does:
+
+* `continue` (default): every operation runs, each reports its own result;
+* `stopOnError`: operations after the first failure are skipped;
+* `transaction`: like `stopOnError`, and the mutations already applied are
+  undone (replaced files come back from hardlinked backups), so the batch
+  applies completely or not at all. Other writers are not locked out meanwhile.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from fastapi import APIRouter, Body, HTTPException, Request
+
+from backend.api.deps import get_abs_path, get_root_dir, is_text_file, require_auth
+from backend.api.files import MAX_READ_LINES, save_text
+from backend.core import fileio
+from backend.core.file_responses import file_etag
+from backend.core.settings import settings
+
+logger = logging.getLogger("backend")
+
+router = APIRouter()
+
+MAX_OPS = 500
+_MODES = ("continue", "stopOnError", "transaction")
+
+
+class _Journal:
+    """Undo log of a transactional batch."""
+
+    def __init__(self, root: Path):
+        self.backup_dir = root / f".batch-{uuid.uuid4().hex[:8]}"
+        self.undo: List[Callable[[], None]] = []
+
+    def keep(self, path: str) -> None:
+        """Remember `path`'s current content (or its absence) before it changes."""
+        if os.path.isfile(path):
+            self.backup_dir.mkdir(exist_ok=True)
+            backup = str(self.backup_dir / str(len(self.undo)))
+            # writes replace the inode, so a hardlink keeps the old content
+            fileio.clone_file(path, backup, "hardlink")
+            self.undo.append(lambda: os.replace(backup, path))
+        elif not os.path.lexists(path):
+            self.undo.append(lambda: os.path.lexists(path) and os.remove(path))
+
+    def renamed(self, src: str, dst: str) -> None:
+        self.undo.append(lambda: os.rename(dst, src))
+
+    def made_dirs(self, dirs: List[str]) -> None:
+        self.undo.append(lambda: [os.rmdir(d) for d in reversed(dirs)])
+
+    def removed_dir(self, path: str) -> None:
+        self.undo.append(lambda: os.mkdir(path))
+
+    def rollback(self) -> None:
+        for step in reversed(self.undo):
+            try:
+                step()
+            except OSError as e:
+                logger.warning("batch: rollback step failed: %s", e)
+        self.undo.clear()
+
+    def close(self) -> None:
+        shutil.rmtree(self.backup_dir, ignore_errors=True)
+
+
+# ---------- operations (run in the file I/O pool) ---------- #
+
+def _read(abs_path: str, op: Dict[str, Any]) -> Dict[str, Any]:
+    if not os.path.isfile(abs_path):
+        raise HTTPException(status_code=404, detail="File not found")
+    if not is_text_file(abs_path):
+        raise HTTPException(status_code=400, detail="Not a text file")
+    version = file_etag(os.stat(abs_path))
+    if op.get("offset") is not None or op.get("limit") is not None:
+        offset, limit = max(0, int(op.get("offset") or 0)), max(0, min(int(op.get("limit") or 1000), MAX_READ_LINES))
+        data, total = fileio.read_lines(abs_path, offset, limit)
+        return {"content": data.decode("utf-8", errors="replace"), "totalLines": total, "version": version}
+    return {"content": fileio.read_cache.read_text(abs_path), "version": version}
+
+
+def _write(abs_path: str, op: Dict[str, Any], journal: _Journal | None) -> Dict[str, Any]:
+    content, edits = op.get("content"), op.get("edits")
+    if edits is None and not isinstance(content, str):
+        raise HTTPException(status_code=400, detail="Missing content or edits")
+    if edits is not None and (not isinstance(edits, list) or op.get("baseVersion") is None):
+        raise HTTPException(status_code=400, detail="edits must be a list and need baseVersion")
+    if journal:
+        journal.keep(abs_path)
+    saved, version, size = save_text(abs_path, op.get("baseVersion"), content, edits, create=True)
+    if not saved:
+        raise HTTPException(status_code=409, detail={"message": "File changed since baseVersion", "version": version})
+    return {"version": version, "size": size}
+
+
+def _create(abs_path: str, op: Dict[str, Any], journal: _Journal | None) -> Dict[str, Any]:
+    if os.path.lexists(abs_path):
+        raise HTTPException(status_code=400, detail="File already exists")
+    _mkdirs(os.path.dirname(abs_path), journal)
+    if journal:
+        journal.keep(abs_path)
+    fileio.atomic_write(abs_path, op.get("content") or "")
+    return {"version": file_etag(os.stat(abs_path))}
+
+
+def _rename(abs_path: str, op: Dict[str, Any], journal: _Journal | None) -> Dict[str, Any]:
+    new_name = os.path.basename(op.get("newName") or "")
+    if not new_name:
+        raise HTTPException(status_code=400, detail="Missing newName")
+    if not os.path.lexists(abs_path):
+        raise HTTPException(status_code=404, detail="File/folder not found")
+    new_abs_path = os.path.join(os.path.dirname(abs_path), new_name)
+    if journal:
+        journal.keep(new_abs_path)
+    os.rename(abs_path, new_abs_path)
+    fileio.read_cache.invalidate_tree(abs_path)
+    if journal:
+        journal.renamed(abs_path, new_abs_path)
+    return {}
+
+
+def _delete(abs_path: str, op: Dict[str, Any], journal: _Journal | None) -> Dict[str, Any]:
+    if not os.path.lexists(abs_path):
+        raise HTTPException(status_code=404, detail="File/folder not found")
+    if os.path.isdir(abs_path):
+        try:
+            os.rmdir(abs_path)
+        except OSError:
+            raise HTTPException(status_code=400, detail="Directory not empty")
+        if journal:
+            journal.removed_dir(abs_path)
+    else:
+        if journal:
+            journal.keep(abs_path)
+        os.remove(abs_path)
+        fileio.read_cache.invalidate(abs_path)
+    return {}
+
+
+def _mkdirs(abs_path: str, journal: _Journal | None) -> None:
+    missing = []
+    d = abs_path
+    while not os.path.isdir(d):
+        missing.append(d)
+        d = os.path.dirname(d)
+    os.makedirs(abs_path, exist_ok=True)
+    if journal and missing:
+        journal.made_dirs(missing[::-1])
+
+
+def _mkdir(abs_path: str, op: Dict[str, Any], journal: _Journal | None) -> Dict[str, Any]:
+    _mkdirs(abs_path, journal)
+    return {}
+
+
+_MUTATIONS = {"write": _write, "create": _create, "rename": _rename, "delete": _delete, "mkdir": _mkdir}
+
+
+def _error(e: Exception) -> Dict[str, Any]:
+    if isinstance(e, HTTPException):
+        detail = e.detail if isinstance(e.detail, dict) else {"message": e.detail}
+        return {"ok": False, "status": e.status_code, "error": detail.pop("message"), **detail}
+    if isinstance(e, FileNotFoundError):
+        return {"ok": False, "status": 404, "error": "Not found"}
+    if isinstance(e, (ValueError, TypeError)):
+        return {"ok": False, "status": 400, "error": str(e)}
+    return {"ok": False, "status": 500, "error": str(e)}
+
+
+@router.post("/api/batch")
+async def batch(request: Request, data: dict = Body(...)):
+    """`{ ops: [{ op: read|write|create|rename|delete|mkdir, path, ... }], mode? }` → per-op results."""
+    require_auth(request)
+    ops = data.get("ops")
+    mode = data.get("mode") or "continue"
+    if not isinstance(ops, list) or not all(isinstance(op, dict) for op in ops):
+        raise HTTPException(status_code=400, detail="ops must be a list of objects")
+    if len(ops) > MAX_OPS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_OPS} operations per batch")
+    if mode not in _MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(_MODES)}")
+    root = get_root_dir()
+    journal = _Journal(root) if mode == "transaction" else None
+
+    async def run(op: Dict[str, Any]) -> Dict[str, Any]:
+        kind = op.get("op")
+        try:
+            abs_path = get_abs_path(op.get("path") or "", root)
+            if kind == "read":
+                result = await fileio.executor.run("batch.read", _read, abs_path, op)
+            elif kind in _MUTATIONS:
+                size = len(op.get("content") or "")
+                result = await fileio.executor.run(f"batch.{kind}", _MUTATIONS[kind], abs_path, op, journal,
+                                                   bulk=size > settings.io_bulk_bytes)
+            else:
+                raise HTTPException(status_code=400, detail=f"Unknown op {kind!r}")
+            return {"ok": True, **result}
+        except Exception as e:  # noqa: BLE001
+            return _error(e)
+
+    results: List[Dict[str, Any]] = []
+    failed = rolled_back = False
+    try:
+        i = 0
+        while i < len(ops):
+            if failed and mode != "continue":
+                results.append({"ok": False, "skipped": True})
+                i += 1
+                continue
+            j = i + 1
+            if ops[i].get("op") == "read":
+                while j < len(ops) and ops[j].get("op") == "read":
+                    j += 1
+            group = await asyncio.gather(*(run(op) for op in ops[i:j]))
+            results.extend(group)
+            failed = failed or not all(r["ok"] for r in group)
+            i = j
+        if failed and journal is not None:
+            await fileio.executor.run("batch.rollback", journal.rollback)
+            rolled_back = True
+            for op, result in zip(ops, results):
+                if result["ok"] and op.get("op") in _MUTATIONS:
+                    result["rolledBack"] = True
+    finally:
+        if journal is not None:
+            await fileio.executor.run("batch.cleanup", journal.close)
+    for op, result in zip(ops, results):
+        result["op"] = op.get("op")
+    return {"results": results, "ok": not failed, "rolledBack": rolled_back}
@@ -1,12 +1,16 @@
 """Common helpers and dependencies for API routers."""
 from __future__ import annotations
 
+import functools
 import os
 from pathlib import Path
 from typing import Any, Dict
 
-from fastapi import HTTPException, Request
+from fastapi import HTTPException
+from fastapi.requests import HTTPConnection
 
+from backend.core import paths
+from backend.core.paths import is_text, is_text_file  # noqa: F401 – re-exported for the routers
 from backend.core.settings import WORKSPACES_ROOT
 from backend.services.ai_service import AIService
 from backend.services.project_service import ProjectService
@@ -24,8 +28,8 @@ def get_project_service() -> ProjectService:
 
 # ---- Authentication ----
 
-def require_auth(request: Request) -> None:  # noqa: D401
-    """Dummy auth check – extend later."""
+def require_auth(request: HTTPConnection) -> None:  # noqa: D401
+    """Dummy auth check – extend later. Takes a `Request` or a `WebSocket`."""
     # Authentication disabled – always allow for now.
     return None
 
@@ -33,25 +37,28 @@ def require_auth(request: Request) -> None:  # noqa: D401
 # ---- Paths & file helpers ----
 
 # Determine current root directory: sandbox workspace if active, else global workspaces.
-def _root_dir() -> Path:
-    if sandbox_manager.meta:
-        try:
-            return sandbox_manager._sandbox_dir()
-        except Exception:
-            # Fallback to workspaces if sandbox not ready
-            pass
+def get_root_dir() -> Path:
+    sandbox_id = sandbox_manager.meta.get("sandboxId")
+    if sandbox_id:
+        return _sandbox_root(sandbox_id)
+    # Fallback to workspaces if sandbox not ready
     return WORKSPACES_ROOT
 
 
-def get_abs_path(rel_path: str) -> str:
+@functools.lru_cache(maxsize=64)
+def _sandbox_root(sandbox_id: str) -> Path:
+    return sandbox_manager.workspace_root / sandbox_id
+
+
+def get_abs_path(rel_path: str, root_dir: Path | None = None) -> str:
     """Convert a client provided path (relative) into absolute path under WORKSPACES_ROOT.
-    Raises 400 if path tries to escape workspace.
+    Raises 400 if path tries to escape workspace. Pass `root_dir` to resolve
+    many paths against the same root.
     """
-    safe_path = os.path.normpath(os.path.join(_root_dir(), rel_path.strip("/")))
-    root = str(_root_dir())
-    if not os.path.commonpath([safe_path, root]) == root:  # prevent path traversal
+    try:
+        return paths.resolve(str(root_dir or get_root_dir()), rel_path)
+    except paths.InvalidPath:
         raise HTTPException(status_code=400, detail="Invalid path")
-    return safe_path
 
 
 def sizeof_fmt(num: float, suffix: str = "B") -> str:
@@ -62,47 +69,15 @@ def sizeof_fmt(num: float, suffix: str = "B") -> str:
     return f"{num:.1f} Y{suffix}"
 
 
-def get_file_info(path: str, name: str) -> Dict[str, Any]:
-    full_path = os.path.join(path, name)
-    stat = os.stat(full_path)
+def get_file_info(path: str, name: str, stat: os.stat_result | None = None) -> Dict[str, Any]:
+    if stat is None:
+        stat = os.stat(os.path.join(path, name))
     size = stat.st_size
-    ext = os.path.splitext(name)[1].lower()
-    if ext in [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"]:
-        ftype = "image"
-    elif ext in [".pdf", ".doc", ".docx", ".txt", ".ppt", ".pptx", ".xls", ".xlsx"]:
-        ftype = "document"
-    elif ext in [".mp4", ".avi", ".mov", ".wmv", ".mkv"]:
-        ftype = "video"
-    elif ext in [".mp3", ".wav", ".ogg", ".flac"]:
-        ftype = "audio"
-    elif ext in [".zip", ".rar", ".tar", ".gz", ".7z"]:
-        ftype = "archive"
-    else:
-        ftype = "default"
     return {
         "name": name,
         "size": sizeof_fmt(size),
-        "type": ftype,
+        "bytes": size,
+        "type": paths.file_type(name),
         "modified": str(stat.st_mtime),
     }
 
-
-_TEXT_EXTENSIONS = {
-    ".txt",
-    ".md",
-    ".py",
-    ".js",
-    ".json",
-    ".html",
-    ".css",
-    ".csv",
-    ".log",
-    ".xml",
-    ".yml",
-    ".yaml",
-    ".ini",
-    ".conf",
-}
-
-def is_text_file(filename: str) -> bool:
-    return Path(filename).suffix.lower() in _TEXT_EXTENSIONS
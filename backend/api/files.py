@@ -1,40 +1,193 @@
+import asyncio
+import base64
+import codecs
+import hashlib
+import json
 import logging
+import mimetypes
 import os
-import zipfile
-from typing import List, Dict
+import stat
+from typing import Any, List, Dict, Set, Tuple
+from urllib.parse import quote
 
-from fastapi import APIRouter, Body, File as UploadFileType, UploadFile, Form, HTTPException, Request
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Body, File as UploadFileType, UploadFile, Form, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 
+from backend.core import fileio
+from backend.core.file_responses import file_etag, file_response, json_response, not_modified, validators
 from backend.api.deps import (
     require_auth,
     get_abs_path,
     get_file_info,
-    is_text_file,
+    get_root_dir,
+    is_text,
 )
+from backend.core.settings import settings
+from backend.jobs import jobs
+from backend.sandbox_watch import pruned_dirs
+from backend.services.archive_service import ARCHIVE_FORMATS, extract_archive, is_archive, stream_archive
+from backend.services.tree_service import copy_tree, delete_tree, move_tree
+from backend.services.upload_service import UploadService, save_upload
 
 logger = logging.getLogger("backend")
 
 router = APIRouter()
 
+# ---------- Directory listing ---------- #
+
+_SORT_KEYS = ("name", "size", "modified", "type")
+MAX_LIST_DEPTH = 16
+MAX_TREE_ENTRIES = 20000  # tree mode stops descending after this many nested entries (`truncated`)
+MAX_READ_LINES = 100_000  # largest line window / tail of /api/read
+FOLLOW_MAX_BYTES = 256 * 1024  # appended text sent per follow event
+FOLLOW_POLL_S = 0.5
+
+
+class _Lister:
+    """One `os.scandir` pass per directory; each entry is stat'ed once and the
+    same stat feeds the response, the sort and the ETag."""
+
+    def __init__(self, sort: str, reverse: bool, prune: Set[str]):
+        self.sort = sort
+        self.reverse = reverse
+        self.prune = prune
+        self.remaining = MAX_TREE_ENTRIES
+        self.truncated = False
+        self.tag = hashlib.blake2b(digest_size=12)
+
+    def _key(self, item: Dict[str, Any], is_dir: bool) -> Tuple:
+        name = item["name"]
+        if self.sort == "size":
+            return (0 if is_dir else item["bytes"], name.lower(), name)
+        if self.sort == "modified":
+            return (item["mtime"], name.lower(), name)
+        if self.sort == "type":
+            return ("" if is_dir else item["type"], name.lower(), name)
+        return (name.lower(), name)
+
+    def scan(self, abs_dir: str, rel_dir: str, depth: int, nested: bool = False) -> List[Tuple[int, Tuple, Dict[str, Any]]]:
+        """Sorted `(group, key, item)` for a directory; folders (group 0) first.
+
+        The requested directory is always listed in full (its pages must cover
+        every entry); only `nested` subtrees draw on the entry budget.
+        """
+        st = os.stat(abs_dir)
+        self.tag.update(f"D{rel_dir}\0{st.st_ino}\0{st.st_mtime_ns}\n".encode())
+        folders, files = [], []
+        with os.scandir(abs_dir) as it:
+            for entry in it:
+                if nested and self.remaining <= 0:
+                    self.truncated = True
+                    break
+                try:
+                    is_dir = entry.is_dir()
+                    est = entry.stat()
+                except FileNotFoundError:
+                    continue  # removed while listing
+                if nested:
+                    self.remaining -= 1
+                self.tag.update(f"E{entry.name}\0{is_dir}\0{est.st_size}\0{est.st_mtime_ns}\n".encode())
+                if is_dir:
+                    item = {
+                        "name": entry.name,
+                        "path": os.path.join(rel_dir, entry.name).replace("\\", "/"),
+                        "modified": str(est.st_mtime),
+                        "mtime": est.st_mtime,
+                    }
+                    folders.append(item)
+                else:
+                    item = get_file_info(abs_dir, entry.name, est)
+                    item["mtime"] = est.st_mtime
+                    files.append(item)
+        if depth > 1:
+            for item in folders:
+                if item["name"] in self.prune:
+                    item["pruned"] = True  # listed, but its contents are not
+                elif not self.truncated:
+                    item["children"] = _split(self.scan(os.path.join(abs_dir, item["name"]), item["path"], depth - 1, nested=True))
+        return (
+            [(0, self._key(f, True), f) for f in sorted(folders, key=lambda f: self._key(f, True), reverse=self.reverse)]
+            + [(1, self._key(f, False), f) for f in sorted(files, key=lambda f: self._key(f, False), reverse=self.reverse)]
+        )
+
+
+def _split(ordered: List[Tuple[int, Tuple, Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+    return {
+        "files": [item for group, _, item in ordered if group == 1],
+        "folders": [item for group, _, item in ordered if group == 0],
+    }
+
+
+def _encode_cursor(group: int, key: Tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps([group, list(key)]).encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[int, Tuple]:
+    try:
+        group, key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return int(group), tuple(key)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _build_listing(abs_path: str, path: str, sort: str, reverse: bool, depth: int,
+                   limit: int, cursor: str | None) -> Tuple[Dict[str, Any], str]:
+    lister = _Lister(sort, reverse, pruned_dirs())
+    ordered = lister.scan(abs_path, path, depth)
+    total = len(ordered)
+    if cursor:
+        # keyset pagination: resume strictly after the last entry of the previous page,
+        # so entries added or removed meanwhile do not shift the pages
+        c_group, c_key = _decode_cursor(cursor)
+        ordered = [
+            e for e in ordered
+            if e[0] > c_group or (e[0] == c_group and (e[1] < c_key if reverse else e[1] > c_key))
+        ]
+    next_cursor = None
+    if limit and len(ordered) > limit:
+        ordered = ordered[:limit]
+        next_cursor = _encode_cursor(ordered[-1][0], ordered[-1][1])
+    lister.tag.update(f"Q{sort}\0{reverse}\0{depth}\0{limit}\0{cursor}".encode())
+    listing = {**_split(ordered), "total": total, "nextCursor": next_cursor, "truncated": lister.truncated}
+    return listing, f'W/"{lister.tag.hexdigest()}"'
+
 # ---------- File Manager Endpoints ---------- #
 
 
 @router.get("/api/list")
-async def list_files(request: Request, path: str = "/"):
+async def list_files(
+    request: Request,
+    path: str = "/",
+    sort: str = "name",
+    order: str = "asc",
+    depth: int = 1,
+    limit: int = 0,
+    cursor: str | None = None,
+):
+    """List a directory (folders first, sorted server-side).
+
+    `depth` > 1 nests each folder's `children` (`0` = whole subtree); dependency
+    and build directories are listed but not descended into (`pruned`).
+    `limit` pages the top level; pass `nextCursor` back as `cursor`.
+    """
     require_auth(request)
+    if sort not in _SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(_SORT_KEYS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be asc or desc")
+    if depth < 0 or limit < 0:
+        raise HTTPException(status_code=400, detail="depth and limit must be >= 0")
     abs_path = get_abs_path(path)
-    if not os.path.exists(abs_path):
+    if not await fileio.is_dir(abs_path):
         raise HTTPException(status_code=404, detail="Path does not exist")
-    files: List[Dict[str, str]] = []
-    folders: List[Dict[str, str]] = []
-    for entry in os.listdir(abs_path):
-        full_entry = os.path.join(abs_path, entry)
-        if os.path.isdir(full_entry):
-            folders.append({"name": entry, "path": os.path.join(path, entry).replace("\\", "/")})
-        else:
-            files.append(get_file_info(abs_path, entry))
-    return {"files": files, "folders": folders}
+    depth = min(depth or MAX_LIST_DEPTH, MAX_LIST_DEPTH)
+    listing, etag = await fileio.executor.run(
+        "list", _build_listing, abs_path, path, sort, order == "desc", depth, limit, cursor
+    )
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(listing, headers=headers)
 
 
 @router.post("/api/upload")
@@ -45,11 +198,58 @@ async def upload_file(
 ):
     require_auth(request)
     abs_path = get_abs_path(path)
-    os.makedirs(abs_path, exist_ok=True)
+    if settings.upload_max_bytes and int(request.headers.get("content-length") or 0) > settings.upload_max_bytes + 64 * 1024:
+        raise HTTPException(status_code=413, detail=f"File exceeds the {settings.upload_max_bytes} byte limit")
+    await fileio.makedirs(abs_path)
     filename = os.path.basename(file.filename)
     dest = os.path.join(abs_path, filename)
-    with open(dest, "wb") as f:
-        f.write(await file.read())
+    # copy the spooled upload in chunks instead of reading it into memory
+    await fileio.executor.run("upload", save_upload, file.file, dest, bulk=True)
+    return {"success": True}
+
+
+# ---------- Resumable uploads ---------- #
+
+
+@router.post("/api/uploads")
+async def upload_init(request: Request, data: dict = Body(...)):
+    """Start a resumable upload: `{ path, filename, size, sha256? }`."""
+    require_auth(request)
+    abs_path = get_abs_path(data.get("path") or "/")
+    try:
+        size = int(data.get("size"))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Missing or invalid size")
+    return await fileio.executor.run(
+        "upload", UploadService().create, abs_path, data.get("filename"), size, data.get("sha256")
+    )
+
+
+@router.get("/api/uploads/{upload_id}")
+async def upload_status(request: Request, upload_id: str):
+    require_auth(request)
+    return await fileio.executor.run("upload", UploadService().status, upload_id)
+
+
+@router.put("/api/uploads/{upload_id}")
+async def upload_chunk(request: Request, upload_id: str, offset: int):
+    """Raw chunk body written at `offset`; `X-Chunk-Sha256` (hex) is verified when present."""
+    require_auth(request)
+    return await UploadService().write_chunk(
+        upload_id, offset, request.stream(), request.headers.get("x-chunk-sha256")
+    )
+
+
+@router.post("/api/uploads/{upload_id}/finalize")
+async def upload_finalize(request: Request, upload_id: str):
+    require_auth(request)
+    return await fileio.executor.run("upload", UploadService().finalize, upload_id, bulk=True)
+
+
+@router.delete("/api/uploads/{upload_id}")
+async def upload_abort(request: Request, upload_id: str):
+    require_auth(request)
+    await fileio.executor.run("upload", UploadService().abort, upload_id)
     return {"success": True}
 
 
@@ -57,9 +257,13 @@ async def upload_file(
 async def download_file(request: Request, path: str):
     require_auth(request)
     abs_path = get_abs_path(path)
-    if not os.path.isfile(abs_path):
-        raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(abs_path, filename=os.path.basename(abs_path))
+    st = await _stat_file(abs_path)
+    text = await is_text(abs_path, st)
+    media_type = mimetypes.guess_type(abs_path)[0]
+    if media_type is None:
+        media_type = "text/plain; charset=utf-8" if text else "application/octet-stream"
+    return file_response(request, abs_path, st, filename=os.path.basename(abs_path),
+                         media_type=media_type, compressible=text)
 
 
 @router.post("/api/rename")
@@ -69,77 +273,283 @@ async def rename_file(request: Request, data: dict = Body(...)):
     new_name = data.get("newName")
     abs_path = get_abs_path(rel_path)
     new_abs_path = os.path.join(os.path.dirname(abs_path), os.path.basename(new_name))
-    if not os.path.exists(abs_path):
+    if not await fileio.exists(abs_path):
         raise HTTPException(status_code=404, detail="File/folder not found")
-    os.rename(abs_path, new_abs_path)
+    await fileio.rename(abs_path, new_abs_path)
     return {"success": True}
 
 
 @router.post("/api/delete")
 async def delete_file_route(request: Request, data: dict = Body(...)):
+    """Delete a file or empty folder; `recursive` removes a whole folder as a background job (`{ jobId }`)."""
     require_auth(request)
     rel_path = data.get("path")
     abs_path = get_abs_path(rel_path)
-    if not os.path.exists(abs_path):
+    if not await fileio.exists(abs_path):
         raise HTTPException(status_code=404, detail="File/folder not found")
-    if os.path.isdir(abs_path):
+    if await fileio.is_dir(abs_path):
         try:
-            os.rmdir(abs_path)
+            await fileio.rmdir(abs_path)
         except OSError:
-            raise HTTPException(status_code=400, detail="Directory not empty")
+            if not data.get("recursive"):
+                raise HTTPException(status_code=400, detail="Directory not empty")
+            if abs_path == str(get_root_dir()):
+                raise HTTPException(status_code=400, detail="Cannot delete the workspace root")
+            job = jobs.submit("delete", f"Delete {rel_path}", delete_tree, abs_path)
+            return {"success": True, "jobId": job.id}
     else:
-        os.remove(abs_path)
+        await fileio.remove(abs_path)
     return {"success": True}
 
 
+async def _tree_op_paths(data: dict) -> Tuple[str, str]:
+    rel_path, dest = data.get("path"), data.get("dest")
+    if not rel_path or not dest:
+        raise HTTPException(status_code=400, detail="Missing path or dest")
+    root = get_root_dir()
+    abs_path, dest_path = get_abs_path(rel_path, root), get_abs_path(dest, root)
+    if abs_path == str(root):
+        raise HTTPException(status_code=400, detail="Cannot move or copy the workspace root")
+    if not await fileio.executor.run("stat", os.path.lexists, abs_path):
+        raise HTTPException(status_code=404, detail="File/folder not found")
+    if await fileio.executor.run("stat", os.path.lexists, dest_path):
+        raise HTTPException(status_code=409, detail=f"{dest} already exists")
+    if not await fileio.is_dir(os.path.dirname(dest_path)):
+        raise HTTPException(status_code=404, detail="Destination folder not found")
+    if os.path.commonpath([abs_path, dest_path]) == abs_path:
+        raise HTTPException(status_code=400, detail="Cannot move or copy a folder into itself")
+    return abs_path, dest_path
+
+
+@router.post("/api/move")
+async def move_file_route(request: Request, data: dict = Body(...)):
+    """Move a file or folder to `dest` (its new path) as a background job: `{ jobId }`."""
+    require_auth(request)
+    abs_path, dest_path = await _tree_op_paths(data)
+    job = jobs.submit("move", f"Move {data['path']} to {data['dest']}", move_tree, abs_path, dest_path)
+    return {"success": True, "jobId": job.id}
+
+
+@router.post("/api/copy")
+async def copy_file_route(request: Request, data: dict = Body(...)):
+    """Copy a file or folder to `dest` (the new path) as a background job: `{ jobId }`."""
+    require_auth(request)
+    abs_path, dest_path = await _tree_op_paths(data)
+    job = jobs.submit("copy", f"Copy {data['path']} to {data['dest']}", copy_tree, abs_path, dest_path)
+    return {"success": True, "jobId": job.id}
+
+
+async def _stat_file(abs_path: str) -> os.stat_result:
+    try:
+        st = await fileio.stat(abs_path)
+    except OSError:
+        raise HTTPException(status_code=404, detail="File not found")
+    if not stat.S_ISREG(st.st_mode):
+        raise HTTPException(status_code=404, detail="File not found")
+    return st
+
+
 @router.get("/api/read")
-async def read_file_route(request: Request, path: str):
+async def read_file_route(
+    request: Request,
+    path: str,
+    offset: int | None = None,
+    limit: int | None = None,
+    tail: int | None = None,
+    follow: bool = False,
+    position: int | None = None,
+):
+    """Text content of a file.
+
+    Whole file by default; `offset`/`limit` return a window of lines plus
+    `totalLines`; `tail=N` the last N lines plus the end `position`;
+    `follow=true` streams what is appended after `position` as SSE.
+    Carries `ETag`/`Last-Modified` (`version` is the ETag) and answers
+    conditional requests with 304.
+    """
     require_auth(request)
     abs_path = get_abs_path(path)
-    if not os.path.isfile(abs_path):
-        raise HTTPException(status_code=404, detail="File not found")
-    if not is_text_file(abs_path):
+    st = await _stat_file(abs_path)
+    if not await is_text(abs_path, st):
         raise HTTPException(status_code=400, detail="Not a text file")
+    if follow:
+        last_event_id = request.headers.get("last-event-id", "")
+        if last_event_id.isdigit():  # EventSource reconnect; anything else is ignored
+            start = int(last_event_id)
+        else:
+            start = position if position is not None else st.st_size
+        return StreamingResponse(_follow(request, abs_path, start), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache"})
+    headers = validators(st)
+    if not_modified(request, st):
+        return Response(status_code=304, headers=headers)
+    version = file_etag(st)
     try:
-        with open(abs_path, "r", encoding="utf-8", errors="replace") as f:
-            content = f.read()
-        return {"content": content}
+        if tail is not None:
+            data, end = await fileio.executor.run("read", fileio.tail_lines, abs_path, max(0, min(tail, MAX_READ_LINES)), bulk=True)
+            payload = {"content": data.decode("utf-8", errors="replace"), "tail": tail, "position": end, "version": version}
+        elif offset is not None or limit is not None:
+            offset, limit = max(0, offset or 0), max(0, min(limit or 1000, MAX_READ_LINES))
+            data, total = await fileio.executor.run("read", fileio.read_lines, abs_path, offset, limit, bulk=True)
+            payload = {"content": data.decode("utf-8", errors="replace"), "offset": offset, "limit": limit,
+                       "totalLines": total, "version": version}
+        else:
+            payload = {"content": await fileio.read_text(abs_path), "version": version}
     except Exception as e:  # noqa: BLE001
         raise HTTPException(status_code=500, detail=str(e))
+    return await json_response(request, payload, headers)
+
+
+async def _follow(request: Request, abs_path: str, position: int):
+    """SSE of text appended to a file; event ids are byte positions (resume with Last-Event-ID)."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    while not await request.is_disconnected():
+        try:
+            size = (await fileio.stat(abs_path)).st_size
+        except OSError:
+            yield f"event: deleted\ndata: {json.dumps({'position': position})}\n\n"
+            return
+        if size < position:  # truncated or rotated
+            position = 0
+            decoder.reset()
+            yield f"id: 0\nevent: truncate\ndata: {json.dumps({'position': 0})}\n\n"
+        if size > position:
+            data = await fileio.executor.run("read", _read_at, abs_path, position, min(size - position, FOLLOW_MAX_BYTES))
+            position += len(data)
+            text = decoder.decode(data)
+            yield f"id: {position}\nevent: append\ndata: {json.dumps({'text': text, 'position': position})}\n\n"
+            continue
+        await asyncio.sleep(FOLLOW_POLL_S)
+
+
+def _read_at(abs_path: str, position: int, size: int) -> bytes:
+    with open(abs_path, "rb") as f:
+        f.seek(position)
+        return f.read(size)
+
+
+def _apply_edits(text: str, edits: List[Dict[str, Any]]) -> str:
+    """Apply `{start, end, text}` replacements; offsets are UTF-16 code units (JS string indices)."""
+    units = text.encode("utf-16-le", errors="surrogatepass")
+    spans = []
+    for edit in edits:
+        try:
+            start, end, new = int(edit["start"]), int(edit["end"]), str(edit.get("text", ""))
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Edits need integer start/end and text")
+        spans.append((start, end, new))
+    spans.sort(reverse=True)
+    limit = len(units) // 2
+    for i, (start, end, new) in enumerate(spans):
+        if not 0 <= start <= end <= limit or (i and end > spans[i - 1][0]):
+            raise HTTPException(status_code=400, detail="Edit out of range or overlapping")
+        units = units[:start * 2] + new.encode("utf-16-le", errors="surrogatepass") + units[end * 2:]
+        limit = start
+    try:
+        return units.decode("utf-16-le")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Edits must not split a surrogate pair")
+
+
+def save_text(abs_path: str, base_version: str | None, content: str | None,
+              edits: List[Dict[str, Any]] | None, create: bool = False) -> Tuple[bool, str | None, int]:
+    """`(saved, version, size)`; not saved when the file is no longer at `base_version`.
+
+    With `create` a missing file is written from `content` (version `None`).
+    """
+    with fileio.path_lock(abs_path):
+        try:
+            current = file_etag(os.stat(abs_path))
+        except FileNotFoundError:
+            if not create or edits is not None:
+                raise HTTPException(status_code=404, detail="File not found")
+            current = None
+        if base_version is not None and base_version != current:
+            return False, current, 0
+        if edits is not None:
+            with open(abs_path, "rb") as f:
+                raw = f.read()
+            try:
+                text = raw.decode("utf-8")
+            except UnicodeDecodeError:
+                raise HTTPException(status_code=400, detail="File is not valid UTF-8; edits cannot be applied")
+            content = _apply_edits(text, edits)
+        data = content.encode("utf-8")
+        fileio.atomic_write(abs_path, data)
+        return True, file_etag(os.stat(abs_path)), len(data)
 
 
 @router.post("/api/save")
 async def save_file_route(request: Request, data: dict = Body(...)):
+    """Save `{ path, content }` or `{ path, edits: [{ start, end, text }] }`.
+
+    With `baseVersion` (or an `If-Match` header; required for edits) the save
+    only happens if the file is still at that version (`ETag` of /api/read),
+    otherwise 409 with the current `version`. Returns the new `version`.
+    """
     require_auth(request)
     rel_path = data.get("path")
     content = data.get("content")
+    edits = data.get("edits")
+    base_version = data.get("baseVersion") or request.headers.get("if-match")
     abs_path = get_abs_path(rel_path)
-    if not os.path.isfile(abs_path):
+    if not await fileio.is_file(abs_path):
         raise HTTPException(status_code=404, detail="File not found")
-    if not is_text_file(abs_path):
+    if not await is_text(abs_path):
         raise HTTPException(status_code=400, detail="Not a text file")
+    if edits is not None:
+        if not isinstance(edits, list) or base_version is None:
+            raise HTTPException(status_code=400, detail="edits must be a list and need baseVersion")
+    elif not isinstance(content, str):
+        raise HTTPException(status_code=400, detail="Missing content or edits")
     try:
-        with open(abs_path, "w", encoding="utf-8") as f:
-            f.write(content)
-        return {"success": True}
+        saved, version, size = await fileio.executor.run(
+            "write", save_text, abs_path, base_version, content, edits, bulk=len(content or "") > settings.io_bulk_bytes
+        )
+    except HTTPException:
+        raise
     except Exception as e:  # noqa: BLE001
         raise HTTPException(status_code=500, detail=str(e))
+    if not saved:
+        return JSONResponse(
+            {"detail": "File changed since baseVersion", "version": version},
+            status_code=409,
+            headers={"ETag": version},
+        )
+    return JSONResponse({"success": True, "version": version, "size": size}, headers={"ETag": version})
 
 
 @router.post("/api/unzip")
 async def unzip_file_route(request: Request, data: dict = Body(...)):
+    """Extract a zip / tar archive next to itself as a background job; returns `{ jobId }`."""
     require_auth(request)
     rel_path = data.get("path")
     abs_path = get_abs_path(rel_path)
-    if not os.path.isfile(abs_path) or not abs_path.lower().endswith(".zip"):
-        raise HTTPException(status_code=400, detail="Not a zip file")
-    try:
-        extract_dir = abs_path + "_unzipped"
-        with zipfile.ZipFile(abs_path, "r") as zip_ref:
-            zip_ref.extractall(extract_dir)
-        return {"success": True, "extracted_to": extract_dir}
-    except Exception as e:  # noqa: BLE001
-        raise HTTPException(status_code=500, detail=str(e))
+    if not is_archive(abs_path) or not await fileio.is_file(abs_path):
+        raise HTTPException(status_code=400, detail="Not a zip or tar archive")
+    extract_dir = abs_path + "_unzipped"
+    if await fileio.exists(extract_dir):
+        raise HTTPException(status_code=409, detail=f"{os.path.basename(extract_dir)} already exists")
+    job = jobs.submit("extract", f"Extract {rel_path}", extract_archive, abs_path, extract_dir)
+    return {"success": True, "jobId": job.id, "extracted_to": extract_dir}
+
+
+@router.get("/api/download-archive")
+async def download_archive(request: Request, path: str, format: str = "zip", exclude: bool = False):
+    """Stream a folder as zip or tar.gz while it is being built (`exclude` skips node_modules, venv, ...)."""
+    require_auth(request)
+    if format not in ARCHIVE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(ARCHIVE_FORMATS)}")
+    abs_path = get_abs_path(path)
+    if not await fileio.is_dir(abs_path):
+        raise HTTPException(status_code=404, detail="Folder not found")
+    media_type, suffix = ARCHIVE_FORMATS[format]
+    filename = (os.path.basename(abs_path.rstrip("/")) or "workspace") + suffix
+    return StreamingResponse(
+        stream_archive(abs_path, format, pruned_dirs() if exclude else set()),
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename*=utf-8''{quote(filename)}"},
+    )
 
 
 # ---------- Create New File ---------- #
@@ -154,13 +564,12 @@ async def create_file_route(request: Request, data: dict = Body(...)):
     if not rel_path or rel_path.endswith("/"):
         raise HTTPException(status_code=400, detail="Invalid file path")
     abs_path = get_abs_path(rel_path)
-    if os.path.exists(abs_path):
+    if await fileio.exists(abs_path):
         raise HTTPException(status_code=400, detail="File already exists")
     # Ensure parent directory exists
-    os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+    await fileio.makedirs(os.path.dirname(abs_path))
     try:
-        with open(abs_path, "w", encoding="utf-8") as f:
-            f.write(content)
+        await fileio.write(abs_path, content)
         return {"success": True}
     except Exception as e:  # noqa: BLE001
         raise HTTPException(status_code=500, detail=str(e))
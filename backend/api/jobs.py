@@ -0,0 +1,58 @@
+import asyncio
+import json
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from backend.api.deps import require_auth
+from backend.jobs import Job, jobs
+
+router = APIRouter()
+
+
+def _get_job(job_id: str) -> Job:
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return job
+
+
+@router.get("/api/jobs")
+async def list_jobs(request: Request):
+    """Running and recently finished background jobs, newest first."""
+    require_auth(request)
+    return {"jobs": jobs.list()}
+
+
+@router.get("/api/jobs/{job_id}")
+async def job_status(request: Request, job_id: str):
+    require_auth(request)
+    return _get_job(job_id).snapshot()
+
+
+@router.get("/api/jobs/{job_id}/events")
+async def job_events(request: Request, job_id: str):
+    """Server-sent events: a `progress` snapshot whenever the job changes, `end` once it finished."""
+    require_auth(request)
+    job = _get_job(job_id)
+
+    async def _events():
+        version = -1
+        while True:
+            if job.version != version:
+                version = job.version
+                snapshot = job.snapshot()
+                event = "end" if job.finished else "progress"
+                yield f"id: {version}\nevent: {event}\ndata: {json.dumps(snapshot)}\n\n"
+                if event == "end":
+                    return
+            await asyncio.sleep(0.25)
+
+    return StreamingResponse(_events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(request: Request, job_id: str):
+    require_auth(request)
+    _get_job(job_id)
+    return jobs.cancel(job_id).snapshot()
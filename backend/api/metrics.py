@@ -0,0 +1,64 @@
+from collections import Counter
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from backend.core import paths
+from backend.core.fileio import executor as io_pool, read_cache
+from backend.core.metrics import registry
+from backend.jobs import jobs
+from backend.sandbox import manager as sandbox_manager
+from backend.sandbox_exec import runner as exec_runner
+from backend.sandbox_limits import scheduler
+from backend.sandbox_pty import manager as pty_manager
+
+router = APIRouter()
+
+
+@registry.collector
+def _sandbox_metrics():
+    yield "sandbox_exec_running", "gauge", "Commands holding an execution slot.", [({}, scheduler.total_running)]
+    yield "sandbox_exec_queued", "gauge", "Commands waiting for an execution slot.", [
+        ({}, sum(len(q) for q in scheduler.waiting.values()))
+    ]
+    yield "sandbox_process_groups", "gauge", "Process groups started in sandboxes and still alive.", [
+        ({"sandbox": sandbox_id}, len(pgids)) for sandbox_id, pgids in scheduler.pgids.items() if pgids
+    ]
+    yield "sandbox_commands", "gauge", "Commands known to the exec runner.", [
+        ({"state": state}, n)
+        for state, n in sorted(Counter("finished" if c.finished else "running" for c in list(exec_runner.commands.values())).items())
+    ]
+    yield "sandbox_shells", "gauge", "Open terminal sessions.", [({}, len(pty_manager.sessions))]
+    if sandbox_manager.meta:
+        yield "sandbox_dev_server", "gauge", "Dev server state of the active sandbox.", [
+            ({"sandbox": sandbox_manager.meta.get("sandboxId", ""), "state": sandbox_manager.dev.state}, 1)
+        ]
+
+
+@registry.collector
+def _cache_metrics():
+    cache = read_cache.stats()
+    yield "read_cache_bytes", "gauge", "Bytes held by the file read cache.", [({}, cache["bytes"])]
+    yield "read_cache_entries", "gauge", "Files held by the file read cache.", [({}, cache["entries"])]
+    for name in ("hits", "misses", "evictions", "invalidations"):
+        yield f"read_cache_{name}_total", "counter", f"File read cache {name}.", [({}, cache[name])]
+    for cache_name, info in paths.stats().items():
+        yield f"path_{cache_name}_cache_hits_total", "counter", f"Path {cache_name} cache hits.", [({}, info["hits"])]
+        yield f"path_{cache_name}_cache_misses_total", "counter", f"Path {cache_name} cache misses.", [({}, info["misses"])]
+    yield "io_pending", "gauge", "Filesystem calls queued or running, per pool.", [
+        ({"lane": lane}, n) for lane, n in io_pool.stats()["pending"].items()
+    ]
+
+
+@registry.collector
+def _job_metrics():
+    counts = Counter((job["kind"], job["state"]) for job in jobs.list())
+    yield "jobs", "gauge", "Background jobs retained, by kind and state.", [
+        ({"kind": kind, "state": state}, n) for (kind, state), n in sorted(counts.items())
+    ]
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition format."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
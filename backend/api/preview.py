@@ -0,0 +1,38 @@
+import logging
+
+from fastapi import APIRouter, HTTPException, Request, WebSocket
+from fastapi.responses import RedirectResponse
+
+from backend.api.deps import require_auth
+from backend.sandbox_proxy import preview_prefix, proxy
+
+logger = logging.getLogger("backend")
+
+router = APIRouter()
+
+_METHODS = ["GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"]
+
+
+@router.api_route("/preview/{project}", methods=_METHODS, include_in_schema=False)
+async def preview_root(request: Request, project: str):
+    require_auth(request)
+    # the dev server's base path ends in a slash; relative asset URLs depend on it
+    return RedirectResponse(preview_prefix(project), status_code=307)
+
+
+@router.api_route("/preview/{project}/{path:path}", methods=_METHODS)
+async def preview(request: Request, project: str, path: str = ""):
+    """Proxy to the project's dev server (streaming, keep-alive, per-sandbox connection cap)."""
+    require_auth(request)
+    return await proxy.forward(request, project, path)
+
+
+@router.websocket("/preview/{project}/{path:path}")
+async def preview_ws(websocket: WebSocket, project: str, path: str = ""):
+    """WebSocket bridge, used by Vite HMR."""
+    try:
+        require_auth(websocket)
+    except HTTPException:
+        await websocket.close(code=1008)  # policy violation
+        return
+    await proxy.forward_ws(websocket, project, path)
@@ -1,13 +1,19 @@
 import logging
 import os
-import re
-import shutil
+from urllib.parse import quote
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
+from backend.jobs import Job, jobs
 from backend.models.project import ProjectCreateRequest
+from backend.project_catalog import SORT_KEYS, catalog
+from backend.sandbox_watch import pruned_dirs
+from backend.services.archive_service import extract_stream, stream_archive
 from backend.services.project_service import ProjectService
-from backend.api.deps import get_project_service
+from backend.services.tree_service import clone_tree
+from backend.api.deps import get_project_service, require_auth
 
 logger = logging.getLogger("backend")
 
@@ -17,33 +23,90 @@ router = APIRouter()
 @router.post("/api/projects")
 async def create_project(req: ProjectCreateRequest, svc: ProjectService = Depends(get_project_service)):
     try:
-        return svc.create(req.name)
+        result = svc.create(req.name)
     except FileExistsError:
         raise HTTPException(status_code=400, detail="Project already exists")
+    catalog.mark_dirty(result["path"].lstrip("/"), modified=True)
+    return result
 
 
 @router.get("/api/projects")
-async def list_projects(svc: ProjectService = Depends(get_project_service)):
-    # Purge old test* projects, keep only the two most recent
-    root = svc.__class__.__module__  # not used; kept for type stability
-    base_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "..", "..")
-    # Actual workspaces root
-    from backend.core.settings import WORKSPACES_ROOT
+async def list_projects(sort: str = "name", order: str = "asc", offset: int = 0, limit: int = 0):
+    """Projects with size, file count, last modification/opening and dev-server state, from the catalog."""
+    if sort not in SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(SORT_KEYS)}")
+    listing = catalog.list(sort, order == "desc", max(0, offset), max(0, limit))
+    return {"projects": [p["name"] for p in listing["items"]], **listing}
 
+
+@router.post("/api/projects/gc")
+async def collect_projects(request: Request, data: dict = Body(default={})):
+    """Apply the project retention policy now (`dryRun` only reports what would go)."""
+    require_auth(request)
+    removed = await run_in_threadpool(catalog.gc, bool(data.get("dryRun")))
+    return {"removed": removed, "dryRun": bool(data.get("dryRun"))}
+
+
+def _project_name(svc: ProjectService, name: str) -> str:
+    try:
+        return svc.check_name(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/api/projects/{name}/export")
+async def export_project(request: Request, name: str, exclude: bool = True,
+                         svc: ProjectService = Depends(get_project_service)):
+    """Stream the project as tar.gz while it is being built (`exclude` skips node_modules, venv, ...)."""
+    require_auth(request)
+    source = svc.source_dir(_project_name(svc, name))
+    if source is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return StreamingResponse(
+        stream_archive(source, "tar.gz", pruned_dirs() if exclude else set()),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f"attachment; filename*=utf-8''{quote(name)}.tar.gz"},
+    )
+
+
+@router.post("/api/projects/{name}/import")
+async def import_project(request: Request, name: str, svc: ProjectService = Depends(get_project_service)):
+    """Create project `name` from the tar / tar.gz request body, extracted as it arrives."""
+    require_auth(request)
+    name = _project_name(svc, name)
+    if svc.exists(name):
+        raise HTTPException(status_code=409, detail="Project already exists")
+    _, sandbox_dir = svc.dirs(name)
+    job = jobs.track("import", f"Import project {name}")
+    await extract_stream(job, request.stream(), sandbox_dir)
+    if job.state != Job.DONE:
+        raise HTTPException(status_code=400, detail=job.error or f"Import {job.state}")
     try:
-        entries = [d for d in os.listdir(WORKSPACES_ROOT) if os.path.isdir(os.path.join(WORKSPACES_ROOT, d))]
-        test_dirs = [d for d in entries if re.match(r"^test", d, re.IGNORECASE)]
-        # Sort test dirs by modification time (newest first)
-        test_dirs_sorted = sorted(
-            test_dirs,
-            key=lambda d: os.stat(os.path.join(WORKSPACES_ROOT, d)).st_mtime,
-            reverse=True,
-        )
-        # Delete all but the latest two
-        for d in test_dirs_sorted[2:]:
-            shutil.rmtree(os.path.join(WORKSPACES_ROOT, d), ignore_errors=True)
-    except Exception as _:
-        # Non-fatal; continue to list
+        svc.create(name)
+    except FileExistsError:
         pass
+    catalog.mark_dirty(name, modified=True)
+    return {"success": True, "name": name, "jobId": job.id, **job.result}
+
+
+@router.post("/api/projects/{name}/clone")
+async def clone_project(request: Request, name: str, data: dict = Body(...),
+                        svc: ProjectService = Depends(get_project_service)):
+    """Clone a project (with its installed dependencies) to `{ name }` as a background job; returns `{ jobId }`."""
+    require_auth(request)
+    name, new_name = _project_name(svc, name), _project_name(svc, data.get("name", ""))
+    pairs = svc.clone_pairs(name, new_name)
+    if not pairs:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if svc.exists(new_name):
+        raise HTTPException(status_code=409, detail="Project already exists")
+
+    def _clone(job: Job) -> dict:
+        result = clone_tree(job, pairs)
+        if not os.path.isdir(svc.dirs(new_name)[0]):  # only the sandbox folder was cloned
+            svc.create(new_name)
+        catalog.mark_dirty(new_name, modified=True)
+        return result
 
-    return {"projects": svc.list()}
+    job = jobs.submit("clone", f"Clone project {name} to {new_name}", _clone)
+    return {"success": True, "name": new_name, "jobId": job.id}
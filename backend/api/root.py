@@ -1,8 +1,17 @@
 from fastapi import APIRouter
 
+from backend.core import paths
+from backend.core.fileio import executor as io_pool, read_cache
+
 router = APIRouter()
 
 
 @router.get("/")
 async def root():
     return {"message": "FastAPI backend is running"}
+
+
+@router.get("/api/io/stats")
+async def io_stats():
+    """Filesystem thread pools (workers, pending calls, latency per operation), read cache and path caches."""
+    return {**io_pool.stats(), "readCache": read_cache.stats(), "paths": paths.stats()}
@@ -1,9 +1,27 @@
+import asyncio
+import codecs
+import json
 import logging
-from typing import List, Dict
+from typing import Any, List, Dict, Tuple
 
-from fastapi import APIRouter, Body, HTTPException
+from fastapi import APIRouter, Body, Header, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 
+from backend.core.paths import InvalidPath
+from backend.core.logging import lazy_json
+from backend.jobs import Job, jobs
+from backend.project_catalog import catalog
 from backend.sandbox import manager as sandbox_manager
+from backend.sandbox_checkpoints import IncompleteCheckpoint, store as checkpoints
+from backend.sandbox_exec import Command, runner as exec_runner
+from backend.sandbox_limits import process_usage, scheduler
+from backend.sandbox_pty import manager as pty_manager
+from backend.sandbox_reaper import reaper
+from backend.sandbox_tests import run_tests
+from backend.sandbox_watch import pruned_dirs, watcher
+from backend.services import sync_service
+from backend.services.archive_service import overlay_stream
 
 logger = logging.getLogger("backend")
 
@@ -18,6 +36,7 @@ async def sandbox_init(data: dict = Body(...)):
     timeout_ms = data.get("timeoutMs", 5 * 60_000)
     api_key = data.get("apiKey")
     meta = sandbox_manager.init(project_name=project, api_key=api_key, timeout_ms=timeout_ms)
+    catalog.mark_dirty(project, opened=True)
     return meta
 
 
@@ -28,8 +47,87 @@ async def sandbox_start(data: dict = Body(...)):
         raise HTTPException(status_code=400, detail="Missing project name")
     if not sandbox_manager.meta or sandbox_manager.meta.get("sandboxId") != project:
         raise HTTPException(status_code=400, detail="Sandbox not initialised for this project")
-    meta = sandbox_manager.start_dev()
-    return meta
+    # npm install can take minutes; keep it off the event loop
+    meta = await run_in_threadpool(sandbox_manager.start_dev)
+    if not data.get("wait"):
+        return meta
+    timeout = float(data.get("timeout", 60))
+    ready = await run_in_threadpool(sandbox_manager.dev.wait_ready, timeout)
+    result = {**meta, "ready": ready, "status": sandbox_manager.dev.status()}
+    if not ready:
+        result["logs"] = sandbox_manager.dev.tail(50)
+    return result
+
+
+@router.get("/api/sandbox/status")
+async def sandbox_status():
+    return {"active": sandbox_manager.is_active(), **sandbox_manager.dev.status()}
+
+
+@router.get("/api/sandbox/idle")
+async def sandbox_idle():
+    """Idle tracking: seconds since last activity, suspend/hibernate thresholds, reclaimed memory."""
+    return await run_in_threadpool(reaper.stats)
+
+
+@router.get("/api/sandbox/usage")
+async def sandbox_usage():
+    """Exec slots (running/queued) and CPU/memory per sandbox, plus the dev server's own usage."""
+    usage = await run_in_threadpool(scheduler.usage)
+    proc = sandbox_manager.process
+    alive = proc is not None and sandbox_manager.is_active()
+    usage["devServer"] = await run_in_threadpool(process_usage, proc.pid) if alive else None
+    return usage
+
+
+@router.get("/api/sandbox/logs")
+async def sandbox_logs(after: int = 0, limit: int = 500):
+    """Dev-server output lines with `seq > after` (at most the newest `limit`)."""
+    lines = sandbox_manager.dev.since(after, limit)
+    return {
+        "lines": lines,
+        "next": lines[-1]["seq"] if lines else after,
+        "state": sandbox_manager.dev.state,
+    }
+
+
+@router.get("/api/sandbox/logs/stream")
+async def sandbox_logs_stream(after: int = 0, last_event_id: str | None = Header(default=None)):
+    """Server-sent events: `log` lines and `state` transitions of the dev server."""
+    if last_event_id and last_event_id.isdigit():
+        after = max(after, int(last_event_id))
+    dev = sandbox_manager.dev
+
+    async def _events():
+        seq, state = after, None
+        while True:
+            if dev.state != state:
+                state = dev.state
+                yield f"event: state\ndata: {json.dumps(dev.status())}\n\n"
+            for line in dev.since(seq):
+                seq = line["seq"]
+                yield f"id: {seq}\nevent: log\ndata: {json.dumps(line['text'])}\n\n"
+            await asyncio.sleep(0.5)
+
+    return StreamingResponse(_events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.get("/api/sandbox/watch")
+async def sandbox_watch(after: int = 0, last_event_id: str | None = Header(default=None)):
+    """Server-sent events: coalesced `changes` batches for the active sandbox, or `rescan`."""
+    if last_event_id and last_event_id.isdigit():
+        after = max(after, int(last_event_id))
+
+    async def _events():
+        async for seq, event, batch in watcher.events(after):
+            yield f"id: {seq}\nevent: {event}\ndata: {json.dumps(batch)}\n\n"
+
+    return StreamingResponse(_events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.get("/api/sandbox/watch/status")
+async def sandbox_watch_status():
+    return watcher.stats()
 
 
 @router.post("/api/sandbox/create")
@@ -50,11 +148,7 @@ async def sandbox_apply_code(data: dict = Body(...)):
     response_text = data.get("response")  # noqa: F841 – kept for future use
     files: List[Dict[str, str]] = data.get("files", [])
     logger.info("apply-code received %s files", len(files))
-    try:
-        import json as _json
-        logger.debug("files payload:\n%s", _json.dumps(files, indent=2)[:2000])
-    except Exception:
-        pass
+    logger.debug("files payload:\n%s", lazy_json(files))
     files_created, files_updated = 0, 0
     for f in files:
         rel = f.get("path")
@@ -81,15 +175,303 @@ async def sandbox_kill():
     return {"success": True}
 
 
+# ---------- Checkpoints ---------- #
+
+
+def _active_sandbox() -> str:
+    sandbox_id = sandbox_manager.meta.get("sandboxId")
+    if not sandbox_id:
+        raise HTTPException(status_code=400, detail="Sandbox not initialised")
+    return sandbox_id
+
+
+@router.get("/api/sandbox/checkpoints")
+async def sandbox_checkpoints():
+    sandbox_id = _active_sandbox()
+    return {"checkpoints": await run_in_threadpool(checkpoints.list, sandbox_id)}
+
+
+@router.post("/api/sandbox/checkpoints")
+async def sandbox_checkpoint_create(data: dict = Body(default={})):
+    sandbox_id = _active_sandbox()
+    return await run_in_threadpool(
+        checkpoints.create, sandbox_id, sandbox_manager._sandbox_dir(), data.get("label", "manual"),
+    )
+
+
+@router.get("/api/sandbox/checkpoints/{checkpoint_id}/diff")
+async def sandbox_checkpoint_diff(checkpoint_id: str, path: str | None = None):
+    """Changed files since the checkpoint, or a unified diff of one file with `?path=`."""
+    sandbox_id = _active_sandbox()
+    src = sandbox_manager._sandbox_dir()
+    if path:
+        try:
+            result = await run_in_threadpool(checkpoints.file_diff, sandbox_id, checkpoint_id, src, path)
+        except InvalidPath:
+            raise HTTPException(status_code=400, detail="Invalid path")
+        if result is None:
+            raise HTTPException(status_code=404, detail="Checkpoint not found")
+        return {"id": checkpoint_id, "path": path, "diff": result}
+    result = await run_in_threadpool(checkpoints.diff, sandbox_id, checkpoint_id, src)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Checkpoint not found")
+    return result
+
+
+@router.post("/api/sandbox/checkpoints/{checkpoint_id}/restore")
+async def sandbox_checkpoint_restore(checkpoint_id: str, data: dict = Body(default={})):
+    """Restore the whole workspace, or only `paths`; the current state is checkpointed first."""
+    sandbox_id = _active_sandbox()
+    try:
+        result = await run_in_threadpool(
+            checkpoints.restore, sandbox_id, checkpoint_id, sandbox_manager._sandbox_dir(), data.get("paths"),
+        )
+    except IncompleteCheckpoint as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail="Checkpoint not found")
+    sandbox_manager.cache = {}  # file contents changed behind the cache
+    return result
+
+
+@router.delete("/api/sandbox/checkpoints/{checkpoint_id}")
+async def sandbox_checkpoint_delete(checkpoint_id: str):
+    if not checkpoints.delete(_active_sandbox(), checkpoint_id):
+        raise HTTPException(status_code=404, detail="Checkpoint not found")
+    return {"success": True}
+
+
+# ---------- Sync ---------- #
+
+
+@router.post("/api/sandbox/sync")
+async def sandbox_sync(data: dict = Body(...)):
+    """Compare a client manifest with the sandbox: which files to push, which are extra.
+
+    Body: `{ files: [{ path, size, sha256 }], complete?, delete?: [path] }`;
+    `delete` is applied first.
+    """
+    sandbox_id = _active_sandbox()
+    root = str(sandbox_manager.workspace_root / sandbox_id)
+    excluded = pruned_dirs()
+    try:
+        deleted = await run_in_threadpool(sync_service.delete, root, data.get("delete") or [], excluded)
+        result = await run_in_threadpool(
+            sync_service.diff, root, data.get("files") or [], excluded, bool(data.get("complete"))
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {**result, "deleted": deleted}
+
+
+@router.post("/api/sandbox/sync/push")
+async def sandbox_sync_push(request: Request):
+    """Write the files of a tar / tar.gz body into the sandbox while it arrives."""
+    sandbox_id = _active_sandbox()
+    job = jobs.track("sync", f"Sync files into {sandbox_id}")
+    await overlay_stream(job, request.stream(), str(sandbox_manager.workspace_root / sandbox_id), pruned_dirs())
+    if job.state != Job.DONE:
+        raise HTTPException(status_code=400, detail=job.error or f"Sync {job.state}")
+    return {"success": True, "jobId": job.id, **job.result}
+
+
+# ---------- Tests ---------- #
+
+
+@router.post("/api/sandbox/tests")
+async def sandbox_tests(data: dict = Body(default={})):
+    """Run the tests affected by `paths` (all tests when omitted); `dryRun` only reports the selection."""
+    _active_sandbox()
+    paths = data.get("paths")
+    if paths is not None and not isinstance(paths, list):
+        raise HTTPException(status_code=400, detail="paths must be a list")
+    timeout = max(1, min(int(data.get("timeout") or 120), 600))
+    return await run_in_threadpool(run_tests, paths or None, timeout, bool(data.get("dryRun")))
+
+
 # ---------- Command Exec ---------- #
 
 
 @router.post("/api/sandbox/exec")
 async def sandbox_exec(data: dict = Body(...)):
+    """Run a terminal command.
+
+    Default (compatibility) mode waits and returns `{stdout, stderr, code}`.
+    With `stream: true` it returns `{id}` immediately; follow the output via
+    `GET /api/sandbox/exec/{id}/events` (SSE).
+    """
     cmd = data.get("cmd")
     if not cmd:
         raise HTTPException(status_code=400, detail="Missing cmd")
     if not sandbox_manager.meta:
         raise HTTPException(status_code=400, detail="Sandbox not initialised")
-    result = sandbox_manager.run_command(cmd)
-    return result
+    timeout = data.get("timeout")
+    if timeout is not None and (isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout < 0):
+        raise HTTPException(status_code=400, detail="timeout must be a number of seconds")
+    cwd = str(sandbox_manager._sandbox_dir())
+    env = sandbox_manager.command_env()
+    sandbox_id = sandbox_manager.meta.get("sandboxId")
+    if data.get("stream"):
+        command = await exec_runner.start(cmd, cwd, env, timeout=timeout, sandbox_id=sandbox_id)
+        return command.snapshot()
+    return await exec_runner.run(cmd, cwd, env, timeout=timeout or 60, sandbox_id=sandbox_id)
+
+
+def _get_command(command_id: str) -> Command:
+    command = exec_runner.get(command_id)
+    if command is None:
+        raise HTTPException(status_code=404, detail="Command not found")
+    return command
+
+
+@router.get("/api/sandbox/exec/{command_id}")
+async def sandbox_exec_status(command_id: str):
+    return _get_command(command_id).snapshot()
+
+
+@router.get("/api/sandbox/exec/{command_id}/events")
+async def sandbox_exec_events(command_id: str, after: int = 0, last_event_id: str | None = Header(default=None)):
+    """Server-sent events: `stdout`/`stderr` chunks, `truncated`, then a final `exit`."""
+    command = _get_command(command_id)
+    if last_event_id and last_event_id.isdigit():
+        after = max(after, int(last_event_id))  # EventSource reconnect
+
+    async def _events():
+        async for seq, event, payload in command.events(after):
+            yield f"id: {seq}\nevent: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    return StreamingResponse(_events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@router.post("/api/sandbox/exec/{command_id}/stdin")
+async def sandbox_exec_stdin(command_id: str, data: dict = Body(...)):
+    command = _get_command(command_id)
+    try:
+        await exec_runner.write_stdin(command, data.get("data", ""), eof=bool(data.get("eof")))
+    except (RuntimeError, ConnectionError) as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"success": True}
+
+
+@router.post("/api/sandbox/exec/{command_id}/cancel")
+async def sandbox_exec_cancel(command_id: str):
+    exec_runner.cancel(_get_command(command_id))
+    return {"success": True}
+
+
+# ---------- Interactive shells (PTY) ---------- #
+
+
+@router.get("/api/sandbox/pty")
+async def sandbox_pty_sessions():
+    if not sandbox_manager.meta:
+        raise HTTPException(status_code=400, detail="Sandbox not initialised")
+    return {"sessions": pty_manager.list(sandbox_manager.meta["sandboxId"])}
+
+
+@router.websocket("/api/sandbox/pty")
+async def sandbox_pty(ws: WebSocket):
+    """Multiplexed shell sessions over one WebSocket.
+
+    Client → server: `open {session, cols?, rows?}`, `input {session, data}`,
+    `resize {session, cols, rows}`, `close {session, kill?}`.
+    Server → client: `opened {session, scrollback}`, `output {session, data}`,
+    `exit {session, code}`, `error {detail}`.
+    """
+    await ws.accept()
+    if not sandbox_manager.meta:
+        await ws.send_json({"type": "error", "detail": "Sandbox not initialised"})
+        await ws.close()
+        return
+    sandbox_id = sandbox_manager.meta["sandboxId"]
+    outbox: asyncio.Queue = asyncio.Queue()
+    attached: Dict[str, Any] = {}  # session name -> listener
+
+    async def _sender():
+        while True:
+            await ws.send_json(await outbox.get())
+
+    sender = asyncio.create_task(_sender())
+    try:
+        while True:
+            try:
+                msg = json.loads(await ws.receive_text())
+                if not isinstance(msg, dict):
+                    raise ValueError("message must be a JSON object")
+                kind, name = msg.get("type"), str(msg.get("session") or "main")
+                cols, rows = _pty_size(msg) if kind in ("open", "resize") else (0, 0)
+            except KeyError:  # a binary frame
+                await outbox.put({"type": "error", "detail": "Bad message: expected a JSON text frame"})
+                continue
+            except (ValueError, TypeError) as e:  # bad JSON or window size
+                await outbox.put({"type": "error", "detail": f"Bad message: {e}"})
+                continue
+            if kind == "open":
+                session = pty_manager.open(
+                    sandbox_id, name, str(sandbox_manager._sandbox_dir()), _shell_env(), cols=cols, rows=rows,
+                )
+                if name not in attached:
+                    listener = _make_listener(outbox, attached, session)
+                    session.listeners.append(listener)
+                    attached[name] = listener
+                await outbox.put({
+                    "type": "opened",
+                    "session": name,
+                    "scrollback": session.scrollback.decode("utf-8", errors="replace"),
+                })
+                continue
+            session = pty_manager.get(sandbox_id, name)
+            if session is None:
+                await outbox.put({"type": "error", "session": name, "detail": "Session not open"})
+            elif kind == "input":
+                reaper.touch(sandbox_id)
+                session.write(str(msg.get("data", "")).encode())
+            elif kind == "resize":
+                session.resize(cols, rows)
+            elif kind == "close":
+                listener = attached.pop(name, None)
+                if listener in session.listeners:
+                    session.listeners.remove(listener)
+                if msg.get("kill"):
+                    pty_manager.close(sandbox_id, name)
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        sender.cancel()
+        # detach but keep the shells alive so the pane can re-attach later
+        for name, listener in attached.items():
+            session = pty_manager.get(sandbox_id, name)
+            if session is not None and listener in session.listeners:
+                session.listeners.remove(listener)
+
+
+def _pty_size(msg: Dict[str, Any]) -> Tuple[int, int]:
+    try:
+        cols, rows = int(msg.get("cols") or 80), int(msg.get("rows") or 24)
+    except (TypeError, ValueError):
+        raise ValueError("cols and rows must be integers")
+    if not (1 <= cols <= 1000 and 1 <= rows <= 1000):
+        raise ValueError("cols and rows must be between 1 and 1000")
+    return cols, rows
+
+
+def _make_listener(outbox: asyncio.Queue, attached: Dict[str, Any], session):
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def _listener(name: str, data: bytes | None) -> None:
+        if data is None:
+            outbox.put_nowait({"type": "exit", "session": name, "code": session.exit_code})
+            attached.pop(name, None)
+        else:
+            outbox.put_nowait({"type": "output", "session": name, "data": decoder.decode(data)})
+
+    return _listener
+
+
+def _shell_env() -> Dict[str, str]:
+    env = sandbox_manager.command_env()
+    env["TERM"] = "dumb"  # the terminal pane renders plain text, not escape sequences
+    project = sandbox_manager.meta.get("sandboxId", "sandbox")
+    venv = "(venv)" if (sandbox_manager._sandbox_dir() / "venv").exists() else ""
+    env["PS1"] = f"{venv}user@{project}$ "
+    return env
@@ -1,23 +1,53 @@
 """Primary FastAPI application object.
 Run with:  uvicorn backend.app:app --reload
 """
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
 
 from backend.core.logging import add_logging_middleware
 from backend.core.settings import settings
+from backend.project_catalog import catalog
+from backend.sandbox import manager as sandbox_manager
+from backend.sandbox_proxy import proxy as preview_proxy
+from backend.sandbox_pty import manager as pty_manager
+from backend.sandbox_reaper import add_activity_middleware, reaper
+from backend.sandbox_watch import watcher
 
 # Routers
 from backend.api.root import router as root_router
 from backend.api.auth import router as auth_router
 from backend.api.projects import router as projects_router
 from backend.api.files import router as files_router
+from backend.api.batch import router as batch_router
+from backend.api.jobs import router as jobs_router
 from backend.api.sandbox_router import router as sandbox_router
 from backend.api.ai import router as ai_router
+from backend.api.preview import router as preview_router
+from backend.api.metrics import router as metrics_router
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # background workers
+    sandbox_manager.pool.start()
+    pty_manager.start()
+    reaper.start()
+    watcher.start()
+    preview_proxy.start()
+    catalog.start()
+    yield
+    catalog.stop()
+    await preview_proxy.stop()
+    watcher.stop()
+    reaper.stop()
+    await pty_manager.stop()
+    sandbox_manager.pool.stop()
 
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # middlewares
 app.add_middleware(
@@ -29,6 +59,7 @@ app.add_middleware(
 )
 app.add_middleware(SessionMiddleware, secret_key=settings.secret_key)
 add_logging_middleware(app)
+add_activity_middleware(app)
 
 # register routers (paths kept identical to legacy for compatibility)
 for r in (
@@ -36,7 +67,11 @@ for r in (
     auth_router,
     projects_router,
     files_router,
+    batch_router,
+    jobs_router,
     sandbox_router,
     ai_router,
+    preview_router,
+    metrics_router,
 ):
     app.include_router(r)
@@ -0,0 +1,137 @@
+"""Conditional, ranged and compressed responses for workspace files.
+
+Validators are derived from `stat` alone: the ETag is `W/"<ino>-<size>-<mtime_ns>"`
+(hex), which changes on every atomic write (new inode) and on in-place edits
+(size or mtime). Only single byte ranges are served; anything else gets the
+full body, as RFC 9110 allows. Bodies are read through the file I/O pool.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import zlib
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, AsyncIterator, Dict, Tuple
+from urllib.parse import quote
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+
+from backend.core.fileio import executor as io_pool
+from backend.core.settings import settings
+
+BLOCK = 256 * 1024
+
+
+def file_etag(st: os.stat_result) -> str:
+    return f'W/"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+
+def validators(st: os.stat_result) -> Dict[str, str]:
+    return {
+        "ETag": file_etag(st),
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+        "Cache-Control": "no-cache",  # always revalidate; unchanged files then cost a 304
+    }
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # weak comparison (RFC 9110 §13.1.2)
+    opaque = etag.removeprefix("W/")
+    return any(t.strip() == "*" or t.strip().removeprefix("W/") == opaque for t in header.split(","))
+
+
+def not_modified(request: Request, st: os.stat_result) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, file_etag(st))
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(st.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def accepts_gzip(request: Request) -> bool:
+    return "gzip" in request.headers.get("accept-encoding", "")
+
+
+def parse_range(request: Request, st: os.stat_result) -> Tuple[int, int] | None:
+    """Inclusive `(start, end)` of a satisfiable single `Range`, or None for the full body."""
+    header = request.headers.get("range")
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    if_range = request.headers.get("if-range")
+    if if_range and if_range != file_etag(st) and if_range != formatdate(st.st_mtime, usegmt=True):
+        return None  # the client's copy is outdated; send everything
+    first, _, last = header[6:].strip().partition("-")
+    size = st.st_size
+    try:
+        if not first:  # suffix range: the last N bytes
+            start, end = max(0, size - int(last)), size - 1
+        else:
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(status_code=416, detail="Range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, end
+
+
+async def _iter_file(path: str, start: int, end: int, compress: bool) -> AsyncIterator[bytes]:
+    fd = await io_pool.run("read", os.open, path, os.O_RDONLY)
+    z = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # wbits 31 = gzip container
+    try:
+        pos = start
+        while pos <= end:
+            data = await io_pool.run("read", os.pread, fd, min(BLOCK, end + 1 - pos), pos, bulk=True)
+            if not data:
+                break  # truncated meanwhile
+            pos += len(data)
+            if z is None:
+                yield data
+            else:
+                out = await io_pool.run("compress", z.compress, data, bulk=True)
+                if out:
+                    yield out
+        if z is not None:
+            yield z.flush()
+    finally:
+        os.close(fd)
+
+
+def file_response(request: Request, path: str, st: os.stat_result, filename: str | None = None,
+                  media_type: str = "application/octet-stream", compressible: bool = False) -> Response:
+    """GET a file with 304, `Range` → 206 and (for text) gzip above `COMPRESS_MIN_BYTES`."""
+    headers = {**validators(st), "Accept-Ranges": "bytes"}
+    if filename:
+        headers["Content-Disposition"] = f"attachment; filename*=utf-8''{quote(filename)}"
+    if not_modified(request, st):
+        return Response(status_code=304, headers=headers)
+    byte_range = parse_range(request, st)
+    if byte_range is not None:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{st.st_size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(_iter_file(path, start, end, False), status_code=206, media_type=media_type, headers=headers)
+    compress = compressible and st.st_size >= settings.compress_min_bytes and accepts_gzip(request)
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    else:
+        headers["Content-Length"] = str(st.st_size)
+    return StreamingResponse(_iter_file(path, 0, st.st_size - 1, compress), media_type=media_type, headers=headers)
+
+
+async def json_response(request: Request, payload: Any, headers: Dict[str, str] | None = None) -> Response:
+    """JSON body, gzipped (on the pool) when large and the client accepts it."""
+    headers = dict(headers or {})
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    if len(body) >= settings.compress_min_bytes and accepts_gzip(request):
+        body = await io_pool.run("compress", gzip.compress, body, 6, bulk=len(body) > settings.io_bulk_bytes)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return Response(body, media_type="application/json", headers=headers)
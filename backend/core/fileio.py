@@ -0,0 +1,487 @@
+"""Low-level file helpers shared by the file API, agent tools and checkpoints.
+
+Writes never modify a file in place: `atomic_write` writes a sibling temp
+file and renames it over the target. Besides never exposing half-written
+files, this keeps workspace checkpoints (which share inodes with the
+workspace through hardlinks) intact when a file is edited.
+
+Request handlers must not block the event loop on the disk, so filesystem
+work goes through `executor`, a pair of bounded thread pools: one for
+metadata operations and small reads/writes, one for bulk transfers. A big
+upload can therefore only occupy the bulk workers, never the ones cheap
+requests wait for. The async wrappers at the bottom (`read_text`, `write`,
+`scandir`, `stat`, `rename`, ...) are what routers use; sync code running in
+worker threads (agent tools) uses `executor.call`.
+
+Whole-file reads are served by `read_cache`, one LRU of file contents shared
+by the file API, agent tools and the sandbox manager, bounded by
+`READ_CACHE_BYTES`. An entry is only used while the file's (mtime_ns, size,
+inode) are unchanged, so writes from outside the backend are never masked.
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import errno
+import fcntl
+import functools
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Deque, Dict, Iterator, List, Tuple, TypeVar
+
+from backend.core.settings import settings
+
+T = TypeVar("T")
+
+FICLONE = 0x40049409  # ioctl: share extents with another file (btrfs, XFS, ...)
+
+# errors meaning "this filesystem / pair of files cannot do that", not real I/O failures
+_UNSUPPORTED = {errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.EPERM, errno.EMLINK}
+
+
+# Every atomic replace takes the path's lock, so a caller holding it across
+# "check version, then write" (see /api/save) cannot be overtaken by another writer.
+_PATH_LOCKS = [threading.RLock() for _ in range(64)]
+
+
+def path_lock(path: str | os.PathLike) -> threading.RLock:
+    """Re-entrant lock for one path (striped, so never freed)."""
+    return _PATH_LOCKS[hash(os.path.abspath(path)) % len(_PATH_LOCKS)]
+
+
+@contextmanager
+def atomic_open(path: str | os.PathLike) -> Iterator[BinaryIO]:
+    """Binary file that replaces `path` when the block exits cleanly (temp file + rename).
+
+    The old file's mode is kept; on error the temp file is removed and `path` is untouched.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+        with path_lock(path):
+            try:
+                os.chmod(tmp, path.stat().st_mode & 0o7777)
+            except FileNotFoundError:
+                os.chmod(tmp, 0o666 & ~_umask())
+            os.replace(tmp, path)
+        read_cache.invalidate(path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write(path: str | os.PathLike, data: str | bytes, encoding: str = "utf-8") -> None:
+    """Replace `path` with `data` via a temp file + rename (keeps the old file's mode)."""
+    if isinstance(data, str):
+        data = data.encode(encoding)
+    with atomic_open(path) as f:
+        f.write(data)
+
+
+class SizeLimitExceeded(ValueError):
+    pass
+
+
+def atomic_copy(fsrc: BinaryIO, path: str | os.PathLike, max_bytes: int = 0, chunk_size: int = 1024 * 1024) -> int:
+    """Stream `fsrc` into `path` in `chunk_size` pieces (atomically); returns the byte count.
+
+    Raises `SizeLimitExceeded` as soon as more than `max_bytes` (if set) were read.
+    """
+    total = 0
+    with atomic_open(path) as f:
+        while True:
+            chunk = fsrc.read(chunk_size)
+            if not chunk:
+                break
+            total += len(chunk)
+            if max_bytes and total > max_bytes:
+                raise SizeLimitExceeded(f"File exceeds the {max_bytes} byte limit")
+            f.write(chunk)
+    return total
+
+
+def _umask() -> int:
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+def reflink(src: str | os.PathLike, dst: str | os.PathLike) -> bool:
+    """Clone `src` to a new file `dst` sharing its data blocks; False if unsupported."""
+    with open(src, "rb") as fsrc:
+        fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        try:
+            fcntl.ioctl(fd, FICLONE, fsrc.fileno())
+        except OSError as e:
+            os.close(fd)
+            os.unlink(dst)
+            if e.errno in _UNSUPPORTED:
+                return False
+            raise
+        os.close(fd)
+    shutil.copystat(src, dst)
+    return True
+
+
+def clone_file(src: str | os.PathLike, dst: str | os.PathLike, mode: str = "auto") -> str:
+    """Cheaply duplicate `src` at `dst`; returns the method used.
+
+    `mode` is `auto` (reflink → hardlink → copy), `hardlink` (skip the
+    reflink attempt), `reflink` (reflink → copy; never share an inode) or `copy`.
+    """
+    if mode in ("auto", "reflink") and reflink(src, dst):
+        return "reflink"
+    if mode in ("auto", "hardlink"):
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED:
+                raise
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+def copy_data(fsrc: int, fdst: int, chunk_size: int = 8 * 1024 * 1024,
+              on_chunk: Callable[[int], None] | None = None) -> int:
+    """Copy the rest of fd `fsrc` to fd `fdst` in `chunk_size` steps; returns the byte count.
+
+    Uses `copy_file_range` (no copy through user space, shared extents where
+    the filesystem can), then `sendfile`, then plain reads and writes, falling
+    back only while nothing was copied yet. `on_chunk(n)` runs after every
+    step, so callers can report progress or abort by raising.
+    """
+    total = 0
+    for method in ("copy_file_range", "sendfile", "read"):
+        try:
+            while True:
+                if method == "copy_file_range":
+                    n = os.copy_file_range(fsrc, fdst, chunk_size)
+                elif method == "sendfile":
+                    n = os.sendfile(fdst, fsrc, None, chunk_size)
+                else:
+                    data = memoryview(os.read(fsrc, chunk_size))
+                    n = len(data)
+                    while data:
+                        data = data[os.write(fdst, data):]
+                if not n:
+                    return total
+                total += n
+                if on_chunk is not None:
+                    on_chunk(n)
+        except OSError as e:
+            if total or method == "read" or e.errno not in _UNSUPPORTED | {errno.ENOSYS, errno.EBADF}:
+                raise
+    return total
+
+
+def read_lines(path: str | os.PathLike, offset: int, limit: int) -> Tuple[bytes, int]:
+    """Lines `[offset, offset + limit)` of a file and its total line count.
+
+    Only the window is kept in memory; the rest of the file is counted block-wise.
+    """
+    window: List[bytes] = []
+    total = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if total >= offset:
+                window.append(line)
+            total += 1
+            if total >= offset + limit:
+                break
+        last = b"\n"
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            total += block.count(b"\n")
+            last = block[-1:]
+        if last != b"\n":
+            total += 1  # unterminated last line
+    return b"".join(window), total
+
+
+def tail_lines(path: str | os.PathLike, count: int) -> Tuple[bytes, int]:
+    """The last `count` lines of a file and the byte position of its end (read backwards)."""
+    with open(path, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        pos, data = end, b""
+        while pos > 0 and data.count(b"\n", 0, len(data) - 1) < count:
+            step = min(64 * 1024, pos)
+            pos -= step
+            f.seek(pos)
+            data = f.read(step) + data
+    cut = len(data) - 1
+    for _ in range(count):
+        cut = data.rfind(b"\n", 0, cut)
+        if cut < 0:
+            break
+    return data[cut + 1:] if cut >= 0 else data, end
+
+
+# ---------- read cache ---------- #
+class ReadCache:
+    """File contents by absolute path, least recently used dropped beyond `budget` bytes.
+
+    Entries are validated against the file's (mtime_ns, size, inode) on every
+    read. A file modified less than `RACY_NS` ago is not cached: a second
+    same-size write within the filesystem's timestamp granularity would keep
+    the key unchanged.
+    """
+
+    RACY_NS = 1_000_000_000
+
+    def __init__(self, budget: int, max_file: int):
+        self.budget = budget
+        self.max_file = max_file
+        self._entries: "OrderedDict[str, Tuple[Tuple[int, int, int], bytes]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def read(self, path: str | os.PathLike, limit: int = 0) -> bytes | None:
+        """Whole file, from memory while unchanged; None (nothing read) if larger than `limit`."""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        if limit and st.st_size > limit:
+            return None
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == (st.st_mtime_ns, st.st_size, st.st_ino):
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())  # the file actually read, in case it was replaced meanwhile
+            if limit and st.st_size > limit:
+                return None
+            data = f.read()
+        if len(data) == st.st_size and time.time_ns() - st.st_mtime_ns >= self.RACY_NS:
+            self._store(path, (st.st_mtime_ns, st.st_size, st.st_ino), data)
+        return data
+
+    def read_text(self, path: str | os.PathLike, encoding: str = "utf-8", errors: str = "replace") -> str:
+        return self.read(path).decode(encoding, errors)
+
+    def _store(self, path: str, key: Tuple[int, int, int], data: bytes) -> None:
+        if not self.budget or len(data) > min(self.max_file, self.budget):
+            return
+        with self._lock:
+            old = self._entries.pop(path, None)
+            if old is not None:
+                self._bytes -= len(old[1])
+            self._entries[path] = (key, data)
+            self._bytes += len(data)
+            while self._bytes > self.budget:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def invalidate(self, path: str | os.PathLike) -> None:
+        with self._lock:
+            entry = self._entries.pop(os.path.abspath(path), None)
+            if entry is not None:
+                self._bytes -= len(entry[1])
+                self.invalidations += 1
+
+    def invalidate_tree(self, path: str | os.PathLike) -> None:
+        """Drop `path` and everything cached below it."""
+        path = os.path.abspath(path)
+        prefix = path.rstrip(os.sep) + os.sep
+        with self._lock:
+            for key in [k for k in self._entries if k == path or k.startswith(prefix)]:
+                self._bytes -= len(self._entries.pop(key)[1])
+                self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "budgetBytes": self.budget,
+                "bytes": self._bytes,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+read_cache = ReadCache(settings.read_cache_bytes, settings.read_cache_max_file_bytes)
+
+
+# ---------- I/O executor ---------- #
+class _OpStats:
+    __slots__ = ("count", "errors", "total_s", "max_s", "wait_s", "recent")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.errors = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.wait_s = 0.0  # time spent queued before a worker picked the call up
+        self.recent: Deque[float] = deque(maxlen=512)
+
+    def snapshot(self) -> Dict[str, Any]:
+        recent = sorted(self.recent)
+
+        def pct(q: float) -> float:
+            return round(recent[min(len(recent) - 1, int(q * len(recent)))] * 1000, 2) if recent else 0.0
+
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "avgMs": round(self.total_s / self.count * 1000, 2) if self.count else 0.0,
+            "p50Ms": pct(0.5),
+            "p99Ms": pct(0.99),
+            "maxMs": round(self.max_s * 1000, 2),
+            "avgWaitMs": round(self.wait_s / self.count * 1000, 2) if self.count else 0.0,
+        }
+
+
+class IOExecutor:
+    THREAD_PREFIX = "fileio"
+
+    def __init__(self, workers: int, bulk_workers: int):
+        self._pools = {
+            "fast": ThreadPoolExecutor(max(1, workers), thread_name_prefix=self.THREAD_PREFIX),
+            "bulk": ThreadPoolExecutor(max(1, bulk_workers), thread_name_prefix=f"{self.THREAD_PREFIX}-bulk"),
+        }
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _OpStats] = {}
+        self._pending = {"fast": 0, "bulk": 0}
+
+    def _timed(self, op: str, lane: str, submitted: float, fn: Callable[..., T], args: Tuple, kwargs: Dict) -> T:
+        started = time.perf_counter()
+        failed = False
+        try:
+            return fn(*args, **kwargs)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._pending[lane] -= 1
+                st = self._stats.get(op)
+                if st is None:
+                    st = self._stats[op] = _OpStats()
+                st.count += 1
+                st.errors += failed
+                st.total_s += elapsed
+                st.max_s = max(st.max_s, elapsed)
+                st.wait_s += started - submitted
+                st.recent.append(elapsed)
+
+    def _submit(self, op: str, fn: Callable[..., T], args: Tuple, kwargs: Dict, bulk: bool):
+        lane = "bulk" if bulk else "fast"
+        with self._lock:
+            self._pending[lane] += 1
+        # the caller's context (request id for log lines) goes along to the worker
+        context = contextvars.copy_context()
+        return self._pools[lane].submit(context.run, self._timed, op, lane, time.perf_counter(), fn, args, kwargs)
+
+    async def run(self, op: str, fn: Callable[..., T], *args: Any, bulk: bool = False, **kwargs: Any) -> T:
+        """Run blocking `fn(*args, **kwargs)` in the pool and await its result."""
+        return await asyncio.wrap_future(self._submit(op, fn, args, kwargs, bulk))
+
+    def call(self, op: str, fn: Callable[..., T], *args: Any, bulk: bool = False, **kwargs: Any) -> T:
+        """Blocking variant for code that already runs in a worker thread."""
+        if threading.current_thread().name.startswith(self.THREAD_PREFIX):
+            # nested call from inside the pool: waiting on it could deadlock
+            return fn(*args, **kwargs)
+        return self._submit(op, fn, args, kwargs, bulk).result()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": {lane: pool._max_workers for lane, pool in self._pools.items()},
+                "pending": dict(self._pending),
+                "ops": {op: st.snapshot() for op, st in sorted(self._stats.items())},
+            }
+
+
+executor = IOExecutor(settings.io_workers, settings.io_bulk_workers)
+
+
+# ---------- async wrappers ---------- #
+async def read_bytes(path: str | os.PathLike) -> bytes:
+    """Whole file (through `read_cache`); files above `IO_BULK_BYTES` are read on the bulk pool."""
+    data = await executor.run("read", read_cache.read, path, settings.io_bulk_bytes)
+    if data is None:
+        data = await executor.run("read", read_cache.read, path, bulk=True)
+    return data
+
+
+async def read_text(path: str | os.PathLike, encoding: str = "utf-8", errors: str = "replace") -> str:
+    data = await read_bytes(path)
+    if len(data) > settings.io_bulk_bytes:
+        return await executor.run("decode", data.decode, encoding, errors, bulk=True)
+    return data.decode(encoding, errors)
+
+
+async def write(path: str | os.PathLike, data: str | bytes) -> None:
+    """`atomic_write` on the pool (the bulk one for large payloads)."""
+    await executor.run("write", atomic_write, path, data, bulk=len(data) > settings.io_bulk_bytes)
+
+
+async def stat(path: str | os.PathLike) -> os.stat_result:
+    return await executor.run("stat", os.stat, path)
+
+
+async def exists(path: str | os.PathLike) -> bool:
+    return await executor.run("stat", os.path.exists, path)
+
+
+async def is_file(path: str | os.PathLike) -> bool:
+    return await executor.run("stat", os.path.isfile, path)
+
+
+async def is_dir(path: str | os.PathLike) -> bool:
+    return await executor.run("stat", os.path.isdir, path)
+
+
+def _scandir(path: str | os.PathLike) -> List[Tuple[str, bool, os.stat_result]]:
+    found = []
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                found.append((entry.name, entry.is_dir(), entry.stat()))
+            except FileNotFoundError:
+                continue  # removed while listing
+    return found
+
+
+async def scandir(path: str | os.PathLike) -> List[Tuple[str, bool, os.stat_result]]:
+    """`(name, is_dir, stat)` for each entry of a directory, in one pool call."""
+    return await executor.run("list", _scandir, path)
+
+
+async def rename(src: str | os.PathLike, dst: str | os.PathLike) -> None:
+    await executor.run("rename", os.rename, src, dst)
+    read_cache.invalidate_tree(src)
+
+
+async def remove(path: str | os.PathLike) -> None:
+    await executor.run("delete", os.remove, path)
+    read_cache.invalidate(path)
+
+
+async def rmdir(path: str | os.PathLike) -> None:
+    await executor.run("delete", os.rmdir, path)
+
+
+async def makedirs(path: str | os.PathLike) -> None:
+    await executor.run("mkdir", functools.partial(os.makedirs, exist_ok=True), path)
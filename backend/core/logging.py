@@ -1,23 +1,102 @@
+import json
 import logging
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Tuple
+
 from fastapi import FastAPI, Request
 
+from backend.core import metrics
+from backend.core.settings import settings
+
+# Request tracing: the id of the request being served (also in every log line)
+# and the spans timed while serving it. Context variables follow the request
+# into worker threads started with `run_in_threadpool` and the I/O pool.
+request_id: ContextVar[str] = ContextVar("request_id", default="-")
+_spans: ContextVar[List[Tuple[str, float]] | None] = ContextVar("spans", default=None)
+
+
+class _RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
 
 def setup_logging() -> None:
     """Configure root logger; call once on startup."""
     logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s - %(levelname)s - %(message)s",
+        level=settings.log_level.upper(),
+        format="%(asctime)s - %(levelname)s - [%(request_id)s] %(message)s",
+    )
+    for handler in logging.getLogger().handlers:
+        if not any(isinstance(f, _RequestIdFilter) for f in handler.filters):
+            handler.addFilter(_RequestIdFilter())
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time the body as part of the current request's trace (no-op outside a request)."""
+    spans = _spans.get()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if spans is not None:
+            spans.append((name, time.perf_counter() - started))
+
+
+def _summary(spans: List[Tuple[str, float]]) -> str:
+    totals: Dict[str, List[float]] = {}
+    for name, elapsed in spans:
+        total = totals.setdefault(name, [0, 0.0])
+        total[0] += 1
+        total[1] += elapsed
+    return ", ".join(
+        f"{name} {n:.0f}x {elapsed * 1000:.0f}ms" if n > 1 else f"{name} {elapsed * 1000:.0f}ms"
+        for name, (n, elapsed) in totals.items()
     )
 
 
+class lazy_json:
+    """Log argument that is serialized only if the record is actually emitted."""
+
+    def __init__(self, obj: Any, limit: int = 2000):
+        self.obj = obj
+        self.limit = limit
+
+    def __str__(self) -> str:
+        try:
+            return json.dumps(self.obj, indent=2, default=str)[:self.limit]
+        except (TypeError, ValueError):
+            return repr(self.obj)[:self.limit]
+
+
 def add_logging_middleware(app: FastAPI) -> None:
-    """Attach request/response logging to the FastAPI app."""
+    """Attach request tracing, logging and latency metrics to the FastAPI app."""
     setup_logging()
     logger = logging.getLogger("backend")
 
     @app.middleware("http")
     async def _log_requests(request: Request, call_next):  # type: ignore[override]
-        logger.info("%s %s", request.method, request.url.path)
-        response = await call_next(request)
-        logger.info("Completed %s", response.status_code)
-        return response
+        rid = request.headers.get("x-request-id") or uuid.uuid4().hex[:16]
+        rid_token, spans_token = request_id.set(rid), _spans.set([])
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            response.headers["X-Request-ID"] = rid
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            route = getattr(request.scope.get("route"), "path", None) or "unmatched"
+            metrics.http_requests.observe(elapsed, method=request.method, route=route, status=str(status))
+            spans = _spans.get() or []
+            logger.info(
+                "%s %s %s %.1fms%s", request.method, request.url.path, status, elapsed * 1000,
+                f" ({_summary(spans)})" if spans else "",
+            )
+            _spans.reset(spans_token)
+            request_id.reset(rid_token)
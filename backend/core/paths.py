@@ -0,0 +1,162 @@
+"""Path resolution and file classification for the file API.
+
+Client paths are resolved against the current root and checked for escapes
+once per (root, path): the result depends on the strings alone, so it is kept
+in a bounded LRU. File types come from precomputed extension tables. A file
+whose name says nothing (`Dockerfile`, `.env.local`, `CHANGELOG`) is
+classified by its first block (NUL bytes or invalid UTF-8 mean binary); the
+verdict is memoized per file version (mtime_ns, size, inode).
+"""
+from __future__ import annotations
+
+import codecs
+import functools
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+from backend.core.fileio import executor as io_pool
+
+RESOLVE_CACHE_MAX = 4096
+SNIFF_CACHE_MAX = 4096
+SNIFF_BYTES = 8192
+
+
+def _table(**groups: str) -> Dict[str, str]:
+    return {ext: kind for kind, exts in groups.items() for ext in exts.split()}
+
+
+FILE_TYPES = _table(
+    image=".jpg .jpeg .png .gif .bmp .webp",
+    document=".pdf .doc .docx .txt .ppt .pptx .xls .xlsx",
+    video=".mp4 .avi .mov .wmv .mkv",
+    audio=".mp3 .wav .ogg .flac",
+    archive=".zip .rar .tar .gz .7z",
+)
+
+TEXT_EXTENSIONS = frozenset("""
+    .txt .md .markdown .rst .py .pyi .js .mjs .cjs .jsx .ts .tsx .json .jsonc .html .htm .css .scss .sass
+    .less .vue .svelte .csv .tsv .log .xml .svg .yml .yaml .toml .ini .cfg .conf .env .sh .bash .zsh
+    .sql .graphql .c .h .cpp .hpp .cc .java .kt .go .rs .rb .php .swift .lua .r .pl .tex .lock .map
+""".split())
+
+TEXT_NAMES = frozenset("""
+    dockerfile makefile procfile gemfile rakefile license readme changelog
+    .gitignore .gitattributes .dockerignore .npmignore .env .editorconfig .npmrc .nvmrc
+    .prettierrc .eslintrc .babelrc .python-version
+""".split())
+
+BINARY_EXTENSIONS = frozenset(
+    {ext for ext, kind in FILE_TYPES.items() if kind != "document"}
+    | {".pdf", ".doc", ".docx", ".ppt", ".pptx", ".xls", ".xlsx", ".ico", ".woff", ".woff2", ".ttf",
+       ".otf", ".eot", ".exe", ".dll", ".so", ".dylib", ".o", ".a", ".pyc", ".whl", ".bz2", ".xz",
+       ".tgz", ".jar", ".wasm", ".sqlite", ".db", ".bin"}
+)
+
+
+class InvalidPath(ValueError):
+    pass
+
+
+# ---------- resolution ---------- #
+
+@functools.lru_cache(maxsize=RESOLVE_CACHE_MAX)
+def _resolve(root: str, rel_path: str) -> str | None:
+    safe_path = os.path.normpath(os.path.join(root, rel_path.strip("/")))
+    if os.path.commonpath([safe_path, root]) != root:  # path traversal
+        return None
+    return safe_path
+
+
+def resolve(root: str, rel_path: str) -> str:
+    """Absolute path of client path `rel_path` below `root`; raises `InvalidPath` if it escapes."""
+    safe_path = _resolve(root, rel_path)
+    if safe_path is None:
+        raise InvalidPath(rel_path)
+    return safe_path
+
+
+# ---------- classification ---------- #
+
+def _ext(name: str) -> str:
+    return os.path.splitext(name)[1].lower()
+
+
+def file_type(name: str) -> str:
+    """`image`, `document`, `video`, `audio`, `archive` or `default`, from the extension."""
+    return FILE_TYPES.get(_ext(name), "default")
+
+
+def text_by_name(path: str) -> bool | None:
+    """Whether the name alone marks a text (True) or binary (False) file; None if it cannot tell."""
+    name = os.path.basename(path).lower()
+    ext = _ext(name)
+    if ext in TEXT_EXTENSIONS or name in TEXT_NAMES:
+        return True
+    if ext in BINARY_EXTENSIONS:
+        return False
+    return None
+
+
+class _Sniffer:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._seen: "OrderedDict[str, Tuple[Tuple[int, int, int], bool]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def is_text(self, path: str, st: os.stat_result | None = None) -> bool:
+        st = st or os.stat(path)
+        key = (st.st_mtime_ns, st.st_size, st.st_ino)
+        with self._lock:
+            seen = self._seen.get(path)
+            if seen is not None and seen[0] == key:
+                self._seen.move_to_end(path)
+                self.hits += 1
+                return seen[1]
+            self.misses += 1
+        with open(path, "rb") as f:
+            block = f.read(SNIFF_BYTES)
+        text = b"\0" not in block
+        if text:
+            try:
+                codecs.getincrementaldecoder("utf-8")().decode(block, final=False)  # may end mid-character
+            except UnicodeDecodeError:
+                text = False
+        with self._lock:
+            self._seen[path] = (key, text)
+            self._seen.move_to_end(path)
+            while len(self._seen) > self.max_entries:
+                self._seen.popitem(last=False)
+        return text
+
+
+_sniffer = _Sniffer(SNIFF_CACHE_MAX)
+
+
+def is_text_file(path: str, st: os.stat_result | None = None) -> bool:
+    """Text by extension or name, else by content; False if it cannot be read."""
+    known = text_by_name(path)
+    if known is not None:
+        return known
+    try:
+        return _sniffer.is_text(path, st)
+    except OSError:
+        return False
+
+
+async def is_text(path: str, st: os.stat_result | None = None) -> bool:
+    """`is_text_file` without blocking the event loop (only sniffing touches the disk)."""
+    known = text_by_name(path)
+    if known is not None:
+        return known
+    return await io_pool.run("sniff", is_text_file, path, st)
+
+
+def stats() -> Dict[str, Any]:
+    info = _resolve.cache_info()
+    return {
+        "resolve": {"hits": info.hits, "misses": info.misses, "entries": info.currsize},
+        "sniff": {"hits": _sniffer.hits, "misses": _sniffer.misses, "entries": len(_sniffer._seen)},
+    }
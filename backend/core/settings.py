@@ -15,6 +15,57 @@ class Settings(BaseSettings):
     secret_key: str = "piskachort"
     file_manager_pin: str = "1234"
     cors_origins: List[str] = ["*"]
+    log_level: str = "INFO"  # DEBUG also logs LLM responses and request payloads
+
+    # Sandboxes
+    preview_proxy: bool = True  # serve dev servers under /preview/<project>/ on the backend's port
+    backend_public_url: str = "http://localhost:8000"  # base of preview URLs handed to users
+    preview_max_connections: int = 32  # concurrent proxied requests per sandbox
+    sandbox_pool_size: int = 1  # pre-built sandboxes kept ready for `init`; 0 disables the pool
+    sandbox_cache_dir: str = ""  # host-wide pip cache, wheelhouse and venv template (default ~/.cache/replicate-hub)
+    sandbox_venv_packages: List[str] = []  # preinstalled in the venv template every sandbox is cloned from
+    exec_output_max_bytes: int = 1024 * 1024  # output kept per terminal command (ring buffer)
+    exec_global_concurrency: int = 8  # terminal commands running at once across all sandboxes
+    exec_sandbox_concurrency: int = 2  # ... and per sandbox; the rest wait in a fair queue
+    # rlimits for sandbox processes; 0 = unlimited. The dev server only gets open_files/processes/priorities.
+    exec_cpu_seconds: int = 600
+    exec_memory_mb: int = 0  # address space; many JS tools reserve large virtual ranges, so opt-in
+    exec_open_files: int = 1024
+    exec_processes: int = 0  # RLIMIT_NPROC is per host user, not per sandbox
+    exec_nice: int = 5
+    exec_ionice_class: int = 2  # best-effort (at the lowest level)
+    pty_scrollback_bytes: int = 256 * 1024  # scrollback replayed when a client re-attaches to a shell
+    sandbox_hibernate_after_s: int = 30 * 60  # suspended dev servers are terminated after this much more idle time
+    dev_log_max_lines: int = 2000  # dev-server output lines kept in memory per sandbox
+    pty_idle_timeout_s: int = 15 * 60  # detached shell sessions are closed after this long without output/input
+    watch_debounce_ms: int = 200  # file-change events are coalesced for this long before clients are notified
+    watch_poll_interval_s: float = 2.0  # polling fallback when inotify is unavailable
+    checkpoint_keep: int = 20  # workspace checkpoints kept per sandbox (newest first); 0 = no count limit
+    checkpoint_max_age_h: int = 72  # older checkpoints are pruned; 0 = no age limit
+
+    # Filesystem I/O (thread pools used by request handlers, see backend.core.fileio)
+    io_workers: int = 8  # metadata operations and small reads/writes
+    io_bulk_workers: int = 4  # reads/writes above io_bulk_bytes
+    io_bulk_bytes: int = 1024 * 1024
+    read_cache_bytes: int = 64 * 1024 * 1024  # file contents kept in memory for repeated reads; 0 = off
+    read_cache_max_file_bytes: int = 1024 * 1024  # larger files are never cached
+    compress_min_bytes: int = 4096  # text downloads and /api/read bodies above this are gzipped (if accepted)
+    upload_max_bytes: int = 2 * 1024 ** 3  # per file; 0 = unlimited
+    upload_chunk_max_bytes: int = 16 * 1024 * 1024  # largest chunk accepted by the resumable upload API
+    upload_expiry_h: int = 24  # unfinished resumable uploads are removed after this long without a chunk
+
+    # Background jobs (archive extraction, ...; see backend.jobs)
+    job_workers: int = 2
+    archive_max_bytes: int = 4 * 1024 ** 3  # largest total size an archive may extract to; 0 = unlimited
+    archive_max_members: int = 100_000
+    archive_max_ratio: int = 100  # extracted bytes per archive byte, against zip bombs; 0 = no check
+
+    # Project catalog and garbage collection (see backend.project_catalog)
+    catalog_scan_interval_s: int = 600  # every project is measured again this often
+    project_gc_interval_s: int = 3600  # 0 disables garbage collection
+    project_gc_patterns: List[str] = ["test*"]  # only projects whose name matches are ever collected
+    project_gc_keep: int = 2  # matching projects kept (most recently active first); 0 = no count limit
+    project_gc_max_age_h: int = 0  # matching projects idle longer are removed; 0 = no age limit
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
@@ -26,3 +77,4 @@ BACKEND_DIR: Path = Path(__file__).resolve().parent.parent
 REPO_ROOT: Path = BACKEND_DIR.parent
 WORKSPACES_ROOT: Path = REPO_ROOT / "workspaces"
 WORKSPACES_ROOT.mkdir(parents=True, exist_ok=True)
+SANDBOX_CACHE_DIR: Path = Path(settings.sandbox_cache_dir or Path.home() / ".cache" / "replicate-hub")
@@ -0,0 +1,164 @@
+"""Dev-server output capture and readiness tracking.
+
+The dev server writes to a log file (so it keeps running detached across
+backend reloads); a tail thread feeds new lines into a bounded ring buffer
+and drives the lifecycle state machine:
+
+    idle → installing → starting → ready → (crashed | stopped)
+
+and, driven by the idle reaper, ready ⇄ suspended → hibernated.
+
+`ready` is reached when the output announces the server (Vite's
+"ready in" / "Local:" lines) or, as a fallback, when the port accepts TCP
+connections.
+"""
+from __future__ import annotations
+
+import re
+import socket
+import subprocess
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Tuple
+
+_ANSI_RE = re.compile(r"\x1b\[[0-9;?]*[ -/]*[@-~]")
+_READY_RE = re.compile(r"ready in \d+|server running at|listening on", re.IGNORECASE)
+_URL_RE = re.compile(r"Local:\s+(https?://\S+)")
+
+
+class DevServerMonitor:
+    IDLE, INSTALLING, STARTING, READY, CRASHED, STOPPED = (
+        "idle", "installing", "starting", "ready", "crashed", "stopped",
+    )
+    SUSPENDED, HIBERNATED = "suspended", "hibernated"
+    POLL_INTERVAL_S = 0.2
+    PROBE_INTERVAL_S = 1.0
+    MAX_HISTORY = 20
+
+    def __init__(self, max_lines: int = 2000):
+        self.lines: Deque[Tuple[int, str]] = deque(maxlen=max_lines)
+        self.next_seq = 1
+        self.state = self.IDLE
+        self.history: Deque[Dict[str, Any]] = deque(maxlen=self.MAX_HISTORY)
+        self.local_url: str | None = None
+        self.exit_code: int | None = None
+        self._cond = threading.Condition()
+        self._proc: subprocess.Popen | None = None
+        self._port: int | None = None
+        self._generation = 0  # bumps on every restart so stale tail threads exit
+
+    # ---------- state ---------- #
+    def set_state(self, state: str, **info: Any) -> None:
+        with self._cond:
+            if state == self.state:
+                return
+            self.state = state
+            self.history.append({"state": state, "at": time.time(), **info})
+            self._cond.notify_all()
+
+    def status(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "state": self.state,
+                "history": list(self.history),
+                "localUrl": self.local_url,
+                "exitCode": self.exit_code,
+                "pid": self._proc.pid if self._proc else None,
+            }
+
+    def wait_ready(self, timeout: float) -> bool:
+        """Block until the server is ready, has crashed/stopped, or `timeout` passes."""
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self.state in (self.READY, self.CRASHED, self.STOPPED, self.IDLE),
+                timeout,
+            )
+            return self.state == self.READY
+
+    # ---------- log buffer ---------- #
+    def append(self, line: str) -> None:
+        line = _ANSI_RE.sub("", line.rstrip("\r\n"))
+        with self._cond:
+            self.lines.append((self.next_seq, line))
+            self.next_seq += 1
+            self._cond.notify_all()
+        m = _URL_RE.search(line)
+        if m:
+            self.local_url = m.group(1)
+        if self.state == self.STARTING and (m or _READY_RE.search(line)):
+            self.set_state(self.READY, via="log")
+
+    def since(self, seq: int = 0, limit: int | None = None) -> List[Dict[str, Any]]:
+        with self._cond:
+            items = [{"seq": s, "text": t} for s, t in self.lines if s > seq]
+        return items[-limit:] if limit else items
+
+    def tail(self, n: int) -> List[str]:
+        with self._cond:
+            return [t for _, t in list(self.lines)[-n:]]
+
+    # ---------- capture ---------- #
+    def begin(self, log_path: Path, port: int) -> None:
+        """Reset for a new run and start tailing `log_path`."""
+        with self._cond:
+            self._generation += 1
+            generation = self._generation
+            self.lines.clear()
+            self.local_url = None
+            self.exit_code = None
+            self._proc = None
+            self._port = port
+        threading.Thread(
+            target=self._follow, args=(log_path, generation), name="dev-log-tail", daemon=True,
+        ).start()
+
+    def attach(self, proc: subprocess.Popen) -> None:
+        with self._cond:
+            self._proc = proc
+        self.set_state(self.STARTING, pid=proc.pid)
+
+    def _follow(self, log_path: Path, generation: int) -> None:
+        partial = b""
+        last_probe = 0.0
+        with open(log_path, "ab+") as f:
+            f.seek(0)
+            while generation == self._generation:
+                chunk = f.read(65536)
+                if chunk:
+                    *complete, partial = (partial + chunk).split(b"\n")
+                    for raw in complete:
+                        self.append(raw.decode("utf-8", errors="replace"))
+                    continue
+                proc = self._proc
+                if proc is not None and proc.poll() is not None:
+                    # the process may have written more between our last read and exiting
+                    for raw in (partial + f.read()).split(b"\n"):
+                        if raw:
+                            self.append(raw.decode("utf-8", errors="replace"))
+                    self._on_exit(proc.returncode, generation)
+                    return
+                now = time.monotonic()
+                if self.state == self.STARTING and now - last_probe >= self.PROBE_INTERVAL_S:
+                    last_probe = now
+                    if self._port_open():
+                        self.set_state(self.READY, via="probe")
+                time.sleep(self.POLL_INTERVAL_S)
+
+    def _on_exit(self, code: int, generation: int) -> None:
+        with self._cond:
+            if generation != self._generation:
+                return
+            self.exit_code = code
+        if self.state not in (self.STOPPED, self.HIBERNATED):
+            self.set_state(self.CRASHED, exitCode=code)
+
+    def _port_open(self) -> bool:
+        if not self._port:
+            return False
+        try:
+            with socket.create_connection(("127.0.0.1", self._port), timeout=0.5):
+                return True
+        except OSError:
+            return False
@@ -0,0 +1,173 @@
+"""Background jobs for long file operations (archive extraction, recursive copies, ...).
+
+A job is a blocking function `fn(job, *args)` run on a small dedicated
+thread pool, so hour-long work never occupies the request I/O pool. It
+reports progress through `job.progress(...)` and should call
+`job.check_cancelled()` between units of work; `cancel` only sets a flag.
+Finished jobs are kept (newest `HISTORY` of them) so clients can poll the
+result after the fact.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from backend.core.settings import settings
+
+logger = logging.getLogger("backend")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, kind: str, description: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.description = description
+        self.state = self.QUEUED
+        self.done = 0
+        self.total = 0
+        self.unit = ""
+        self.message = ""
+        self.result: Any = None
+        self.error: str | None = None
+        self.created_at = time.time()
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self._cancel = threading.Event()
+        self._mutex = threading.Lock()
+        self.version = 0  # bumped on every change; lets pollers skip unchanged jobs
+
+    # ---------- called by the job function ---------- #
+    def progress(self, done: int | None = None, total: int | None = None,
+                 unit: str | None = None, message: str | None = None, advance: int = 0) -> None:
+        with self._mutex:
+            if total is not None:
+                self.total = total
+            if done is not None:
+                self.done = done
+            self.done += advance
+            if unit is not None:
+                self.unit = unit
+            if message is not None:
+                self.message = message
+            self._bump()
+
+    def check_cancelled(self) -> None:
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    # ---------- bookkeeping ---------- #
+    def _bump(self) -> None:
+        self.version += 1
+
+    def _set_state(self, state: str) -> None:
+        with self._mutex:
+            self.state = state
+            now = time.time()
+            if state == self.RUNNING:
+                self.started_at = now
+            elif state in (self.DONE, self.FAILED, self.CANCELLED):
+                self.finished_at = now
+            self._bump()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in (self.DONE, self.FAILED, self.CANCELLED)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "description": self.description,
+            "state": self.state,
+            "done": self.done,
+            "total": self.total,
+            "unit": self.unit,
+            "message": self.message,
+            "result": self.result,
+            "error": self.error,
+            "createdAt": self.created_at,
+            "startedAt": self.started_at,
+            "finishedAt": self.finished_at,
+        }
+
+
+class JobManager:
+    HISTORY = 100
+
+    def __init__(self, workers: int):
+        self._pool = ThreadPoolExecutor(max(1, workers), thread_name_prefix="job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, description: str, fn: Callable[..., Any], *args: Any) -> Job:
+        job = self.track(kind, description)
+        self._pool.submit(self.run, job, fn, *args)
+        return job
+
+    def track(self, kind: str, description: str) -> Job:
+        """Register a job the caller runs itself (via `run`), e.g. one fed by a request body."""
+        job = Job(kind, description)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._trim()
+        return job
+
+    def run(self, job: Job, fn: Callable[..., Any], *args: Any) -> None:
+        """Run `fn(job, *args)` in the calling thread, recording its outcome on `job`."""
+        if job.cancelled:
+            job._set_state(Job.CANCELLED)
+            return
+        job._set_state(Job.RUNNING)
+        started = time.perf_counter()
+        try:
+            job.result = fn(job, *args)
+            job._set_state(Job.DONE)
+        except JobCancelled:
+            job._set_state(Job.CANCELLED)
+        except Exception as e:  # noqa: BLE001
+            logger.warning("job %s (%s) failed: %s", job.id, job.kind, e)
+            job.error = str(e)
+            job._set_state(Job.FAILED)
+        logger.info("job %s (%s): %s in %.2fs", job.id, job.kind, job.state, time.perf_counter() - started)
+
+    def _trim(self) -> None:
+        finished = [j for j in self._jobs.values() if j.finished]
+        for job in finished[:max(0, len(finished) - self.HISTORY)]:
+            del self._jobs[job.id]
+
+    def get(self, job_id: str) -> Job | None:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [job.snapshot() for job in reversed(self._jobs.values())]
+
+    def cancel(self, job_id: str) -> Job | None:
+        job = self._jobs.get(job_id)
+        if job is not None and not job.finished:
+            job._cancel.set()
+            with job._mutex:
+                job._bump()
+        return job
+
+
+jobs = JobManager(settings.job_workers)
@@ -14,3 +14,4 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     assistant: str
     messages: List[Dict[str, Any]]
+    checkpoint: Optional[str] = Field(default=None, description="Workspace checkpoint taken before this turn")
@@ -0,0 +1,286 @@
+"""Project catalog: per-project metadata served from memory.
+
+Every project (a folder under `workspaces/`, together with its sandbox folder
+if it has one) has an entry with disk usage, file count, last modification,
+last opening and dev-server state. Entries are measured by one low-priority
+background thread: all of them every `CATALOG_SCAN_INTERVAL_S`, and a single
+project a few seconds after it was created, opened or changed (the file
+watcher reports every write in the active sandbox). The catalog is saved to
+`workspaces/.catalog.json`, so a restart serves the last numbers at once.
+
+The same thread collects garbage every `PROJECT_GC_INTERVAL_S`: projects
+whose name matches `PROJECT_GC_PATTERNS` are removed beyond the
+`PROJECT_GC_KEEP` most recently active ones, or once idle for more than
+`PROJECT_GC_MAX_AGE_H` (never the active sandbox's project).
+"""
+from __future__ import annotations
+
+import fnmatch
+import json
+import logging
+import os
+import shutil
+import stat
+import threading
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List
+
+from backend.core.fileio import atomic_write
+from backend.core.settings import WORKSPACES_ROOT, settings
+from backend.sandbox import SandboxManager, manager as sandbox_manager
+from backend.sandbox_limits import lower_thread_priority
+from backend.sandbox_reaper import reaper
+from backend.sandbox_watch import watcher
+
+logger = logging.getLogger("backend")
+
+SORT_KEYS = ("name", "size", "files", "modified", "opened")
+
+
+class ProjectCatalog:
+    FILENAME = ".catalog.json"
+    DIRTY_DELAY_S = 5.0  # a changed project is measured again this long after its last change
+    MAX_EVENTS = 50
+
+    def __init__(self, root: Path, sandboxes: SandboxManager, scan_interval_s: int, gc_interval_s: int):
+        self.root = root
+        self.sandboxes = sandboxes
+        self.scan_interval_s = scan_interval_s
+        self.gc_interval_s = gc_interval_s
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.dirty: Dict[str, float] = {}  # name → when it was last marked
+        self.last_scan = 0.0
+        self.last_gc = time.time()  # first collection one interval after startup
+        self.gc_events: Deque[Dict[str, Any]] = deque(maxlen=self.MAX_EVENTS)
+        self._lock = threading.Lock()
+        self._gc_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._load()
+
+    # ---------- persistence ---------- #
+    def _load(self) -> None:
+        try:
+            self.entries = json.loads((self.root / self.FILENAME).read_text())
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def _save(self) -> None:
+        with self._lock:
+            data = json.dumps(self.entries)
+        try:
+            atomic_write(self.root / self.FILENAME, data)
+        except OSError as e:
+            logger.warning("catalog: cannot save: %s", e)
+
+    # ---------- lifecycle ---------- #
+    def start(self) -> None:
+        if self._thread is None:
+            if self._on_changes not in watcher.listeners:
+                watcher.subscribe(self._on_changes)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="project-catalog", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join(5)
+            self._thread = None
+
+    # ---------- updates from write paths ---------- #
+    def _entry(self, name: str) -> Dict[str, Any]:
+        return self.entries.setdefault(name, {"bytes": 0, "files": 0, "modified": None, "opened": None, "scannedAt": None})
+
+    def mark_dirty(self, name: str, modified: bool = False, opened: bool = False) -> None:
+        if not (self.root / name).is_dir():
+            return  # a sandbox without a project folder
+        now = time.time()
+        with self._lock:
+            entry = self._entry(name)
+            if modified:
+                entry["modified"] = now
+            if opened:
+                entry["opened"] = now
+            self.dirty[name] = now
+        self._wake.set()
+
+    def _on_changes(self, sandbox_id: str, changes: List[Dict[str, Any]]) -> None:
+        self.mark_dirty(sandbox_id, modified=True)
+
+    # ---------- measuring ---------- #
+    def _dirs(self, name: str) -> List[Path]:
+        return [d for d in (self.root / name, self.sandboxes.workspace_root / name) if d.is_dir()]
+
+    def measure(self, name: str) -> Dict[str, Any] | None:
+        """Walk a project's folders: allocated bytes (hardlinked inodes once), files, newest mtime."""
+        dirs = self._dirs(name)
+        if not dirs or dirs[0] != self.root / name:
+            return None
+        seen = set()
+        size = files = 0
+        newest = 0.0
+        stack = [str(d) for d in dirs]
+        while stack:
+            if self._stop.is_set():
+                return None
+            current = stack.pop()
+            try:
+                entries = list(os.scandir(current))
+            except OSError:
+                continue
+            for entry in entries:
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                newest = max(newest, st.st_mtime)
+                if stat.S_ISDIR(st.st_mode):
+                    stack.append(entry.path)
+                    continue
+                if st.st_nlink > 1:
+                    if (st.st_dev, st.st_ino) in seen:
+                        continue
+                    seen.add((st.st_dev, st.st_ino))
+                if stat.S_ISREG(st.st_mode):
+                    files += 1
+                size += st.st_blocks * 512
+        return {"bytes": size, "files": files, "modified": newest or dirs[0].stat().st_mtime, "scannedAt": time.time()}
+
+    def _update(self, name: str) -> None:
+        measured = self.measure(name)
+        with self._lock:
+            if measured is None:
+                if not (self.root / name).is_dir():
+                    self.entries.pop(name, None)
+                return
+            entry = self._entry(name)
+            # a change seen by the watcher may be newer than any mtime (deletions)
+            measured["modified"] = max(measured["modified"], entry.get("modified") or 0)
+            entry.update(measured)
+
+    def scan(self) -> None:
+        """Measure every project; forget the ones that are gone."""
+        names = [d.name for d in os.scandir(self.root) if d.is_dir() and not d.name.startswith(".")]
+        with self._lock:
+            for name in set(self.entries) - set(names):
+                del self.entries[name]
+        for name in names:
+            if self._stop.is_set():
+                return
+            self._update(name)
+        self.last_scan = time.time()
+        self._save()
+
+    def _run(self) -> None:
+        lower_thread_priority()
+        while not self._stop.is_set():
+            now = time.time()
+            try:
+                if now - self.last_scan >= self.scan_interval_s:
+                    self.scan()
+                with self._lock:
+                    due = [n for n, t in self.dirty.items() if now - t >= self.DIRTY_DELAY_S]
+                    for name in due:
+                        del self.dirty[name]
+                for name in due:
+                    self._update(name)
+                if due:
+                    self._save()
+                if self.gc_interval_s and now - self.last_gc >= self.gc_interval_s:
+                    self.gc()
+            except Exception:
+                logger.exception("catalog pass failed")
+            with self._lock:
+                waits = [t + self.DIRTY_DELAY_S - now for t in self.dirty.values()]
+            waits.append(self.last_scan + self.scan_interval_s - now)
+            if self.gc_interval_s:
+                waits.append(self.last_gc + self.gc_interval_s - now)
+            self._wake.wait(max(0.5, min(waits)))
+            self._wake.clear()
+
+    # ---------- queries ---------- #
+    def _activity(self, name: str, entry: Dict[str, Any]) -> float:
+        return max(entry.get("modified") or 0, entry.get("opened") or 0, reaper.last_activity.get(name, 0))
+
+    def list(self, sort: str = "name", reverse: bool = False, offset: int = 0, limit: int = 0) -> Dict[str, Any]:
+        active = self.sandboxes.meta.get("sandboxId")
+        with self._lock:
+            items = []
+            for name, entry in self.entries.items():
+                opened = max(entry.get("opened") or 0, reaper.last_activity.get(name, 0)) or None
+                items.append({
+                    "name": name,
+                    "bytes": entry.get("bytes", 0),
+                    "files": entry.get("files", 0),
+                    "modified": entry.get("modified"),
+                    "opened": opened,
+                    "active": name == active,
+                    "devServer": self.sandboxes.dev.state if name == active else None,
+                    "scannedAt": entry.get("scannedAt"),
+                })
+        key = {
+            "name": lambda p: p["name"].lower(),
+            "size": lambda p: p["bytes"],
+            "files": lambda p: p["files"],
+            "modified": lambda p: p["modified"] or 0,
+            "opened": lambda p: p["opened"] or 0,
+        }[sort]
+        items.sort(key=key, reverse=reverse)
+        page = items[offset:offset + limit] if limit else items[offset:]
+        return {"items": page, "total": len(items), "offset": offset, "lastScan": self.last_scan or None}
+
+    # ---------- garbage collection ---------- #
+    def gc(self, dry_run: bool = False) -> List[Dict[str, Any]]:
+        """Apply the retention policy; returns the projects removed (or that would be)."""
+        with self._gc_lock:
+            self.last_gc = time.time()
+            patterns = [p.lower() for p in settings.project_gc_patterns]
+            keep, max_age_s = settings.project_gc_keep, settings.project_gc_max_age_h * 3600
+            active = self.sandboxes.meta.get("sandboxId")
+            with self._lock:
+                candidates = [
+                    (self._activity(name, entry), name, entry.get("bytes", 0))
+                    for name, entry in self.entries.items()
+                    if name != active and any(fnmatch.fnmatchcase(name.lower(), p) for p in patterns)
+                ]
+            candidates.sort(reverse=True)
+            now = time.time()
+            removed = []
+            for i, (activity, name, size) in enumerate(candidates):
+                too_many = keep and i >= keep
+                too_old = max_age_s and now - activity > max_age_s
+                if not (too_many or too_old):
+                    continue
+                removed.append({"name": name, "bytes": size, "lastActivity": activity})
+                if dry_run:
+                    continue
+                for d in self._dirs(name):
+                    # out of sight first, so a half-deleted project never shows up
+                    trash = d.parent / f".gc-{name}-{uuid.uuid4().hex[:8]}"
+                    try:
+                        os.rename(d, trash)
+                    except OSError as e:
+                        logger.warning("catalog: cannot remove %s: %s", d, e)
+                        continue
+                    shutil.rmtree(trash, ignore_errors=True)
+                with self._lock:
+                    self.entries.pop(name, None)
+                self.gc_events.append({"name": name, "bytes": size, "at": now})
+                logger.info("catalog: removed project %s (%d bytes)", name, size)
+            if removed and not dry_run:
+                self._save()
+            return removed
+
+
+catalog = ProjectCatalog(
+    WORKSPACES_ROOT,
+    sandbox_manager,
+    settings.catalog_scan_interval_s,
+    settings.project_gc_interval_s,
+)
@@ -1,21 +1,42 @@
 import os
 import json
+import logging
 import uuid
 import shutil
+import signal
 import subprocess
+import threading
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, List
 
+from backend.core.fileio import atomic_write, read_cache
+from backend.core.settings import settings
+from backend.dev_server import DevServerMonitor
+from backend.sandbox_env import create_venv
+from backend.sandbox_limits import EXEC_LIMITS, SERVICE_LIMITS, limits_preexec
+from backend.sandbox_pool import SandboxPool
+
+logger = logging.getLogger("backend")
+
 
 class SandboxManager:
     """Manages a single live sandbox that runs inside a dedicated directory.
     For now we support one sandbox at a time. Later we could extend to multiple IDs.
     Persist minimal metadata to a JSON file so that the state survives backend restarts.
+    `cache` indexes the small files (path → size, last change); their contents
+    come from the shared `fileio.read_cache`, which keeps memory bounded.
     """
 
+    SMALL_FILE_BYTES = 10 * 1024
+
     CACHE_FILENAME = "sandbox_cache.json"
     META_FILENAME = "sandbox_meta.json"
+    POOL_DIRNAME = ".pool"
+    SAVE_DELAY_S = 2.0  # file watcher updates are persisted at most this often
+    LOGS_DIRNAME = ".logs"
+    CHECKPOINTS_DIRNAME = ".checkpoints"
+    UPLOADS_DIRNAME = ".uploads"
 
     EXCLUDED_PATTERNS = [
         "node_modules/**",
@@ -33,6 +54,11 @@ class SandboxManager:
         self.cache: Dict[str, Dict[str, Any]] = {}
         self.meta: Dict[str, Any] = {}
         self.process: subprocess.Popen | None = None
+        self.dev = DevServerMonitor(settings.dev_log_max_lines)
+        self._dev_lock = threading.RLock()
+        self._save_timer: threading.Timer | None = None
+        self._save_lock = threading.Lock()
+        self.pool = SandboxPool(self.workspace_root / self.POOL_DIRNAME, settings.sandbox_pool_size, self._prepare_sandbox)
         self._load_state()
 
     # ---------- Persistence helpers ---------- #
@@ -40,6 +66,8 @@ class SandboxManager:
         if self.cache_path.exists():
             try:
                 self.cache = json.loads(self.cache_path.read_text())
+                for entry in self.cache.values():
+                    entry.pop("content", None)  # written by older versions
             except Exception:
                 self.cache = {}
         if self.meta_path.exists():
@@ -49,9 +77,25 @@ class SandboxManager:
                 self.meta = {}
 
     def _save_state(self):
-        self.cache_path.write_text(json.dumps(self.cache, indent=2))
+        self.cache_path.write_text(json.dumps(dict(self.cache)))  # copy: watcher updates run in worker threads
         self.meta_path.write_text(json.dumps(self.meta, indent=2))
 
+    def _save_state_soon(self):
+        """Persist within `SAVE_DELAY_S`, coalescing frequent updates into one write."""
+        with self._save_lock:
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(self.SAVE_DELAY_S, self._save_deferred)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def _save_deferred(self):
+        with self._save_lock:
+            self._save_timer = None
+        try:
+            self._save_state()
+        except OSError as e:
+            logger.warning("cannot save sandbox state: %s", e)
+
     # ---------- Sandbox lifecycle ---------- #
     def is_active(self) -> bool:
         return self.process is not None and self.process.poll() is None
@@ -61,15 +105,13 @@ class SandboxManager:
         api_key = api_key or os.getenv("E2B_API_KEY")
         sandbox_id = project_name
         sandbox_dir = self.workspace_root / sandbox_id
-        if not sandbox_dir.exists():
+        # Fast path: adopt a pre-built sandbox; cold scaffold only when the pool is empty
+        if not sandbox_dir.exists() and not self.pool.claim(sandbox_dir):
             sandbox_dir.mkdir(parents=True, exist_ok=True)
             self._write_scaffold(sandbox_dir)
 
         # Ensure Python virtual environment exists for this sandbox
-        venv_dir = sandbox_dir / "venv"
-        if not venv_dir.exists():
-            import sys, subprocess
-            subprocess.run([sys.executable, "-m", "venv", "venv"], cwd=sandbox_dir, check=False)
+        create_venv(sandbox_dir)
 
         # Dev server networking metadata
         port = int(os.getenv("SANDBOX_PORT", "5173"))
@@ -80,7 +122,9 @@ class SandboxManager:
         now = datetime.utcnow().isoformat()
         self.meta = {
             "sandboxId": sandbox_id,
-            "url": host,
+            # through the backend's preview proxy when enabled, so one public port serves every sandbox
+            "url": f"{settings.backend_public_url.rstrip('/')}/preview/{sandbox_id}/" if settings.preview_proxy else host,
+            "directUrl": host,
             "host": host_bind,
             "port": port,
             "startedAt": now,
@@ -92,24 +136,58 @@ class SandboxManager:
         return self.meta
 
     def start_dev(self):
-        if self.process and self.is_active():
-            return self.meta  # already running
-        sandbox_dir = self._sandbox_dir()
-        subprocess.run(["npm", "install"], cwd=sandbox_dir, check=False)
-        port = str(self.meta.get("port", 5173))
-        host_bind = str(self.meta.get("host", "0.0.0.0"))
-        # Bind Vite to external interfaces if SANDBOX_HOST=0.0.0.0; run detached so backend reloads don't kill it
-        env = os.environ.copy()
-        env.setdefault("BROWSER", "none")
-        self.process = subprocess.Popen(
-            ["npm", "run", "dev", "--", "--host", host_bind, "--port", port],
-            cwd=sandbox_dir,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            start_new_session=True,
-            env=env,
-        )
-        return self.meta
+        with self._dev_lock:
+            if self.process and self.is_active():
+                return self.meta  # already running
+            sandbox_dir = self._sandbox_dir()
+            port = str(self.meta.get("port", 5173))
+            host_bind = str(self.meta.get("host", "0.0.0.0"))
+            log_path = self._dev_log_path()
+            log_path.parent.mkdir(parents=True, exist_ok=True)
+            # Output goes to a file rather than a pipe so the detached server survives backend reloads
+            with open(log_path, "wb") as log:
+                self.dev.begin(log_path, int(port))
+                if not self._deps_installed(sandbox_dir):
+                    self.dev.set_state(self.dev.INSTALLING)
+                    subprocess.run(["npm", "install"], cwd=sandbox_dir, check=False, stdout=log, stderr=subprocess.STDOUT)
+                # Bind Vite to external interfaces if SANDBOX_HOST=0.0.0.0; run detached so backend reloads don't kill it
+                env = os.environ.copy()
+                env.setdefault("BROWSER", "none")
+                # --strictPort: fail loudly instead of silently moving off the advertised port
+                argv = ["npm", "run", "dev", "--", "--host", host_bind, "--port", port, "--strictPort"]
+                if settings.preview_proxy:
+                    argv += ["--base", f"/preview/{self.meta['sandboxId']}/"]
+                try:
+                    self.process = subprocess.Popen(
+                        argv,
+                        cwd=sandbox_dir,
+                        stdout=log,
+                        stderr=subprocess.STDOUT,
+                        start_new_session=True,
+                        env=env,
+                        preexec_fn=limits_preexec(SERVICE_LIMITS),
+                    )
+                except OSError as e:
+                    self.dev.set_state(self.dev.CRASHED, error=str(e))
+                    raise
+            self.dev.attach(self.process)
+            return self.meta
+
+    def stop_dev(self, state: str | None = None):
+        """Stop the dev server (whole process group) but keep the workspace."""
+        with self._dev_lock:
+            if self.process and self.is_active():
+                self.dev.set_state(state or self.dev.STOPPED)
+                try:
+                    os.killpg(self.process.pid, signal.SIGCONT)  # a suspended group cannot handle SIGTERM
+                    os.killpg(self.process.pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+                try:
+                    self.process.wait(10)
+                except subprocess.TimeoutExpired:
+                    os.killpg(self.process.pid, signal.SIGKILL)
+            self.process = None
 
     # keep old create for backward compatibility
     def create(self, project_name: str, api_key: str | None = None, timeout_ms: int = 5 * 60_000):
@@ -118,13 +196,7 @@ class SandboxManager:
         return self.meta
 
     def kill(self):
-        if self.process and self.is_active():
-            self.process.terminate()
-            try:
-                self.process.wait(10)
-            except subprocess.TimeoutExpired:
-                self.process.kill()
-        self.process = None
+        self.stop_dev()
         # Remove workspace directory
         if self.meta.get("sandboxId"):
             sandbox_dir = self.workspace_root / self.meta["sandboxId"]
@@ -146,38 +218,79 @@ class SandboxManager:
             return
         sandbox_dir = self._sandbox_dir()
         full_path = sandbox_dir / rel_path
-        full_path.parent.mkdir(parents=True, exist_ok=True)
-        full_path.write_text(content)
-        self.cache[rel_path] = {"content": content, "lastModified": datetime.utcnow().isoformat()}
+        data = content.encode("utf-8")
+        atomic_write(full_path, data)
+        self._index(rel_path, len(data))
         self._save_state()
 
-    def read_files(self) -> Dict[str, str]:
-        """Return cached files (<10 KB) or walk filesystem first time."""
-        if self.cache:
-            return self.cache
+    def _index(self, rel_path: str, size: int):
+        if size < self.SMALL_FILE_BYTES:
+            self.cache[rel_path] = {"size": size, "lastModified": datetime.utcnow().isoformat()}
+        else:
+            self.cache.pop(rel_path, None)
+
+    def apply_file_changes(self, changes: List[Dict[str, Any]]):
+        """Fold changes reported by the file watcher into the cache (blocking: stats every changed file)."""
+        if not self.cache:
+            return  # nothing cached yet; read_files() walks the tree on demand
         sandbox_dir = self._sandbox_dir()
-        files: Dict[str, str] = {}
-        for path in sandbox_dir.rglob("*"):
-            if path.is_file() and path.stat().st_size < 10 * 1024:
-                rel = str(path.relative_to(sandbox_dir))
-                if self._should_exclude(rel):
-                    continue
-                files[rel] = {"content": path.read_text(errors="ignore"), "lastModified": datetime.utcnow().isoformat()}
-        self.cache = files
-        self._save_state()
+        for change in changes:
+            rel = change["path"]
+            if change["dir"]:
+                if change["kind"] == "deleted":
+                    for key in [k for k in list(self.cache) if k.startswith(rel + "/")]:
+                        self.cache.pop(key, None)
+                continue
+            self.cache.pop(rel, None)
+            if change["kind"] == "deleted" or self._should_exclude(rel):
+                continue
+            try:
+                self._index(rel, (sandbox_dir / rel).stat().st_size)
+            except OSError:
+                pass
+        self._save_state_soon()
+
+    def read_files(self) -> Dict[str, Dict[str, Any]]:
+        """Return the small files (<10 KB) with their content; the index is built on first use."""
+        sandbox_dir = self._sandbox_dir()
+        if not self.cache:
+            for path in sandbox_dir.rglob("*"):
+                if path.is_file() and path.stat().st_size < self.SMALL_FILE_BYTES:
+                    rel = str(path.relative_to(sandbox_dir))
+                    if not self._should_exclude(rel):
+                        self._index(rel, path.stat().st_size)
+            self._save_state()
+        files: Dict[str, Dict[str, Any]] = {}
+        for rel, entry in list(self.cache.items()):
+            try:
+                content = read_cache.read_text(sandbox_dir / rel, errors="ignore")
+            except OSError:
+                continue
+            files[rel] = {"content": content, "lastModified": entry.get("lastModified")}
         return files
 
     # ---------- Command execution ---------- #
-    def run_command(self, cmd: str, timeout: int = 60) -> Dict[str, Any]:
-        """Execute a shell command inside the sandbox directory, using the venv if present."""
-        sandbox_dir = self._sandbox_dir()
-        venv_bin = sandbox_dir / "venv" / "bin"
+    def command_env(self) -> Dict[str, str]:
+        """Environment for commands run inside the sandbox (venv first on PATH)."""
+        venv_bin = self._sandbox_dir() / "venv" / "bin"
         env = os.environ.copy()
         if venv_bin.exists():
             # Prepend venv executables to PATH so `python`, `pip`, etc. use the venv
             env["PATH"] = str(venv_bin) + os.pathsep + env.get("PATH", "")
+        return env
+
+    def run_command(self, cmd: str, timeout: int = 60) -> Dict[str, Any]:
+        """Execute a shell command inside the sandbox directory, using the venv if present.
+
+        Blocking; async callers should use `backend.sandbox_exec.runner` instead.
+        """
+        sandbox_dir = self._sandbox_dir()
+        env = self.command_env()
         try:
-            proc = subprocess.run(cmd, cwd=sandbox_dir, shell=True, capture_output=True, text=True, timeout=timeout, env=env)
+            proc = subprocess.run(
+                cmd, cwd=sandbox_dir, shell=True, capture_output=True, text=True, timeout=timeout, env=env,
+                preexec_fn=limits_preexec(EXEC_LIMITS),
+            )
             return {
                 "stdout": proc.stdout,
                 "stderr": proc.stderr,
@@ -197,6 +310,28 @@ class SandboxManager:
             raise RuntimeError("Sandbox not created yet")
         return self.workspace_root / sandbox_id
 
+    def _dev_log_path(self) -> Path:
+        return self.workspace_root / self.LOGS_DIRNAME / f"{self.meta.get('sandboxId', 'sandbox')}.dev.log"
+
+    @staticmethod
+    def _deps_installed(dir: Path) -> bool:
+        # npm rewrites node_modules/.package-lock.json on every successful install
+        lock = dir / "node_modules" / ".package-lock.json"
+        try:
+            return lock.stat().st_mtime >= (dir / "package.json").stat().st_mtime
+        except OSError:
+            return False
+
+    def _prepare_sandbox(self, dir: Path):
+        """Build everything a fresh sandbox needs; used to fill the pool."""
+        self._write_scaffold(dir)
+        create_venv(dir)
+        if shutil.which("npm"):
+            try:
+                subprocess.run(["npm", "install"], cwd=dir, check=False, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=600)
+            except subprocess.TimeoutExpired:
+                pass  # offline host: start_dev installs on first run instead
+
     def _write_scaffold(self, dir: Path):
         # Minimal Vite + React scaffold (placeholder)
         (dir / "package.json").write_text(json.dumps({
@@ -0,0 +1,351 @@
+"""Copy-on-write checkpoints of sandbox workspaces.
+
+A checkpoint is a tree of reflinks (where the filesystem supports them) or
+hardlinks to the workspace files plus a manifest of `(size, mtime_ns)` per
+file, so taking one costs metadata only. The backend never edits files in
+place (see `backend.core.fileio.atomic_write`), so a write replaces the
+workspace inode and the checkpoint keeps the old content. A tool that does
+modify a hardlinked file in place changes the checkpoint copy too; such
+entries no longer match their manifest and are reported as `stale` rather
+than silently restored.
+
+Layout: `<workspace_root>/.checkpoints/<sandboxId>/<checkpointId>/{manifest.json,files/}`.
+"""
+from __future__ import annotations
+
+import difflib
+import filecmp
+import json
+import logging
+import os
+import shutil
+import stat
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from backend.core import paths
+from backend.core.fileio import clone_file
+from backend.core.settings import settings
+from backend.sandbox import SandboxManager, manager as sandbox_manager
+
+logger = logging.getLogger("backend")
+
+Entry = Tuple[int, int]  # (size, mtime_ns)
+
+# Rebuildable or environment-specific trees are not checkpointed
+_SKIP_DIRS = {"node_modules", "venv", ".git", "dist", "build", "__pycache__", ".venv"}
+_MAX_DIFF_BYTES = 512 * 1024
+
+
+class IncompleteCheckpoint(Exception):
+    """Snapshot files listed in a checkpoint's manifest are gone."""
+
+
+def _scan(root: Path) -> Dict[str, os.stat_result]:
+    """Regular files and symlinks under `root` (relative POSIX path → lstat)."""
+    found: Dict[str, os.stat_result] = {}
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        try:
+            entries = list(os.scandir(root / rel_dir))
+        except FileNotFoundError:
+            continue
+        for entry in entries:
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                st = entry.stat(follow_symlinks=False)
+            except FileNotFoundError:
+                continue
+            if stat.S_ISDIR(st.st_mode):
+                if entry.name not in _SKIP_DIRS:
+                    stack.append(rel)
+            elif stat.S_ISREG(st.st_mode) or stat.S_ISLNK(st.st_mode):
+                found[rel] = st
+    return found
+
+
+class CheckpointStore:
+    MANIFEST = "manifest.json"
+    FILES_DIRNAME = "files"
+
+    def __init__(self, root: Path, keep: int, max_age_s: int):
+        self.root = root
+        self.keep = keep
+        self.max_age_s = max_age_s
+        self._lock = threading.Lock()
+        self._link_mode: Dict[str, str] = {}  # per sandbox: "auto" until the first clone shows what works
+
+    def _dir(self, sandbox_id: str) -> Path:
+        return self.root / sandbox_id
+
+    # ---------- queries ---------- #
+    def ids(self, sandbox_id: str) -> List[str]:
+        """Checkpoint ids, newest first (ids sort by creation time)."""
+        base = self._dir(sandbox_id)
+        if not base.is_dir():
+            return []
+        return sorted((n for n in os.listdir(base) if not n.startswith(".")), reverse=True)
+
+    def list(self, sandbox_id: str) -> List[Dict[str, Any]]:
+        """Checkpoints of a sandbox, newest first (manifests without the file table)."""
+        items = []
+        for checkpoint_id in self.ids(sandbox_id):
+            info = self.get(sandbox_id, checkpoint_id)
+            if info is not None:
+                info.pop("files", None)
+                items.append(info)
+        return items
+
+    def get(self, sandbox_id: str, checkpoint_id: str) -> Dict[str, Any] | None:
+        if "/" in checkpoint_id or checkpoint_id.startswith("."):
+            return None
+        return self._load(self._dir(sandbox_id) / checkpoint_id)
+
+    def _load(self, d: Path) -> Dict[str, Any] | None:
+        try:
+            return json.loads((d / self.MANIFEST).read_text())
+        except (OSError, ValueError):
+            return None  # in-progress or broken checkpoint
+
+    # ---------- create ---------- #
+    def create(self, sandbox_id: str, src: Path, label: str = "") -> Dict[str, Any]:
+        """Snapshot `src`; returns the newest checkpoint instead if nothing changed since."""
+        with self._lock:
+            return self._create(sandbox_id, src, label)
+
+    def _create(self, sandbox_id: str, src: Path, label: str, keep_id: str | None = None) -> Dict[str, Any]:
+        """`create` with the lock held; pruning never removes checkpoint `keep_id`."""
+        started = time.perf_counter()
+        current = _scan(src)
+        files = {rel: [st.st_size, st.st_mtime_ns] for rel, st in current.items()}
+        ids = self.ids(sandbox_id)
+        latest = self.get(sandbox_id, ids[0]) if ids else None
+        if latest is not None and latest["files"] == files:
+            latest.pop("files")
+            return {**latest, "reused": True}
+
+        now = time.time()
+        checkpoint_id = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}{int(now * 1000) % 1000:03d}-{uuid.uuid4().hex[:4]}"
+        base = self._dir(sandbox_id)
+        tmp = base / f".{checkpoint_id}.tmp"
+        tree = tmp / self.FILES_DIRNAME
+        tree.mkdir(parents=True)
+        methods: Dict[str, int] = {}
+        total = 0
+        try:
+            for rel, st in current.items():
+                dest = tree / rel
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                if stat.S_ISLNK(st.st_mode):
+                    os.symlink(os.readlink(src / rel), dest)
+                    continue
+                mode = self._link_mode.get(sandbox_id, "auto")
+                method = clone_file(src / rel, dest, mode)
+                if mode == "auto" and method != "copy":
+                    self._link_mode[sandbox_id] = method  # skip probing reflink on every file
+                methods[method] = methods.get(method, 0) + 1
+                total += st.st_size
+            info = {
+                "id": checkpoint_id,
+                "sandboxId": sandbox_id,
+                "label": label,
+                "createdAt": now,
+                "fileCount": len(files),
+                "bytes": total,
+                "methods": methods,
+                "files": files,
+            }
+            (tmp / self.MANIFEST).write_text(json.dumps(info))
+            os.rename(tmp, base / checkpoint_id)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        self._prune(sandbox_id, keep_id)
+        info.pop("files")
+        info["durationMs"] = round((time.perf_counter() - started) * 1000, 1)
+        logger.info("checkpoint %s/%s: %d files in %.1f ms (%s)",
+                    sandbox_id, checkpoint_id, len(files), info["durationMs"], methods)
+        return info
+
+    def delete(self, sandbox_id: str, checkpoint_id: str) -> bool:
+        if self.get(sandbox_id, checkpoint_id) is None:
+            return False
+        shutil.rmtree(self._dir(sandbox_id) / checkpoint_id, ignore_errors=True)
+        return True
+
+    def _prune(self, sandbox_id: str, keep_id: str | None = None) -> None:
+        now = time.time()
+        base = self._dir(sandbox_id)
+        for i, checkpoint_id in enumerate(self.ids(sandbox_id)):
+            if checkpoint_id == keep_id:
+                continue
+            d = base / checkpoint_id
+            too_many = self.keep and i >= self.keep
+            try:
+                too_old = self.max_age_s and now - (d / self.MANIFEST).stat().st_mtime > self.max_age_s
+            except FileNotFoundError:
+                too_old = False
+            if too_many or too_old:
+                shutil.rmtree(d, ignore_errors=True)
+
+    # ---------- diff / restore ---------- #
+    def _snapshot_state(self, snap: Path, entry: Entry) -> str:
+        try:
+            st = snap.lstat()
+        except FileNotFoundError:
+            return "missing"
+        if not stat.S_ISLNK(st.st_mode) and [st.st_size, st.st_mtime_ns] != list(entry):
+            return "stale"  # changed in place through a shared hardlink after the snapshot
+        return "ok"
+
+    def diff(self, sandbox_id: str, checkpoint_id: str, src: Path) -> Dict[str, Any] | None:
+        """Files added, deleted and modified in `src` since the checkpoint."""
+        info = self.get(sandbox_id, checkpoint_id)
+        if info is None:
+            return None
+        tree = self._dir(sandbox_id) / checkpoint_id / self.FILES_DIRNAME
+        current = _scan(src)
+        saved: Dict[str, Entry] = info["files"]
+        modified, stale = [], []
+        for rel in saved.keys() & current.keys():
+            snap, st = tree / rel, current[rel]
+            state = self._snapshot_state(snap, saved[rel])
+            if state != "ok":
+                stale.append(rel)
+                continue
+            try:
+                if os.path.samestat(snap.lstat(), st):
+                    continue  # still the very same inode
+            except FileNotFoundError:
+                continue
+            if stat.S_ISLNK(st.st_mode):
+                if os.readlink(snap) != os.readlink(src / rel):
+                    modified.append(rel)
+            elif not filecmp.cmp(snap, src / rel, shallow=False):
+                modified.append(rel)
+        return {
+            "id": checkpoint_id,
+            "added": sorted(current.keys() - saved.keys()),
+            "deleted": sorted(saved.keys() - current.keys()),
+            "modified": sorted(modified),
+            "stale": sorted(stale),
+        }
+
+    def file_diff(self, sandbox_id: str, checkpoint_id: str, src: Path, rel: str) -> str | None:
+        """Unified diff of one text file, checkpoint → current.
+
+        Raises `paths.InvalidPath` if `rel` (or a symlink on either side) leads out of its tree.
+        """
+        info = self.get(sandbox_id, checkpoint_id)
+        if info is None:
+            return None
+        rel = os.path.relpath(paths.resolve(str(src), rel), src).replace(os.sep, "/")
+        if rel == ".":
+            raise paths.InvalidPath(rel)
+        tree = self._dir(sandbox_id) / checkpoint_id / self.FILES_DIRNAME
+        old_path, new_path = tree / rel, src / rel
+        for root, path in ((tree, old_path), (src, new_path)):
+            real_root = os.path.realpath(root)
+            if os.path.commonpath([os.path.realpath(path), real_root]) != real_root:
+                raise paths.InvalidPath(rel)
+        old = _read_text(old_path) if rel in info["files"] else ""
+        new = _read_text(new_path) if new_path.is_file() else ""
+        if old is None or new is None:
+            return "Binary or large file differs" if not _same(old_path, new_path) else ""
+        return "".join(difflib.unified_diff(
+            old.splitlines(keepends=True), new.splitlines(keepends=True),
+            fromfile=f"a/{rel}", tofile=f"b/{rel}",
+        ))
+
+    def restore(self, sandbox_id: str, checkpoint_id: str, src: Path,
+                paths: List[str] | None = None) -> Dict[str, Any] | None:
+        """Bring `src` (or only `paths`) back to the checkpoint.
+
+        The current state is checkpointed first, so a restore can be undone.
+        Restored files are copies (reflinks where possible), never hardlinks,
+        so later edits in the workspace cannot leak back into the checkpoint.
+        """
+        with self._lock:
+            info = self.get(sandbox_id, checkpoint_id)
+            if info is None:
+                return None
+            tree = self._dir(sandbox_id) / checkpoint_id / self.FILES_DIRNAME
+            saved: Dict[str, Entry] = info["files"]
+            wanted = {p.strip("/") for p in paths} if paths else None
+            states = {
+                rel: self._snapshot_state(tree / rel, entry)
+                for rel, entry in saved.items()
+                if wanted is None or rel in wanted
+            }
+            missing = sorted(rel for rel, state in states.items() if state == "missing")
+            if missing:
+                # nothing is touched: restoring the rest would still delete files the checkpoint cannot bring back
+                raise IncompleteCheckpoint(f"{len(missing)} files missing from checkpoint {checkpoint_id}, e.g. {missing[0]}")
+            # the target stays even if the undo checkpoint pushes it past the retention limits
+            undo = self._create(sandbox_id, src, f"before restore of {checkpoint_id}", keep_id=checkpoint_id)
+            current = _scan(src)
+            restored, removed, skipped = [], [], []
+            for rel, state in states.items():
+                snap, dest = tree / rel, src / rel
+                if state != "ok":
+                    skipped.append(rel)
+                    continue
+                if rel in current and os.path.samestat(snap.lstat(), current[rel]):
+                    continue
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                tmp = dest.with_name(f".{dest.name}.{uuid.uuid4().hex[:6]}.restore")
+                if snap.is_symlink():
+                    os.symlink(os.readlink(snap), tmp)
+                else:
+                    clone_file(snap, tmp, "reflink")
+                os.replace(tmp, dest)
+                restored.append(rel)
+            for rel in current.keys() - saved.keys():
+                if wanted is None or rel in wanted:
+                    (src / rel).unlink(missing_ok=True)
+                    removed.append(rel)
+        return {
+            "id": checkpoint_id,
+            "undoCheckpoint": undo["id"],
+            "restored": sorted(restored),
+            "removed": sorted(removed),
+            "skipped": sorted(skipped),
+        }
+
+
+def _read_text(path: Path) -> str | None:
+    try:
+        if path.stat().st_size > _MAX_DIFF_BYTES:
+            return None
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return ""
+    if b"\0" in data:
+        return None
+    return data.decode("utf-8", errors="replace")
+
+
+def _same(a: Path, b: Path) -> bool:
+    try:
+        return filecmp.cmp(a, b, shallow=False)
+    except OSError:
+        return False
+
+
+def checkpoint_active(label: str = "") -> Dict[str, Any] | None:
+    """Checkpoint the active sandbox, if there is one."""
+    sandbox_id = sandbox_manager.meta.get("sandboxId")
+    if not sandbox_id:
+        return None
+    return store.create(sandbox_id, sandbox_manager._sandbox_dir(), label)
+
+
+store = CheckpointStore(
+    sandbox_manager.workspace_root / SandboxManager.CHECKPOINTS_DIRNAME,
+    settings.checkpoint_keep,
+    settings.checkpoint_max_age_h * 3600,
+)
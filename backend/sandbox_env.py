@@ -0,0 +1,194 @@
+"""Python environment helpers for sandbox workspaces.
+
+Every sandbox venv is cloned from one host-wide template instead of being
+built with `python -m venv` (whose `ensurepip` step dominates the cost).
+Site-packages are hardlinked from the template and made read-only, so pip in
+a sandbox can still upgrade or remove packages (it unlinks and rewrites) but
+can never modify the shared copy in place. The template is built by a
+background thread; until it is ready, sandboxes get a plain `python -m venv`.
+Each venv also gets a `pip.conf` pointing at the shared download/wheel cache
+(which speeds up any install seen before on this host) and at a wheelhouse
+holding wheels of the template packages only.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import stat
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+from backend.core.settings import SANDBOX_CACHE_DIR, settings
+
+logger = logging.getLogger("backend")
+
+VENV_DIRNAME = "venv"
+
+PIP_CACHE_DIR: Path = SANDBOX_CACHE_DIR / "pip"
+WHEELHOUSE_DIR: Path = SANDBOX_CACHE_DIR / "wheelhouse"
+TEMPLATE_DIR: Path = SANDBOX_CACHE_DIR / "venv-template"
+_TEMPLATE_STAMP = ".template.json"
+
+# Scripts in venv/bin embed absolute paths (shebangs, activate); skip anything big
+_RELOCATE_MAX_BYTES = 1024 * 1024
+
+_template_lock = threading.Lock()
+_template_thread: threading.Thread | None = None
+_template_failed: dict | None = None  # spec whose build failed; not retried until restart
+
+
+def create_venv(sandbox_dir: Path) -> Path:
+    """Create `venv/` inside the sandbox directory if it does not exist yet."""
+    venv_dir = sandbox_dir / VENV_DIRNAME
+    if not venv_dir.exists():
+        template = ensure_template()
+        if template is not None:
+            clone_venv(template, venv_dir)
+        else:
+            subprocess.run([sys.executable, "-m", "venv", VENV_DIRNAME], cwd=sandbox_dir, check=False)
+    if venv_dir.exists():
+        write_pip_config(venv_dir)
+    return venv_dir
+
+
+def write_pip_config(venv_dir: Path) -> None:
+    """Point pip inside the venv at the shared cache (read from `$VIRTUAL_ENV/pip.conf`)."""
+    conf = venv_dir / "pip.conf"
+    content = (
+        "[global]\n"
+        f"cache-dir = {PIP_CACHE_DIR}\n"
+        f"find-links = {WHEELHOUSE_DIR}\n"
+    )
+    try:
+        if not conf.exists() or conf.read_text() != content:
+            conf.write_text(content)
+    except OSError:
+        logger.warning("cannot write %s", conf)
+
+
+# ---------- Template ---------- #
+
+def _template_spec() -> dict:
+    return {"python": sys.version, "executable": sys.executable, "packages": sorted(settings.sandbox_venv_packages)}
+
+
+def ensure_template() -> Path | None:
+    """Return the venv template if it matches the configuration; otherwise start
+    (re)building it in the background and return None."""
+    global _template_thread
+    spec = _template_spec()
+    try:
+        if json.loads((TEMPLATE_DIR / _TEMPLATE_STAMP).read_text()) == spec:
+            return TEMPLATE_DIR
+    except (OSError, ValueError):
+        pass
+    with _template_lock:
+        if spec != _template_failed and (_template_thread is None or not _template_thread.is_alive()):
+            _template_thread = threading.Thread(target=_build_in_background, args=(spec,), name="venv-template", daemon=True)
+            _template_thread.start()
+    return None
+
+
+def _build_in_background(spec: dict) -> None:
+    global _template_failed
+    try:
+        _build_template(spec)
+    except Exception:
+        _template_failed = spec
+        logger.exception("venv template build failed; sandboxes keep using python -m venv")
+
+
+def _build_template(spec: dict) -> None:
+    for d in (PIP_CACHE_DIR, WHEELHOUSE_DIR):
+        d.mkdir(parents=True, exist_ok=True)
+    build_dir = TEMPLATE_DIR.with_name(f"{TEMPLATE_DIR.name}.build-{os.getpid()}")
+    shutil.rmtree(build_dir, ignore_errors=True)
+    packages = spec["packages"]
+    try:
+        subprocess.run([sys.executable, "-m", "venv", str(build_dir)], check=True)
+        write_pip_config(build_dir)
+        if packages:
+            pip = [str(build_dir / "bin" / "python"), "-m", "pip"]
+            # wheels of the template packages, so rebuilding the template skips downloads and builds
+            subprocess.run(pip + ["wheel", "--wheel-dir", str(WHEELHOUSE_DIR)] + packages, check=False)
+            subprocess.run(pip + ["install"] + packages, check=True)
+        _freeze_tree(build_dir / "lib")
+        (build_dir / _TEMPLATE_STAMP).write_text(json.dumps(spec))
+        relocate_venv(build_dir, build_dir, TEMPLATE_DIR)
+    except BaseException:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+    old = TEMPLATE_DIR.with_name(f"{TEMPLATE_DIR.name}.old-{os.getpid()}")
+    if TEMPLATE_DIR.exists():
+        os.rename(TEMPLATE_DIR, old)
+    os.rename(build_dir, TEMPLATE_DIR)
+    shutil.rmtree(old, ignore_errors=True)
+    logger.info("venv template ready at %s (%d packages)", TEMPLATE_DIR, len(packages))
+
+
+def _freeze_tree(root: Path) -> None:
+    """Drop write permission on files that will be shared through hardlinks."""
+    for dirpath, _dirs, files in os.walk(root):
+        for name in files:
+            path = os.path.join(dirpath, name)
+            try:
+                mode = os.lstat(path).st_mode
+                if stat.S_ISREG(mode):
+                    os.chmod(path, mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+            except OSError:
+                continue
+
+
+def clone_venv(template: Path, dest: Path) -> None:
+    """Clone `template` to `dest`: hardlink `lib/`, copy the small rest, fix paths."""
+    for dirpath, dirs, files in os.walk(template):
+        rel = os.path.relpath(dirpath, template)
+        target_dir = dest / rel if rel != "." else dest
+        target_dir.mkdir(parents=True, exist_ok=True)
+        share = rel == "lib" or rel.startswith("lib" + os.sep)
+        for name in files + [d for d in dirs if os.path.islink(os.path.join(dirpath, d))]:
+            if name == _TEMPLATE_STAMP:
+                continue
+            src = os.path.join(dirpath, name)
+            dst = target_dir / name
+            if os.path.islink(src):
+                os.symlink(os.readlink(src), dst)
+            elif share:
+                try:
+                    os.link(src, dst)
+                except OSError:  # different filesystem
+                    shutil.copy2(src, dst)
+            else:
+                shutil.copy2(src, dst)
+    relocate_venv(dest, template, dest)
+
+
+def relocate_venv(venv_dir: Path, old_root: Path, new_root: Path) -> int:
+    """Rewrite absolute paths after a venv was moved from `old_root` to `new_root`.
+
+    Returns the number of files that were patched.
+    """
+    old, new = os.fsencode(str(old_root)), os.fsencode(str(new_root))
+    candidates = [venv_dir / "pyvenv.cfg"]
+    bin_dir = venv_dir / "bin"
+    if bin_dir.is_dir():
+        candidates.extend(bin_dir.iterdir())
+    patched = 0
+    for path in candidates:
+        try:
+            if path.is_symlink() or not path.is_file() or path.stat().st_size > _RELOCATE_MAX_BYTES:
+                continue
+            data = path.read_bytes()
+        except OSError:
+            continue
+        if old not in data:
+            continue
+        mode = path.stat().st_mode
+        path.write_bytes(data.replace(old, new))
+        os.chmod(path, mode)
+        patched += 1
+    return patched
@@ -0,0 +1,265 @@
+"""Asynchronous command execution for the sandbox terminal.
+
+Commands run as asyncio subprocesses so the event loop never blocks on
+user commands. Output is kept per command in a byte-bounded ring buffer of
+sequenced chunks; any number of readers can follow a command (and resume
+after a reconnect) by asking for everything after the last sequence they saw.
+
+Commands wait for a slot from the fair `ExecScheduler` before they are
+spawned, and run under the `EXEC_LIMITS` rlimits and priorities.
+"""
+from __future__ import annotations
+
+import asyncio
+import codecs
+import os
+import signal
+import time
+import uuid
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Tuple
+
+from backend.core.settings import settings
+from backend.sandbox_limits import EXEC_LIMITS, limits_preexec, scheduler
+
+Chunk = Tuple[int, str, str]  # (seq, stream, text)
+
+
+class OutputBuffer:
+    """Ring buffer of output chunks bounded by total size in bytes."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.chunks: Deque[Chunk] = deque()
+        self.size = 0
+        self.next_seq = 1
+        self.dropped = 0  # chunks evicted to respect max_bytes
+
+    def append(self, stream: str, text: str) -> int:
+        seq = self.next_seq
+        self.next_seq += 1
+        self.chunks.append((seq, stream, text))
+        self.size += len(text.encode())
+        while self.size > self.max_bytes and len(self.chunks) > 1:
+            _, _, old = self.chunks.popleft()
+            self.size -= len(old.encode())
+            self.dropped += 1
+        return seq
+
+    def since(self, seq: int) -> List[Chunk]:
+        return [c for c in self.chunks if c[0] > seq]
+
+    def text(self, stream: str) -> str:
+        return "".join(t for _, s, t in self.chunks if s == stream)
+
+
+class Command:
+    def __init__(self, cmd: str, sandbox_id: str | None, max_bytes: int):
+        self.id = uuid.uuid4().hex[:12]
+        self.cmd = cmd
+        self.sandbox_id = sandbox_id
+        self.output = OutputBuffer(max_bytes)
+        self.proc: asyncio.subprocess.Process | None = None
+        self.code: int | None = None
+        self.error: str | None = None
+        self.started_at = time.time()
+        self.finished_at: float | None = None
+        self._changed = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    def _notify(self) -> None:
+        # wake current waiters and arm a fresh event for the next update
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def push(self, stream: str, text: str) -> None:
+        if text:
+            self.output.append(stream, text)
+            self._notify()
+
+    def finish(self, code: int | None, error: str | None = None) -> None:
+        self.code = code
+        self.error = error
+        self.finished_at = time.time()
+        self._notify()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "cmd": self.cmd,
+            "running": not self.finished,
+            "queued": self.proc is None and not self.finished,
+            "code": self.code,
+            "error": self.error,
+            "startedAt": self.started_at,
+            "finishedAt": self.finished_at,
+            "truncated": self.output.dropped > 0,
+        }
+
+    async def events(self, after: int = 0) -> AsyncIterator[Tuple[int, str, Any]]:
+        """Yield `(seq, event, data)` for output after `after`, then a final `exit`."""
+        if self.output.dropped and after < self.output.chunks[0][0] - 1:
+            yield 0, "truncated", {"dropped": self.output.dropped}
+        while True:
+            changed = self._changed
+            for seq, stream, text in self.output.since(after):
+                after = seq
+                yield seq, stream, text
+            if self.finished:
+                yield after, "exit", {"code": self.code, "error": self.error}
+                return
+            await changed.wait()
+
+
+class CommandRunner:
+    """Registry of running and recently finished commands."""
+
+    RETAIN_FINISHED_S = 300
+    MAX_RETAINED = 64
+    KILL_GRACE_S = 3.0
+
+    def __init__(self, max_output_bytes: int):
+        self.max_output_bytes = max_output_bytes
+        self.commands: Dict[str, Command] = {}
+
+    def get(self, command_id: str) -> Command | None:
+        return self.commands.get(command_id)
+
+    async def start(self, cmd: str, cwd: str, env: Dict[str, str], timeout: float | None = None,
+                    sandbox_id: str | None = None, stdin: bool = True) -> Command:
+        """Queue `cmd` for execution; it is spawned once the scheduler grants a slot.
+
+        With `stdin`, input is fed through `write_stdin`; otherwise the command reads EOF.
+        """
+        self._prune()
+        command = Command(cmd, sandbox_id, self.max_output_bytes)
+        self.commands[command.id] = command
+        command._task = asyncio.create_task(self._launch(command, cwd, env, timeout, stdin))
+        return command
+
+    async def run(self, cmd: str, cwd: str, env: Dict[str, str], timeout: float,
+                  sandbox_id: str | None = None) -> Dict[str, Any]:
+        """Run to completion and return the legacy `{stdout, stderr, code}` payload."""
+        # nobody can type into it: a command reading stdin must see EOF, not wait for the timeout
+        command = await self.start(cmd, cwd, env, timeout=timeout, sandbox_id=sandbox_id, stdin=False)
+        async for _ in command.events():
+            pass
+        result: Dict[str, Any] = {
+            "stdout": command.output.text("stdout"),
+            "stderr": command.output.text("stderr"),
+        }
+        if command.error:
+            result["error"] = command.error
+        else:
+            result["code"] = command.code
+        return result
+
+    async def write_stdin(self, command: Command, data: str, eof: bool = False) -> None:
+        proc = command.proc
+        if command.finished or proc is None or proc.stdin is None or proc.stdin.is_closing():
+            raise RuntimeError("Command is not accepting input")
+        if data:
+            proc.stdin.write(data.encode())
+            await proc.stdin.drain()
+        if eof:
+            proc.stdin.close()
+
+    def cancel(self, command: Command) -> None:
+        if not command.finished:
+            command.error = "Cancelled"
+            if command.proc is None and command._task is not None:
+                command._task.cancel()  # still queued
+            else:
+                self._signal(command, signal.SIGTERM)
+
+    # ---------- internals ---------- #
+    async def _launch(self, command: Command, cwd: str, env: Dict[str, str], timeout: float | None,
+                      stdin: bool = True) -> None:
+        slot_id = command.sandbox_id or ""
+        try:
+            async with scheduler.slot(slot_id):
+                try:
+                    command.proc = await asyncio.create_subprocess_shell(
+                        command.cmd,
+                        cwd=cwd,
+                        env=env,
+                        stdin=asyncio.subprocess.PIPE if stdin else asyncio.subprocess.DEVNULL,
+                        stdout=asyncio.subprocess.PIPE,
+                        stderr=asyncio.subprocess.PIPE,
+                        start_new_session=True,  # own process group so cancel reaches children too
+                        preexec_fn=limits_preexec(EXEC_LIMITS),
+                    )
+                except OSError as e:
+                    command.finish(None, str(e))
+                    return
+                scheduler.track(slot_id, command.proc.pid)
+                try:
+                    await self._supervise(command, timeout)
+                finally:
+                    scheduler.untrack(slot_id, command.proc.pid)
+        except asyncio.CancelledError:
+            if not command.finished:
+                command.finish(None, command.error or "Cancelled")
+
+    async def _supervise(self, command: Command, timeout: float | None) -> None:
+        proc = command.proc
+        assert proc is not None
+        pumps = [
+            asyncio.create_task(self._pump(command, proc.stdout, "stdout")),
+            asyncio.create_task(self._pump(command, proc.stderr, "stderr")),
+        ]
+        error = None
+        try:
+            await asyncio.wait_for(proc.wait(), timeout)
+        except asyncio.TimeoutError:
+            error = f"Command timed out after {timeout:g}s"
+            self._signal(command, signal.SIGTERM)
+            try:
+                await asyncio.wait_for(proc.wait(), self.KILL_GRACE_S)
+            except asyncio.TimeoutError:
+                self._signal(command, signal.SIGKILL)
+                await proc.wait()
+        # background children may still hold the pipes open; don't wait on them forever
+        await asyncio.wait(pumps, timeout=self.KILL_GRACE_S)
+        for task in pumps:
+            task.cancel()
+        command.finish(proc.returncode, error or command.error)
+
+    @staticmethod
+    async def _pump(command: Command, stream: asyncio.StreamReader | None, name: str) -> None:
+        if stream is None:
+            return
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        while True:
+            data = await stream.read(4096)
+            if not data:
+                command.push(name, decoder.decode(b"", final=True))
+                return
+            command.push(name, decoder.decode(data))
+
+    def _signal(self, command: Command, sig: int) -> None:
+        if command.proc is None or command.proc.returncode is not None:
+            return
+        try:
+            os.killpg(command.proc.pid, sig)
+        except ProcessLookupError:
+            pass
+
+    def _prune(self) -> None:
+        now = time.time()
+        finished = sorted(
+            (c for c in self.commands.values() if c.finished),
+            key=lambda c: c.finished_at or 0,
+        )
+        excess = len(self.commands) - self.MAX_RETAINED
+        for c in finished:
+            if excess > 0 or now - (c.finished_at or now) > self.RETAIN_FINISHED_S:
+                self.commands.pop(c.id, None)
+                excess -= 1
+
+
+runner = CommandRunner(settings.exec_output_max_bytes)
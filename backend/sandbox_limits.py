@@ -0,0 +1,249 @@
+"""Resource limits and fair scheduling for sandbox processes.
+
+* `limits_preexec()` builds a `preexec_fn` that applies rlimits (CPU time,
+  address space, open files, process count) and nice/ionice priorities in
+  the child before it execs. Note that RLIMIT_NPROC counts processes of the
+  whole host user, so it caps runaway fork loops rather than giving an exact
+  per-sandbox budget.
+* `ExecScheduler` caps concurrent terminal commands per sandbox and
+  globally. Waiters are queued per sandbox and slots are handed out
+  round-robin across sandboxes, so one project queueing many builds cannot
+  starve the others.
+"""
+from __future__ import annotations
+
+import asyncio
+import ctypes
+import os
+import platform
+import resource
+import threading
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator
+
+import anyio.from_thread
+
+from backend.core.settings import settings
+
+# ioprio_set(2) has no libc wrapper; syscall numbers per architecture
+_SYS_IOPRIO_SET = {"x86_64": 251, "aarch64": 30, "arm64": 30}.get(platform.machine())
+_IOPRIO_WHO_PROCESS = 1
+_IOPRIO_CLASS_SHIFT = 13
+
+# Resolved once in the parent: dlopen in a forked child of this threaded server
+# could deadlock on loader locks held by another thread at fork time.
+try:
+    _syscall = ctypes.CDLL(None, use_errno=True).syscall if _SYS_IOPRIO_SET is not None else None
+except (OSError, AttributeError):
+    _syscall = None
+
+
+@dataclass(frozen=True)
+class ResourceLimits:
+    cpu_seconds: int = 0  # 0 = unlimited
+    address_space_mb: int = 0
+    open_files: int = 0
+    processes: int = 0
+    nice: int = 0
+    ionice_class: int = 0  # 1 realtime, 2 best-effort, 3 idle; 0 = leave as is
+    ionice_level: int = 7  # lowest priority within the class
+
+
+def _set_ionice(io_class: int, level: int) -> None:
+    if _syscall is None:
+        return
+    _syscall(_SYS_IOPRIO_SET, _IOPRIO_WHO_PROCESS, 0, (io_class << _IOPRIO_CLASS_SHIFT) | level)
+
+
+def lower_thread_priority(nice: int = 19, io_class: int = 3) -> None:
+    """Make the calling thread a background one (on Linux, nice and I/O priority are per thread)."""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), nice)
+    except OSError:
+        pass
+    _set_ionice(io_class, 7)
+
+
+def _lower(limit: int, value: int) -> None:
+    soft, hard = resource.getrlimit(limit)
+    if hard != resource.RLIM_INFINITY:
+        value = min(value, hard)
+    resource.setrlimit(limit, (value, hard if hard != resource.RLIM_INFINITY else value))
+
+
+def limits_preexec(limits: ResourceLimits, then: Callable[[], None] | None = None) -> Callable[[], None]:
+    """Return a `preexec_fn` applying `limits`, optionally followed by `then`."""
+
+    def _apply() -> None:
+        if limits.cpu_seconds:
+            _lower(resource.RLIMIT_CPU, limits.cpu_seconds)
+        if limits.address_space_mb:
+            _lower(resource.RLIMIT_AS, limits.address_space_mb * 1024 * 1024)
+        if limits.open_files:
+            _lower(resource.RLIMIT_NOFILE, limits.open_files)
+        if limits.processes:
+            _lower(resource.RLIMIT_NPROC, limits.processes)
+        if limits.nice:
+            os.nice(limits.nice)
+        if limits.ionice_class:
+            _set_ionice(limits.ionice_class, limits.ionice_level)
+        if then is not None:
+            then()
+
+    return _apply
+
+
+EXEC_LIMITS = ResourceLimits(
+    cpu_seconds=settings.exec_cpu_seconds,
+    address_space_mb=settings.exec_memory_mb,
+    open_files=settings.exec_open_files,
+    processes=settings.exec_processes,
+    nice=settings.exec_nice,
+    ionice_class=settings.exec_ionice_class,
+)
+# Long-lived processes (dev server, interactive shells) get no CPU-time cap, and no
+# address-space cap since Node reserves a lot of virtual memory up front
+SERVICE_LIMITS = ResourceLimits(
+    open_files=settings.exec_open_files,
+    processes=settings.exec_processes,
+    nice=settings.exec_nice,
+    ionice_class=settings.exec_ionice_class,
+)
+
+
+def process_usage(pgid: int) -> Dict[str, int]:
+    """CPU time (ms), RSS (bytes) and process count of a process group."""
+    ticks = os.sysconf("SC_CLK_TCK")
+    cpu_ms = rss = count = 0
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as f:
+                fields = f.read().rsplit(b")", 1)[1].split()
+            if int(fields[2]) != pgid:
+                continue
+            # utime, stime are fields 14 and 15 (1-based) → 11, 12 after the command name
+            cpu_ms += (int(fields[11]) + int(fields[12])) * 1000 // ticks
+            rss += int(fields[21]) * resource.getpagesize()
+            count += 1
+        except (OSError, IndexError, ValueError):
+            continue
+    return {"cpuMs": cpu_ms, "rssBytes": rss, "processes": count}
+
+
+class ExecScheduler:
+    def __init__(self, global_limit: int, per_sandbox_limit: int):
+        self.global_limit = max(1, global_limit)
+        self.per_sandbox_limit = max(1, per_sandbox_limit)
+        self.running: Dict[str, int] = {}
+        self.waiting: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self.pgids: Dict[str, set[int]] = {}
+
+    @property
+    def total_running(self) -> int:
+        return sum(self.running.values())
+
+    def _can_run(self, sandbox_id: str) -> bool:
+        return self.total_running < self.global_limit and self.running.get(sandbox_id, 0) < self.per_sandbox_limit
+
+    @asynccontextmanager
+    async def slot(self, sandbox_id: str) -> AsyncIterator[None]:
+        """Hold one execution slot for `sandbox_id` while the body runs."""
+        await self.acquire(sandbox_id)
+        try:
+            yield
+        finally:
+            self.release(sandbox_id)
+
+    @contextmanager
+    def thread_slot(self, sandbox_id: str) -> Iterator[None]:
+        """`slot` for blocking code in a worker thread started from the event loop (`run_in_threadpool`)."""
+        anyio.from_thread.run(self.acquire, sandbox_id)
+        try:
+            yield
+        finally:
+            anyio.from_thread.run_sync(self.release, sandbox_id)
+
+    async def acquire(self, sandbox_id: str) -> None:
+        if not self.waiting and self._can_run(sandbox_id):
+            self.running[sandbox_id] = self.running.get(sandbox_id, 0) + 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        self.waiting.setdefault(sandbox_id, deque()).append(fut)
+        self._dispatch()  # other sandboxes' waiters may be blocked only by their own cap
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release(sandbox_id)  # slot was granted just before cancellation
+            else:
+                queue = self.waiting.get(sandbox_id)
+                if queue and fut in queue:
+                    queue.remove(fut)
+                    if not queue:
+                        del self.waiting[sandbox_id]
+            raise
+
+    def release(self, sandbox_id: str) -> None:
+        self.running[sandbox_id] = self.running.get(sandbox_id, 1) - 1
+        if self.running[sandbox_id] <= 0:
+            del self.running[sandbox_id]
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        # round-robin: serve the first eligible sandbox, then move it to the back
+        progressed = True
+        while progressed and self.waiting and self.total_running < self.global_limit:
+            progressed = False
+            for sandbox_id in list(self.waiting):
+                if not self._can_run(sandbox_id):
+                    continue
+                queue = self.waiting[sandbox_id]
+                fut = queue.popleft()
+                if queue:
+                    self.waiting.move_to_end(sandbox_id)
+                else:
+                    del self.waiting[sandbox_id]
+                if fut.cancelled():
+                    progressed = True
+                    break
+                self.running[sandbox_id] = self.running.get(sandbox_id, 0) + 1
+                fut.set_result(None)
+                progressed = True
+                break
+
+    def track(self, sandbox_id: str, pgid: int) -> None:
+        self.pgids.setdefault(sandbox_id, set()).add(pgid)
+
+    def untrack(self, sandbox_id: str, pgid: int) -> None:
+        pgids = self.pgids.get(sandbox_id)
+        if pgids is not None:
+            pgids.discard(pgid)
+            if not pgids:
+                del self.pgids[sandbox_id]
+
+    def usage(self) -> Dict[str, Any]:
+        sandboxes: Dict[str, Any] = {}
+        for sandbox_id in set(self.running) | set(self.waiting) | set(self.pgids):
+            totals = {"cpuMs": 0, "rssBytes": 0, "processes": 0}
+            for pgid in self.pgids.get(sandbox_id, ()):
+                for key, value in process_usage(pgid).items():
+                    totals[key] += value
+            sandboxes[sandbox_id] = {
+                "running": self.running.get(sandbox_id, 0),
+                "queued": len(self.waiting.get(sandbox_id, ())),
+                **totals,
+            }
+        return {
+            "globalLimit": self.global_limit,
+            "perSandboxLimit": self.per_sandbox_limit,
+            "running": self.total_running,
+            "queued": sum(len(q) for q in self.waiting.values()),
+            "sandboxes": sandboxes,
+        }
+
+
+scheduler = ExecScheduler(settings.exec_global_concurrency, settings.exec_sandbox_concurrency)
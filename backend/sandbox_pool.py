@@ -0,0 +1,99 @@
+"""Pool of pre-built sandbox directories.
+
+A background thread keeps `size` fully prepared sandboxes (scaffold, venv,
+node_modules) under `<workspace_root>/.pool`. `SandboxManager.init` claims one
+with a single `os.rename`, which is atomic on the same filesystem, so two
+concurrent claims can never receive the same directory.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Callable, List
+
+from backend.sandbox_env import VENV_DIRNAME, relocate_venv
+
+logger = logging.getLogger("backend")
+
+
+class SandboxPool:
+    READY_PREFIX = "ready-"
+    BUILD_PREFIX = "build-"
+    RETRY_DELAY_S = 30.0
+
+    def __init__(self, pool_dir: Path, size: int, prepare: Callable[[Path], None]):
+        self.pool_dir = pool_dir
+        self.size = max(0, size)
+        self.prepare = prepare
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    # ---------- lifecycle ---------- #
+    def start(self) -> None:
+        if self.size == 0 or (self._thread and self._thread.is_alive()):
+            return
+        self.pool_dir.mkdir(parents=True, exist_ok=True)
+        # half-built entries from a previous process are never trustworthy
+        for entry in self.pool_dir.glob(f"{self.BUILD_PREFIX}*"):
+            shutil.rmtree(entry, ignore_errors=True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sandbox-pool", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    # ---------- claiming ---------- #
+    def ready_entries(self) -> List[Path]:
+        if not self.pool_dir.exists():
+            return []
+        return sorted(self.pool_dir.glob(f"{self.READY_PREFIX}*"))
+
+    def claim(self, dest: Path) -> bool:
+        """Move a ready sandbox to `dest`. Returns False when the pool is empty."""
+        try:
+            for entry in self.ready_entries():
+                try:
+                    os.rename(entry, dest)
+                except FileNotFoundError:
+                    continue  # taken by a concurrent claim
+                except OSError:
+                    logger.warning("sandbox pool: cannot move %s to %s", entry, dest)
+                    return False
+                relocate_venv(dest / VENV_DIRNAME, entry, dest)
+                logger.info("sandbox pool: claimed %s for %s", entry.name, dest.name)
+                return True
+            return False
+        finally:
+            self._wake.set()  # refill in the background
+
+    # ---------- background refill ---------- #
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            while len(self.ready_entries()) < self.size and not self._stop.is_set():
+                if not self._build_one():
+                    self._stop.wait(self.RETRY_DELAY_S)
+            self._wake.wait()
+            self._wake.clear()
+
+    def _build_one(self) -> bool:
+        token = uuid.uuid4().hex
+        build_dir = self.pool_dir / f"{self.BUILD_PREFIX}{token}"
+        ready_dir = self.pool_dir / f"{self.READY_PREFIX}{token}"
+        try:
+            build_dir.mkdir(parents=True)
+            self.prepare(build_dir)
+            # patch paths first so the entry is consistent the moment it becomes claimable
+            relocate_venv(build_dir / VENV_DIRNAME, build_dir, ready_dir)
+            os.rename(build_dir, ready_dir)
+        except Exception:
+            logger.exception("sandbox pool: failed to prepare sandbox")
+            shutil.rmtree(build_dir, ignore_errors=True)
+            return False
+        return True
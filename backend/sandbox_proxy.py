@@ -0,0 +1,210 @@
+"""Reverse proxy from `/preview/{project}/...` to the sandbox dev server.
+
+The dev server is started with `--base /preview/{project}/`, so paths are
+forwarded unchanged and Vite's asset URLs and HMR socket already point back
+at the proxy. HTTP goes through one pooled `httpx.AsyncClient` (keep-alive
+to the upstream); bodies are streamed in both directions, never buffered.
+WebSocket upgrades (Vite HMR) are bridged with `websockets`. A semaphore
+per sandbox caps concurrent upstream requests, and every proxied request
+counts as activity for the idle reaper (waking a hibernated server).
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Dict, Tuple
+
+import httpx
+import websockets
+from fastapi import HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from backend.core.settings import settings
+from backend.sandbox import SandboxManager, manager as sandbox_manager
+from backend.sandbox_reaper import reaper
+
+logger = logging.getLogger("backend")
+
+# RFC 7230 §6.1 hop-by-hop headers, plus ones the proxy sets itself
+_HOP_BY_HOP = {
+    "connection", "keep-alive", "proxy-authenticate", "proxy-authorization",
+    "te", "trailers", "transfer-encoding", "upgrade", "host",
+}
+
+
+def preview_prefix(sandbox_id: str) -> str:
+    return f"/preview/{sandbox_id}/"
+
+
+class PreviewProxy:
+    ACQUIRE_TIMEOUT_S = 30.0
+    WAKE_TIMEOUT_S = 30.0
+
+    def __init__(self, sandboxes: SandboxManager, max_connections: int):
+        self.sandboxes = sandboxes
+        self.max_connections = max(1, max_connections)
+        self.client: httpx.AsyncClient | None = None
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+
+    # ---------- lifecycle ---------- #
+    def start(self) -> None:
+        if self.client is None:
+            self.client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=None, max_keepalive_connections=64, keepalive_expiry=60),
+                timeout=httpx.Timeout(connect=5.0, read=None, write=60.0, pool=None),
+                follow_redirects=False,
+            )
+
+    async def stop(self) -> None:
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    # ---------- upstream ---------- #
+    async def upstream(self, project: str) -> Tuple[str, int]:
+        """`(host, port)` of the project's dev server; wakes it if it was put to sleep."""
+        if self.sandboxes.meta.get("sandboxId") != project:
+            raise HTTPException(status_code=404, detail="No active sandbox for this project")
+        dev = self.sandboxes.dev
+        was_asleep = dev.state in (dev.SUSPENDED, dev.HIBERNATED)
+        reaper.touch(project)
+        if was_asleep:
+            await run_in_threadpool(dev.wait_ready, self.WAKE_TIMEOUT_S)
+        if not self.sandboxes.is_active():
+            raise HTTPException(status_code=503, detail=f"Dev server is {dev.state}")
+        return "127.0.0.1", int(self.sandboxes.meta.get("port", 5173))
+
+    def _slot(self, project: str) -> asyncio.Semaphore:
+        slot = self._slots.get(project)
+        if slot is None:
+            slot = self._slots[project] = asyncio.Semaphore(self.max_connections)
+        return slot
+
+    async def _acquire(self, project: str) -> asyncio.Semaphore:
+        slot = self._slot(project)
+        try:
+            await asyncio.wait_for(slot.acquire(), self.ACQUIRE_TIMEOUT_S)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=503, detail="Too many concurrent preview requests")
+        return slot
+
+    # ---------- HTTP ---------- #
+    async def forward(self, request: Request, project: str, path: str) -> StreamingResponse:
+        assert self.client is not None, "proxy not started"
+        host, port = await self.upstream(project)
+        headers = [(k, v) for k, v in request.headers.items() if k.lower() not in _HOP_BY_HOP]
+        headers += [
+            ("host", f"{host}:{port}"),
+            ("x-forwarded-host", request.headers.get("host", "")),
+            ("x-forwarded-proto", request.url.scheme),
+            ("x-forwarded-prefix", preview_prefix(project).rstrip("/")),
+        ]
+        if request.client:
+            headers.append(("x-forwarded-for", request.client.host))
+        has_body = "content-length" in request.headers or "transfer-encoding" in request.headers
+        url = httpx.URL(scheme="http", host=host, port=port, path=preview_prefix(project) + path)
+        if request.url.query:
+            url = url.copy_with(query=request.url.query.encode())
+        upstream_req = self.client.build_request(
+            request.method,
+            url,
+            headers=headers,
+            content=request.stream() if has_body else None,
+        )
+        slot = await self._acquire(project)
+        try:
+            upstream = await self.client.send(upstream_req, stream=True)
+        except httpx.HTTPError as e:
+            slot.release()
+            raise HTTPException(status_code=502, detail=f"Dev server unreachable: {e}")
+        except BaseException:  # cancelled, or the request body failed midway
+            slot.release()
+            raise
+
+        closed = False
+
+        async def _close() -> None:
+            nonlocal closed
+            if not closed:
+                closed = True
+                await upstream.aclose()
+                slot.release()
+
+        async def _body():
+            try:
+                async for chunk in upstream.aiter_raw():  # compressed bytes pass through untouched
+                    yield chunk
+            finally:
+                await _close()
+
+        # the background task covers a response that is never iterated (client gone before it starts)
+        response = StreamingResponse(_body(), status_code=upstream.status_code, background=BackgroundTask(_close))
+        for k, v in upstream.headers.multi_items():
+            if k.lower() not in _HOP_BY_HOP:
+                response.headers.append(k, v)  # repeated headers (Set-Cookie) are kept
+        return response
+
+    # ---------- WebSocket (HMR) ---------- #
+    async def forward_ws(self, websocket: WebSocket, project: str, path: str) -> None:
+        try:
+            host, port = await self.upstream(project)
+            slot = await self._acquire(project)
+        except HTTPException:
+            await websocket.close(code=1011)
+            return
+        protocols = [p.strip() for p in websocket.headers.get("sec-websocket-protocol", "").split(",") if p.strip()]
+        query = f"?{websocket.url.query}" if websocket.url.query else ""
+        url = f"ws://{host}:{port}{preview_prefix(project)}{path}{query}"
+        try:
+            async with websockets.connect(url, subprotocols=protocols or None, max_size=None, open_timeout=10) as upstream:
+                await websocket.accept(subprotocol=upstream.subprotocol)
+                await self._bridge(websocket, upstream, project)
+        except (OSError, websockets.exceptions.WebSocketException) as e:
+            logger.info("preview: websocket to %s failed: %s", project, e)
+            try:
+                await websocket.close(code=1011)
+            except RuntimeError:
+                pass  # already closed
+        finally:
+            slot.release()
+
+    @staticmethod
+    async def _bridge(client: WebSocket, upstream, project: str) -> None:
+        async def client_to_upstream() -> None:
+            try:
+                while True:
+                    message = await client.receive()
+                    if message["type"] == "websocket.disconnect":
+                        return
+                    reaper.touch(project)
+                    if message.get("text") is not None:
+                        await upstream.send(message["text"])
+                    elif message.get("bytes") is not None:
+                        await upstream.send(message["bytes"])
+            except WebSocketDisconnect:
+                return
+
+        async def upstream_to_client() -> None:
+            async for message in upstream:
+                if isinstance(message, bytes):
+                    await client.send_bytes(message)
+                else:
+                    await client.send_text(message)
+
+        tasks = [asyncio.create_task(client_to_upstream()), asyncio.create_task(upstream_to_client())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+                if task.done() and not task.cancelled():
+                    task.exception()  # the peer went away; nothing to report
+        try:
+            await client.close()
+        except RuntimeError:
+            pass
+
+
+proxy = PreviewProxy(sandbox_manager, settings.preview_max_connections)
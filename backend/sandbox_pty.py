@@ -0,0 +1,228 @@
+"""Long-lived pseudo-terminal shell sessions for the sandbox terminal pane.
+
+Each session is an interactive shell on its own PTY, keyed by
+`(sandbox_id, name)`, so `cd`, exported variables and running programs
+survive between commands. Output is read from the PTY master on the event
+loop (no thread per session), appended to a bounded scrollback buffer and
+fanned out to attached listeners. Sessions without listeners are reaped
+after `pty_idle_timeout_s`.
+"""
+from __future__ import annotations
+
+import asyncio
+import fcntl
+import logging
+import os
+import pty
+import shutil
+import signal
+import struct
+import subprocess
+import termios
+import time
+from typing import Callable, Dict, List, Tuple
+
+from backend.core.settings import settings
+from backend.sandbox_limits import SERVICE_LIMITS, limits_preexec, scheduler
+
+logger = logging.getLogger("backend")
+
+Listener = Callable[[str, bytes | None], None]  # (session name, data or None on exit)
+
+
+def _set_controlling_tty() -> None:
+    # runs in the child after setsid(); fd 0 is already the PTY slave
+    fcntl.ioctl(0, termios.TIOCSCTTY, 0)
+
+
+class PtySession:
+    def __init__(self, sandbox_id: str, name: str, cwd: str, env: Dict[str, str],
+                 cols: int = 80, rows: int = 24, scrollback_bytes: int = 256 * 1024):
+        self.sandbox_id = sandbox_id
+        self.name = name
+        self.scrollback = bytearray()
+        self.scrollback_bytes = scrollback_bytes
+        self.listeners: List[Listener] = []
+        self.last_activity = time.time()
+        self.exit_code: int | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._pending = bytearray()
+
+        shell = shutil.which("bash")
+        argv = [shell, "--noprofile", "--norc", "-i"] if shell else ["/bin/sh", "-i"]
+        self.master, slave = pty.openpty()
+        self.resize(cols, rows)
+        try:
+            self.proc = subprocess.Popen(
+                argv,
+                stdin=slave,
+                stdout=slave,
+                stderr=slave,
+                cwd=cwd,
+                env=env,
+                start_new_session=True,
+                preexec_fn=limits_preexec(SERVICE_LIMITS, then=_set_controlling_tty),
+            )
+        finally:
+            os.close(slave)
+        os.set_blocking(self.master, False)
+
+    @property
+    def alive(self) -> bool:
+        return self.exit_code is None
+
+    def attach_loop(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._loop = loop
+        loop.add_reader(self.master, self._on_readable)
+
+    def _on_readable(self) -> None:
+        try:
+            data = os.read(self.master, 65536)
+        except BlockingIOError:
+            return
+        except OSError:  # EIO: every slave fd closed, i.e. the shell exited
+            data = b""
+        if not data:
+            self._on_exit()
+            return
+        self.last_activity = time.time()
+        self.scrollback += data
+        overflow = len(self.scrollback) - self.scrollback_bytes
+        if overflow > 0:
+            del self.scrollback[:overflow]
+        for listener in list(self.listeners):
+            listener(self.name, data)
+
+    def _detach_loop(self) -> None:
+        if self._loop is not None:
+            self._loop.remove_reader(self.master)
+            self._loop.remove_writer(self.master)
+            self._loop = None
+
+    def _on_exit(self) -> None:
+        self._detach_loop()
+        self.exit_code = self.proc.poll()
+        if self.exit_code is None:
+            self.exit_code = -1
+        for listener in list(self.listeners):
+            listener(self.name, None)
+        self.listeners.clear()
+
+    def write(self, data: bytes) -> None:
+        self.last_activity = time.time()
+        pending = not self._pending
+        self._pending += data
+        if pending:
+            self._flush()
+
+    def _flush(self) -> None:
+        try:
+            written = os.write(self.master, self._pending)
+        except BlockingIOError:
+            written = 0
+        except OSError:
+            self._pending.clear()
+            return
+        del self._pending[:written]
+        if self._loop is None:
+            return
+        # the shell is not draining its input yet; finish when the PTY is writable
+        if self._pending:
+            self._loop.add_writer(self.master, self._flush)
+        else:
+            self._loop.remove_writer(self.master)
+
+    def resize(self, cols: int, rows: int) -> None:
+        fcntl.ioctl(self.master, termios.TIOCSWINSZ, struct.pack("HHHH", rows, cols, 0, 0))
+        if getattr(self, "proc", None) is not None and self.alive:
+            try:
+                os.killpg(self.proc.pid, signal.SIGWINCH)
+            except ProcessLookupError:
+                pass
+
+    def close(self) -> None:
+        self._detach_loop()
+        if self.proc.poll() is None:
+            try:
+                os.killpg(self.proc.pid, signal.SIGHUP)
+            except ProcessLookupError:
+                pass
+        try:
+            os.close(self.master)
+        except OSError:
+            pass
+        if self.exit_code is None:
+            self.exit_code = self.proc.poll()
+
+
+class PtyManager:
+    REAP_INTERVAL_S = 30
+
+    def __init__(self, idle_timeout_s: int, scrollback_bytes: int):
+        self.idle_timeout_s = idle_timeout_s
+        self.scrollback_bytes = scrollback_bytes
+        self.sessions: Dict[Tuple[str, str], PtySession] = {}
+        self._reaper: asyncio.Task | None = None
+
+    def get(self, sandbox_id: str, name: str) -> PtySession | None:
+        session = self.sessions.get((sandbox_id, name))
+        if session is not None and not session.alive:
+            self.close(sandbox_id, name)
+            return None
+        return session
+
+    def open(self, sandbox_id: str, name: str, cwd: str, env: Dict[str, str],
+             cols: int = 80, rows: int = 24) -> PtySession:
+        """Return the live session `name` for the sandbox, creating it on demand."""
+        session = self.get(sandbox_id, name)
+        if session is None:
+            session = PtySession(sandbox_id, name, cwd, env, cols, rows, self.scrollback_bytes)
+            session.attach_loop(asyncio.get_running_loop())
+            self.sessions[(sandbox_id, name)] = session
+            scheduler.track(sandbox_id, session.proc.pid)
+            logger.info("pty: opened %s/%s (pid %s)", sandbox_id, name, session.proc.pid)
+        return session
+
+    def close(self, sandbox_id: str, name: str) -> None:
+        session = self.sessions.pop((sandbox_id, name), None)
+        if session is not None:
+            session.close()
+            scheduler.untrack(sandbox_id, session.proc.pid)
+
+    def list(self, sandbox_id: str) -> List[Dict[str, object]]:
+        return [
+            {"name": s.name, "alive": s.alive, "attached": len(s.listeners), "lastActivity": s.last_activity}
+            for (sid, _), s in self.sessions.items()
+            if sid == sandbox_id
+        ]
+
+    # ---------- idle reaping ---------- #
+    def start(self) -> None:
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(self._reap_loop())
+
+    async def stop(self) -> None:
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        for key in list(self.sessions):
+            self.close(*key)
+
+    async def _reap_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.REAP_INTERVAL_S)
+            self.reap()
+
+    def reap(self) -> int:
+        now = time.time()
+        stale = [
+            key for key, s in self.sessions.items()
+            if not s.alive or (not s.listeners and now - s.last_activity > self.idle_timeout_s)
+        ]
+        for key in stale:
+            logger.info("pty: reaping idle session %s/%s", *key)
+            self.close(*key)
+        return len(stale)
+
+
+manager = PtyManager(settings.pty_idle_timeout_s, settings.pty_scrollback_bytes)
@@ -0,0 +1,222 @@
+"""Idle hibernation for sandbox dev servers.
+
+Activity (file API, exec, chat, shell input, preview traffic) is recorded
+per sandbox. A background task compares it with the sandbox's `timeoutMs`:
+
+* idle longer than `timeoutMs` → the dev-server process group is paused
+  with SIGSTOP (no CPU, memory can be swapped out),
+* idle for another `sandbox_hibernate_after_s` → the group is terminated
+  and its resident memory is reported as reclaimed.
+
+The next activity resumes a paused group with SIGCONT, or restarts a
+terminated dev server in the background.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import signal
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict
+
+from fastapi import FastAPI, Request
+
+from backend.core.settings import settings
+from backend.sandbox import SandboxManager, manager as sandbox_manager
+
+logger = logging.getLogger("backend")
+
+# Requests that only observe the sandbox must not keep it awake
+_PASSIVE_PATHS = (
+    "/api/sandbox/status",
+    "/api/sandbox/logs",
+    "/api/sandbox/idle",
+    "/api/sandbox/usage",
+    "/api/sandbox/watch",
+    "/api/sandbox/kill",
+    "/api/io/stats",
+)
+
+
+def _group_rss(pgid: int) -> int:
+    """Resident memory (bytes) of all processes in a process group."""
+    total = 0
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "rb") as f:
+                # pgrp is the 3rd field after the parenthesised command name
+                fields = f.read().rsplit(b")", 1)[1].split()
+            if int(fields[2]) != pgid:
+                continue
+            with open(f"/proc/{entry}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except (OSError, IndexError, ValueError):
+            continue
+    return total
+
+
+class IdleReaper:
+    CHECK_INTERVAL_S = 15
+    MAX_EVENTS = 50
+
+    def __init__(self, sandboxes: SandboxManager, hibernate_after_s: int):
+        self.sandboxes = sandboxes
+        self.hibernate_after_s = hibernate_after_s
+        self.last_activity: Dict[str, float] = {}
+        self.suspended_at: Dict[str, float] = {}
+        self.hibernated: set[str] = set()
+        self.reclaimed_bytes = 0
+        self._resume_state = sandboxes.dev.READY
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=self.MAX_EVENTS)
+        self._lock = threading.Lock()
+        self._deferred: set[str] = set()  # wake-ups waiting for a reaper pass to release the lock
+        self._task: asyncio.Task | None = None
+
+    # ---------- activity ---------- #
+    def touch(self, sandbox_id: str | None = None) -> None:
+        sandbox_id = sandbox_id or self.sandboxes.meta.get("sandboxId")
+        if not sandbox_id:
+            return
+        self.last_activity[sandbox_id] = time.time()
+        if sandbox_id not in self.suspended_at and sandbox_id not in self.hibernated:
+            return
+        # called on the event loop: never wait for a reaper pass (hibernating waits for the dev server to exit)
+        if self._lock.acquire(blocking=False):
+            try:
+                self._wake(sandbox_id)
+            finally:
+                self._lock.release()
+        elif sandbox_id not in self._deferred:
+            self._deferred.add(sandbox_id)
+            threading.Thread(target=self._wake_later, args=(sandbox_id,), name="dev-wake", daemon=True).start()
+
+    def idle_seconds(self, sandbox_id: str) -> float:
+        return time.time() - self.last_activity.get(sandbox_id, time.time())
+
+    # ---------- transitions ---------- #
+    def check(self) -> None:
+        """One reaper pass over the active sandbox."""
+        sandbox_id = self.sandboxes.meta.get("sandboxId")
+        proc = self.sandboxes.process
+        if not sandbox_id or proc is None or not self.sandboxes.is_active():
+            return
+        self.last_activity.setdefault(sandbox_id, time.time())
+        idle = self.idle_seconds(sandbox_id)
+        suspend_after = int(self.sandboxes.meta.get("timeoutMs") or 0) / 1000
+        if suspend_after <= 0:
+            return
+        with self._lock:
+            if sandbox_id not in self.suspended_at:
+                if idle > suspend_after:
+                    self._suspend(sandbox_id, proc.pid)
+            elif idle > suspend_after + self.hibernate_after_s:
+                self._hibernate(sandbox_id, proc.pid)
+
+    def _suspend(self, sandbox_id: str, pgid: int) -> None:
+        try:
+            os.killpg(pgid, signal.SIGSTOP)
+        except ProcessLookupError:
+            return
+        self.suspended_at[sandbox_id] = time.time()
+        self._resume_state = self.sandboxes.dev.state
+        self.sandboxes.dev.set_state(self.sandboxes.dev.SUSPENDED)
+        self._record(sandbox_id, "suspend", rssBytes=_group_rss(pgid))
+
+    def _wake(self, sandbox_id: str) -> None:
+        """Resume or restart the dev server of `sandbox_id`; the caller holds the lock."""
+        if sandbox_id in self.suspended_at:
+            self._resume(sandbox_id)
+        elif sandbox_id in self.hibernated and sandbox_id == self.sandboxes.meta.get("sandboxId"):
+            self.hibernated.discard(sandbox_id)
+            self._record(sandbox_id, "restart")
+            threading.Thread(target=self._restart, name="dev-restart", daemon=True).start()
+
+    def _wake_later(self, sandbox_id: str) -> None:
+        with self._lock:
+            self._deferred.discard(sandbox_id)
+            self._wake(sandbox_id)
+
+    def _resume(self, sandbox_id: str) -> None:
+        del self.suspended_at[sandbox_id]
+        proc = self.sandboxes.process
+        if proc is not None and self.sandboxes.is_active():
+            try:
+                os.killpg(proc.pid, signal.SIGCONT)
+            except ProcessLookupError:
+                pass
+            self.sandboxes.dev.set_state(self._resume_state)
+        self._record(sandbox_id, "resume")
+
+    def _hibernate(self, sandbox_id: str, pgid: int) -> None:
+        rss = _group_rss(pgid)
+        self.sandboxes.stop_dev(state=self.sandboxes.dev.HIBERNATED)
+        self.suspended_at.pop(sandbox_id, None)
+        self.hibernated.add(sandbox_id)
+        self.reclaimed_bytes += rss
+        self._record(sandbox_id, "hibernate", reclaimedBytes=rss)
+        logger.info("idle reaper: hibernated %s, reclaimed %.1f MiB", sandbox_id, rss / 2**20)
+
+    def _restart(self) -> None:
+        try:
+            self.sandboxes.start_dev()
+        except Exception:
+            logger.exception("idle reaper: restarting dev server failed")
+
+    def _record(self, sandbox_id: str, event: str, **info: Any) -> None:
+        self.events.append({"sandboxId": sandbox_id, "event": event, "at": time.time(), **info})
+
+    def stats(self) -> Dict[str, Any]:
+        """Blocking (walks /proc for the dev server's memory); async callers use a worker thread."""
+        sandbox_id = self.sandboxes.meta.get("sandboxId")
+        proc = self.sandboxes.process
+        return {
+            "sandboxId": sandbox_id,
+            "state": self.sandboxes.dev.state,
+            "idleSeconds": round(self.idle_seconds(sandbox_id), 1) if sandbox_id else None,
+            "suspendAfterSeconds": int(self.sandboxes.meta.get("timeoutMs") or 0) / 1000,
+            "hibernateAfterSeconds": self.hibernate_after_s,
+            "rssBytes": _group_rss(proc.pid) if proc is not None and self.sandboxes.is_active() else 0,
+            "reclaimedBytes": self.reclaimed_bytes,
+            "events": list(self.events),
+        }
+
+    # ---------- background loop ---------- #
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.CHECK_INTERVAL_S)
+            try:
+                # hibernating waits for the process group to exit; keep it off the loop
+                await asyncio.to_thread(self.check)
+            except Exception:
+                logger.exception("idle reaper pass failed")
+
+
+def add_activity_middleware(app: FastAPI) -> None:
+    """Count every API request (except passive status polling) as sandbox activity."""
+
+    @app.middleware("http")
+    async def _track_activity(request: Request, call_next):  # type: ignore[override]
+        path = request.url.path
+        if path.startswith("/api/") and not path.startswith(_PASSIVE_PATHS):
+            reaper.touch()
+        return await call_next(request)
+
+
+reaper = IdleReaper(sandbox_manager, settings.sandbox_hibernate_after_s)
@@ -0,0 +1,366 @@
+"""Affected-test selection and execution for the active sandbox.
+
+`ImportGraph` maps every source file to the project files it imports:
+Python via `ast`, JS/TS via a regex scanner for `import`/`export ... from`/
+`require()`/`import()` with relative (or `@/` → `src/`) specifiers. Parsed
+imports are cached per file and reused while `(mtime_ns, size)` is
+unchanged, so rebuilding the graph after an edit only re-parses what changed.
+
+`select_tests()` walks the reverse graph from a set of changed files to the
+test files that (transitively) depend on them; `run_tests()` runs just those
+through pytest (sandbox venv) and/or vitest/jest, and reduces the machine-
+readable report (JUnit XML / JSON) to a compact list of failures.
+"""
+from __future__ import annotations
+
+import ast
+import json
+import os
+import re
+import shlex
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from collections import deque
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from backend.sandbox import manager as sandbox_manager
+from backend.sandbox_limits import scheduler
+from backend.sandbox_watch import pruned_dirs
+
+PY_EXTS = (".py",)
+JS_EXTS = (".ts", ".tsx", ".js", ".jsx", ".mjs", ".cjs")
+_PY_TEST_RE = re.compile(r"(^|/)(test_[^/]*|[^/]*_test)\.py$")
+_JS_TEST_RE = re.compile(r"(\.(test|spec)\.[cm]?[jt]sx?$)|(^|/)__tests__/")
+_JS_IMPORT_RE = re.compile(
+    r"""(?:\bimport\s+(?:[\w*{}\s,$]+\s+from\s+)?|\bexport\s+[\w*{}\s,$]+\s+from\s+|\brequire\s*\(\s*|\bimport\s*\(\s*)"""
+    r"""['"]([^'"\n]+)['"]"""
+)
+_JS_COMMENT_RE = re.compile(r"/\*[\s\S]*?\*/|(?<![:'\"])//[^\n]*")
+Ref = Tuple[str, str, Tuple[str, ...]]  # ("py" | "pyrel" | "js", anchor dir or JS target, module parts)
+MAX_FAILURES = 20
+MAX_MESSAGE_CHARS = 600
+
+
+def is_test_file(rel: str) -> bool:
+    return bool(_PY_TEST_RE.search(rel) or _JS_TEST_RE.search(rel))
+
+
+class ImportGraph:
+    def __init__(self, root: Path):
+        self.root = root
+        self.prune = pruned_dirs()
+        self.files: Set[str] = set()
+        self.deps: Dict[str, Set[str]] = {}
+        # rel → (stat key, unresolved import references); references are resolved on every
+        # build so an import of a file that only appears later is picked up without re-parsing
+        self._parsed: Dict[str, Tuple[Tuple[int, int], List[Ref]]] = {}
+
+    def build(self) -> "ImportGraph":
+        stats = self._scan()
+        self.files = set(stats)
+        self._parsed = {rel: v for rel, v in self._parsed.items() if rel in stats}
+        for rel, key in stats.items():
+            cached = self._parsed.get(rel)
+            if cached is None or cached[0] != key:
+                self._parsed[rel] = (key, self._parse(rel))
+        self.deps = {rel: self._resolve(rel, refs) for rel, (_, refs) in self._parsed.items()}
+        return self
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        found: Dict[str, Tuple[int, int]] = {}
+        stack = [""]
+        while stack:
+            current = stack.pop()
+            try:
+                entries = list(os.scandir(self.root / current))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                rel = f"{current}/{entry.name}" if current else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in self.prune and not entry.name.startswith("."):
+                        stack.append(rel)
+                elif entry.name.endswith(PY_EXTS + JS_EXTS):
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    found[rel] = (st.st_mtime_ns, st.st_size)
+        return found
+
+    # ---------- parsing ---------- #
+    def _parse(self, rel: str) -> List[Ref]:
+        try:
+            source = (self.root / rel).read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            return []
+        if rel.endswith(PY_EXTS):
+            return self._python_refs(rel, source)
+        return self._js_refs(rel, source)
+
+    @staticmethod
+    def _python_refs(rel: str, source: str) -> List[Ref]:
+        try:
+            tree = ast.parse(source, filename=rel)
+        except (SyntaxError, ValueError):
+            return []
+        package = PurePosixPath(rel).parent
+        refs: List[Ref] = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                refs.extend(("py", "", tuple(alias.name.split("."))) for alias in node.names)
+            elif isinstance(node, ast.ImportFrom):
+                parts = tuple(node.module.split(".")) if node.module else ()
+                if node.level:
+                    base = package
+                    for _ in range(node.level - 1):
+                        base = base.parent
+                    kind, anchor = "pyrel", str(base)
+                else:
+                    kind, anchor = "py", ""
+                if parts or node.level:
+                    refs.append((kind, anchor, parts))
+                # `from pkg import mod` may name a submodule rather than an attribute
+                refs.extend((kind, anchor, parts + (alias.name,)) for alias in node.names)
+        return refs
+
+    @staticmethod
+    def _js_refs(rel: str, source: str) -> List[Ref]:
+        source = _JS_COMMENT_RE.sub("", source)
+        directory = PurePosixPath(rel).parent
+        refs: List[Ref] = []
+        for spec in _JS_IMPORT_RE.findall(source):
+            if spec.startswith("."):
+                target = os.path.normpath(str(directory / spec))
+            elif spec.startswith("@/"):
+                target = "src/" + spec[2:]
+            elif spec.startswith("/"):
+                target = spec.lstrip("/")
+            else:
+                continue  # package import
+            refs.append(("js", target, ()))
+        return refs
+
+    # ---------- resolution ---------- #
+    def _resolve(self, rel: str, refs: List[Ref]) -> Set[str]:
+        package = PurePosixPath(rel).parent
+        deps: Set[str] = set()
+        for kind, anchor, parts in refs:
+            if kind == "js":
+                hit = self._resolve_js(anchor)
+                if hit:
+                    deps.add(hit)
+            elif kind == "pyrel":
+                deps |= self._resolve_py_at(PurePosixPath(anchor), list(parts))
+            else:
+                # absolute imports: project root, a src/ layout, or the importing file's own directory
+                for base in (PurePosixPath(""), PurePosixPath("src"), package):
+                    hits = self._resolve_py_at(base, list(parts))
+                    if hits:
+                        deps |= hits
+                        break
+        deps.discard(rel)
+        return deps
+
+    def _resolve_py_at(self, base: PurePosixPath, parts: List[str]) -> Set[str]:
+        if not parts:
+            init = str(base / "__init__.py")
+            return {init} if init in self.files else set()
+        stem = base.joinpath(*parts)
+        for candidate in (f"{stem}.py", f"{stem}/__init__.py"):
+            candidate = candidate.lstrip("/")
+            if candidate in self.files:
+                return {candidate}
+        return set()
+
+    def _resolve_js(self, target: str) -> str | None:
+        if target in self.files:
+            return target
+        stem = re.sub(r"\.[cm]?jsx?$", "", target)  # TS sources are imported as ./x.js
+        for ext in JS_EXTS:
+            if stem + ext in self.files:
+                return stem + ext
+        for ext in JS_EXTS:
+            if f"{target}/index{ext}" in self.files:
+                return f"{target}/index{ext}"
+        return None
+
+    # ---------- selection ---------- #
+    def dependents(self, changed: Iterable[str]) -> Set[str]:
+        """Every file that transitively imports one of `changed` (including `changed`)."""
+        reverse: Dict[str, Set[str]] = {}
+        for rel, deps in self.deps.items():
+            for dep in deps:
+                reverse.setdefault(dep, set()).add(rel)
+        seen = set(changed)
+        queue = deque(seen)
+        while queue:
+            for parent in reverse.get(queue.popleft(), ()):
+                if parent not in seen:
+                    seen.add(parent)
+                    queue.append(parent)
+        return seen
+
+    def tests(self) -> Set[str]:
+        return {rel for rel in self.files if is_test_file(rel)}
+
+
+_graphs: Dict[str, ImportGraph] = {}
+
+
+def graph_for(sandbox_id: str, root: Path) -> ImportGraph:
+    """The sandbox's import graph, incrementally refreshed."""
+    graph = _graphs.get(sandbox_id)
+    if graph is None or graph.root != root:
+        graph = _graphs[sandbox_id] = ImportGraph(root)
+    return graph.build()
+
+
+def select_tests(graph: ImportGraph, changed: Iterable[str] | None) -> List[str]:
+    """Tests affected by `changed`; every test when `changed` is None."""
+    tests = graph.tests()
+    if changed is None:
+        return sorted(tests)
+    changed = {c.strip("/") for c in changed}
+    return sorted(graph.dependents(changed) & tests)
+
+
+# ---------- running ---------- #
+def _js_runner(root: Path) -> str | None:
+    try:
+        pkg = json.loads((root / "package.json").read_text())
+    except (OSError, ValueError):
+        return None
+    declared = {**pkg.get("dependencies", {}), **pkg.get("devDependencies", {})}
+    for runner in ("vitest", "jest"):
+        if runner in declared:
+            return runner
+    return None
+
+
+def _clip(text: str) -> str:
+    text = (text or "").strip()
+    return text if len(text) <= MAX_MESSAGE_CHARS else text[:MAX_MESSAGE_CHARS] + "…"
+
+
+def _run_pytest(root: Path, tests: List[str], timeout: int) -> Dict[str, Any]:
+    report = Path(tempfile.mkstemp(prefix="pytest-", suffix=".xml")[1])
+    try:
+        cmd = shlex.join([
+            "python", "-m", "pytest", "-q", "-p", "no:cacheprovider",
+            "-o", "junit_family=xunit1",  # xunit1 keeps file/line on each testcase
+            f"--junitxml={report}", *tests,
+        ])
+        proc = sandbox_manager.run_command(cmd, timeout=timeout)
+        summary: Dict[str, Any] = {"runner": "pytest", "passed": 0, "failed": 0, "errors": 0, "skipped": 0, "failures": []}
+        if proc.get("error"):
+            return {**summary, "error": proc["error"]}
+        if "No module named pytest" in (proc.get("stderr") or ""):
+            return {**summary, "error": "pytest is not installed in the sandbox venv (pip install pytest)"}
+        try:
+            suites = ET.parse(report).getroot()
+        except (ET.ParseError, OSError):
+            return {**summary, "error": _clip(proc.get("stderr") or proc.get("stdout") or "pytest produced no report")}
+        for case in suites.iter("testcase"):
+            problem = case.find("failure")
+            kind = "failed"
+            if problem is None:
+                problem, kind = case.find("error"), "errors"
+            if problem is None:
+                summary["skipped" if case.find("skipped") is not None else "passed"] += 1
+                continue
+            summary[kind] += 1
+            if len(summary["failures"]) < MAX_FAILURES:
+                summary["failures"].append({
+                    "test": f"{case.get('classname', '')}::{case.get('name', '')}",
+                    "file": case.get("file"),
+                    "line": int(case.get("line")) + 1 if case.get("line", "").isdigit() else None,
+                    "message": _clip(problem.get("message") or problem.text or ""),
+                })
+        return summary
+    finally:
+        report.unlink(missing_ok=True)
+
+
+def _run_js(root: Path, runner: str, tests: List[str], timeout: int) -> Dict[str, Any]:
+    report = Path(tempfile.mkstemp(prefix=f"{runner}-", suffix=".json")[1])
+    try:
+        if runner == "vitest":
+            argv = ["npx", "--no-install", "vitest", "run", "--reporter=json", f"--outputFile={report}", *tests]
+        else:
+            argv = ["npx", "--no-install", "jest", "--ci", "--json", f"--outputFile={report}", *tests]
+        proc = sandbox_manager.run_command(shlex.join(argv), timeout=timeout)
+        summary: Dict[str, Any] = {"runner": runner, "passed": 0, "failed": 0, "errors": 0, "skipped": 0, "failures": []}
+        if proc.get("error"):
+            return {**summary, "error": proc["error"]}
+        try:
+            data = json.loads(report.read_text() or "null") or {}
+        except (OSError, ValueError):
+            data = {}
+        if not data:
+            return {**summary, "error": _clip(proc.get("stderr") or proc.get("stdout") or f"{runner} produced no report")}
+        for suite in data.get("testResults", []):
+            file = os.path.relpath(suite.get("name", ""), root) if suite.get("name") else None
+            assertions = suite.get("assertionResults", [])
+            if not assertions and suite.get("status") == "failed":
+                summary["errors"] += 1  # suite failed to load (syntax/import error)
+                summary["failures"].append({"test": file, "file": file, "line": None, "message": _clip(suite.get("message", ""))})
+            for a in assertions:
+                status = a.get("status")
+                if status == "passed":
+                    summary["passed"] += 1
+                elif status == "failed":
+                    summary["failed"] += 1
+                    if len(summary["failures"]) < MAX_FAILURES:
+                        location = a.get("location") or {}
+                        summary["failures"].append({
+                            "test": a.get("fullName") or a.get("title"),
+                            "file": file,
+                            "line": location.get("line"),
+                            "message": _clip("\n".join(a.get("failureMessages") or [])),
+                        })
+                else:
+                    summary["skipped"] += 1
+        return summary
+    finally:
+        report.unlink(missing_ok=True)
+
+
+def run_tests(changed: Iterable[str] | None = None, timeout: int = 120, dry_run: bool = False) -> Dict[str, Any]:
+    """Select the tests affected by `changed` (all tests when None) and run them."""
+    sandbox_id = sandbox_manager.meta.get("sandboxId")
+    if not sandbox_id:
+        raise RuntimeError("Sandbox not created yet")
+    root = sandbox_manager._sandbox_dir()
+    if changed is not None:
+        changed = sorted({c.strip("/") for c in changed})
+    started = time.perf_counter()
+    graph = graph_for(sandbox_id, root)
+    selected = select_tests(graph, changed)
+    result: Dict[str, Any] = {
+        "changed": changed,
+        "selected": selected,
+        "graphFiles": len(graph.files),
+        "selectMs": round((time.perf_counter() - started) * 1000, 1),
+    }
+    if dry_run or not selected:
+        return result
+    runs = []
+    py_tests = [t for t in selected if t.endswith(PY_EXTS)]
+    js_tests = [t for t in selected if not t.endswith(PY_EXTS)]
+    # test runs share the execution slots of terminal commands
+    with scheduler.thread_slot(sandbox_id):
+        if py_tests:
+            runs.append(_run_pytest(root, py_tests, timeout))
+        if js_tests:
+            runner = _js_runner(root)
+            if runner is None:
+                runs.append({"runner": None, "error": "no vitest or jest in package.json", "tests": js_tests})
+            else:
+                runs.append(_run_js(root, runner, js_tests, timeout))
+    result["runs"] = runs
+    result["ok"] = all(not r.get("error") and not r.get("failed") and not r.get("errors") for r in runs)
+    result["durationMs"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
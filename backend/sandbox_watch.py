@@ -0,0 +1,469 @@
+"""Filesystem change watching for the active sandbox.
+
+Changes made outside the backend's own write paths (`npm install`, terminal
+commands, the dev server) are picked up with inotify (via ctypes, no extra
+dependency) or, where inotify is unavailable or out of watches, with an
+mtime-polling walk. Both prune `SandboxManager.EXCLUDED_PATTERNS` and the venv.
+
+Raw events are debounced and coalesced per path (created + deleted cancels
+out, deleted + created becomes modified, ...) into batches. Each batch
+updates `SandboxManager.cache`, is passed to subscribers (indexes) and is
+kept in a short history that clients follow over SSE, resuming by sequence.
+"""
+from __future__ import annotations
+
+import asyncio
+import ctypes
+import errno
+import logging
+import os
+import stat
+import struct
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Iterator, List, Set, Tuple
+
+from backend.core.fileio import executor as io_pool
+from backend.core.settings import settings
+from backend.sandbox import SandboxManager, manager as sandbox_manager
+from backend.sandbox_env import VENV_DIRNAME
+
+logger = logging.getLogger("backend")
+
+Change = Dict[str, Any]  # {"path": rel, "kind": created|modified|deleted, "dir": bool}
+Listener = Callable[[str, List[Change]], None]  # (sandbox id, changes)
+
+# inotify(7) constants
+IN_MODIFY, IN_ATTRIB, IN_CLOSE_WRITE = 0x2, 0x4, 0x8
+IN_MOVED_FROM, IN_MOVED_TO, IN_CREATE, IN_DELETE = 0x40, 0x80, 0x100, 0x200
+IN_DELETE_SELF, IN_MOVE_SELF = 0x400, 0x800
+IN_Q_OVERFLOW, IN_IGNORED, IN_ISDIR = 0x4000, 0x8000, 0x40000000
+IN_NONBLOCK, IN_CLOEXEC = 0o4000, 0o2000000
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+_EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len
+
+# how consecutive events on one path combine; None = they cancel out
+_COALESCE = {
+    ("created", "modified"): "created",
+    ("created", "deleted"): None,
+    ("modified", "modified"): "modified",
+    ("modified", "deleted"): "deleted",
+    ("deleted", "created"): "modified",
+    ("deleted", "modified"): "modified",
+}
+
+
+def pruned_dirs() -> Set[str]:
+    """Directory names never watched: EXCLUDED_PATTERNS roots plus the venv."""
+    return {p.split("/")[0] for p in SandboxManager.EXCLUDED_PATTERNS} | {VENV_DIRNAME}
+
+
+class _Inotify:
+    """Just enough of the inotify API; raises OSError where it is unavailable."""
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add(self, path: Path) -> int:
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), str(path))
+        return wd
+
+    def remove(self, wd: int) -> None:
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self) -> List[Tuple[int, int, str]]:
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events, offset = [], 0
+        while offset < len(buf):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(buf, offset)
+            offset += _EVENT_HEADER.size
+            name = buf[offset:offset + length].rstrip(b"\0").decode("utf-8", errors="surrogateescape")
+            offset += length
+            events.append((wd, mask, name))
+        return events
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class SandboxWatcher:
+    """Watches one sandbox directory and reports debounced, coalesced batches."""
+
+    MAX_DELAY_FACTOR = 5  # a constant stream of events is still flushed every 5 × debounce
+
+    def __init__(self, root: Path, on_changes: Callable[[List[Change]], None],
+                 debounce_s: float, poll_interval_s: float):
+        self.root = root
+        self.on_changes = on_changes
+        self.debounce_s = debounce_s
+        self.poll_interval_s = poll_interval_s
+        self.prune = pruned_dirs()
+        self.backend = "none"
+        self._pending: Dict[str, Tuple[str, bool]] = {}
+        self._first_pending = 0.0
+        self._flush_handle: asyncio.TimerHandle | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._inotify: _Inotify | None = None
+        self._wds: Dict[int, str] = {}  # watch descriptor → directory (relative, "" = root)
+        self._poll_task: asyncio.Task | None = None
+
+    @property
+    def alive(self) -> bool:
+        # with inotify, losing every watch means the sandbox directory itself went away
+        return self.backend == "polling" or bool(self._wds)
+
+    # ---------- lifecycle ---------- #
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        try:
+            self._inotify = _Inotify()
+            self._watch_tree("")
+            self._loop.add_reader(self._inotify.fd, self._on_inotify)
+            self.backend = "inotify"
+        except OSError as e:
+            # ENOSPC: out of watches (fs.inotify.max_user_watches); anything else: no inotify here
+            logger.info("watcher: inotify unavailable for %s (%s); polling every %.1fs",
+                        self.root.name, e, self.poll_interval_s)
+            self._close_inotify()
+            self._poll_task = asyncio.create_task(self._poll_loop())
+            self.backend = "polling"
+
+    def stop(self) -> None:
+        self._close_inotify()
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            self._poll_task = None
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+    def _close_inotify(self) -> None:
+        if self._inotify is not None:
+            if self._loop is not None:
+                self._loop.remove_reader(self._inotify.fd)
+            self._inotify.close()
+            self._inotify = None
+        self._wds.clear()
+
+    # ---------- inotify ---------- #
+    def _watch_tree(self, rel_dir: str) -> List[Tuple[str, bool]]:
+        """Watch `rel_dir` and its subdirectories; returns `(path, is_dir)` already inside."""
+        assert self._inotify is not None
+        found: List[Tuple[str, bool]] = []
+        stack = [rel_dir]
+        while stack:
+            current = stack.pop()
+            try:
+                self._wds[self._inotify.add(self.root / current)] = current
+                entries = list(os.scandir(self.root / current))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                rel = f"{current}/{entry.name}" if current else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in self.prune:
+                        stack.append(rel)
+                        found.append((rel, True))
+                else:
+                    found.append((rel, False))
+        return found
+
+    def _unwatch_tree(self, rel_dir: str) -> None:
+        assert self._inotify is not None
+        for wd, path in list(self._wds.items()):
+            if path == rel_dir or path.startswith(rel_dir + "/"):
+                self._inotify.remove(wd)
+                del self._wds[wd]
+
+    def _on_inotify(self) -> None:
+        if self._inotify is None:
+            return
+        for wd, mask, name in self._inotify.read():
+            if mask & IN_Q_OVERFLOW:
+                self._record("", "rescan", True)
+                continue
+            if mask & IN_IGNORED:
+                self._wds.pop(wd, None)
+                continue
+            parent = self._wds.get(wd)
+            if parent is None or not name:
+                continue  # *_SELF events; the parent directory reports those
+            rel = f"{parent}/{name}" if parent else name
+            is_dir = bool(mask & IN_ISDIR)
+            if is_dir and name in self.prune:
+                continue
+            if mask & (IN_CREATE | IN_MOVED_TO):
+                self._record(rel, "created", is_dir)
+                if is_dir:
+                    try:
+                        # files can land in a new directory before its watch exists
+                        for inner, inner_is_dir in self._watch_tree(rel):
+                            self._record(inner, "created", inner_is_dir)
+                    except OSError as e:
+                        logger.warning("watcher: cannot watch %s: %s", rel, e)
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                self._record(rel, "deleted", is_dir)
+                if is_dir and mask & IN_MOVED_FROM:
+                    self._unwatch_tree(rel)
+            elif mask & IN_CLOSE_WRITE:
+                self._record(rel, "modified", False)
+
+    # ---------- polling fallback ---------- #
+    def _snapshot(self) -> Dict[str, Tuple[bool, int, int]]:
+        found: Dict[str, Tuple[bool, int, int]] = {}
+        stack = [""]
+        while stack:
+            current = stack.pop()
+            try:
+                entries = list(os.scandir(self.root / current))
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            for entry in entries:
+                rel = f"{current}/{entry.name}" if current else entry.name
+                try:
+                    st = entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                if stat.S_ISDIR(st.st_mode):
+                    if entry.name in self.prune:
+                        continue
+                    stack.append(rel)
+                    found[rel] = (True, 0, 0)
+                else:
+                    found[rel] = (False, st.st_mtime_ns, st.st_size)
+        return found
+
+    async def _poll_loop(self) -> None:
+        previous = await asyncio.to_thread(self._snapshot)
+        while True:
+            await asyncio.sleep(self.poll_interval_s)
+            try:
+                current = await asyncio.to_thread(self._snapshot)
+            except OSError as e:
+                logger.warning("watcher: poll of %s failed: %s", self.root.name, e)
+                continue
+            for rel in current.keys() - previous.keys():
+                self._record(rel, "created", current[rel][0])
+            for rel in previous.keys() - current.keys():
+                self._record(rel, "deleted", previous[rel][0])
+            for rel in current.keys() & previous.keys():
+                if current[rel] != previous[rel]:
+                    self._record(rel, "modified", current[rel][0])
+            previous = current
+
+    # ---------- debounce ---------- #
+    def _record(self, rel: str, kind: str, is_dir: bool) -> None:
+        assert self._loop is not None
+        now = self._loop.time()
+        if not self._pending:
+            self._first_pending = now
+        if kind == "rescan":
+            self._pending = {"": ("rescan", True)}
+        elif self._pending.get("", ("",))[0] != "rescan":
+            before = self._pending.get(rel)
+            if before is None:
+                self._pending[rel] = (kind, is_dir)
+            else:
+                merged = _COALESCE.get((before[0], kind), kind)
+                if merged is None:
+                    del self._pending[rel]
+                else:
+                    self._pending[rel] = (merged, is_dir)
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        delay = self.debounce_s
+        if now - self._first_pending >= self.debounce_s * self.MAX_DELAY_FACTOR:
+            delay = 0
+        self._flush_handle = self._loop.call_later(delay, self._flush)
+
+    def _flush(self) -> None:
+        self._flush_handle = None
+        pending, self._pending = self._pending, {}
+        changes: List[Change] = []
+        for rel, (kind, is_dir) in sorted(pending.items()):
+            if kind in ("created", "modified") and not os.path.lexists(self.root / rel):
+                continue  # already gone again
+            changes.append({"path": rel, "kind": kind, "dir": is_dir})
+        if changes:
+            self.on_changes(changes)
+
+
+class FileWatchService:
+    """Keeps a watcher on whichever sandbox is active and fans out its batches."""
+
+    FOLLOW_INTERVAL_S = 1.0
+    HISTORY = 256
+    BULK_CHANGES = 1000  # a bulk operation reporting more paths than this publishes `rescan` instead
+
+    def __init__(self, sandboxes: SandboxManager, debounce_s: float, poll_interval_s: float):
+        self.sandboxes = sandboxes
+        self.debounce_s = debounce_s
+        self.poll_interval_s = poll_interval_s
+        self.sandbox_id: str | None = None
+        self.watcher: SandboxWatcher | None = None
+        self.history: Deque[Tuple[int, Dict[str, Any]]] = deque(maxlen=self.HISTORY)
+        self.next_seq = 1
+        self.listeners: List[Listener] = []
+        self._changed: asyncio.Event | None = None
+        self._announcing: asyncio.Future | None = None  # last batch on its way out
+        self._task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._muted: List[str] = []  # sandbox-relative subtrees a bulk operation is working on
+
+    def subscribe(self, listener: Listener) -> None:
+        """Call `listener(sandbox_id, changes)` for every batch (e.g. to update an index)."""
+        self.listeners.append(listener)
+
+    # ---------- lifecycle ---------- #
+    def start(self) -> None:
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._changed = asyncio.Event()
+            self._task = asyncio.create_task(self._follow_loop())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._retarget(None)
+
+    async def _follow_loop(self) -> None:
+        while True:
+            sandbox_id = self.sandboxes.meta.get("sandboxId")
+            if sandbox_id != self.sandbox_id or (sandbox_id and (self.watcher is None or not self.watcher.alive)):
+                self._retarget(sandbox_id)
+            await asyncio.sleep(self.FOLLOW_INTERVAL_S)
+
+    def _retarget(self, sandbox_id: str | None) -> None:
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+        self.sandbox_id = sandbox_id
+        root = self.sandboxes.workspace_root / sandbox_id if sandbox_id else None
+        if root is None or not root.is_dir():
+            return
+        watcher = SandboxWatcher(
+            root, lambda changes: self._publish(sandbox_id, changes), self.debounce_s, self.poll_interval_s,
+        )
+        try:
+            watcher.start()
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                logger.exception("watcher: cannot watch %s", sandbox_id)
+            return
+        self.watcher = watcher
+        logger.info("watcher: following %s via %s", sandbox_id, watcher.backend)
+
+    # ---------- bulk operations ---------- #
+    @contextmanager
+    def bulk(self, *paths: str) -> Iterator[Callable[[str, str, bool], None]]:
+        """Mute the watcher below `paths` (absolute) while a tree operation runs in a worker thread.
+
+        The operation reports what it did via the yielded `report(path, kind, is_dir)`;
+        on exit that becomes one batch (or `rescan` past `BULK_CHANGES`) instead of
+        a flood of per-file events and cache updates.
+        """
+        watcher, sandbox_id, loop = self.watcher, self.sandbox_id, self._loop
+        if watcher is None or loop is None:
+            yield lambda path, kind, is_dir: None
+            return
+        root = str(watcher.root)
+        muted = [os.path.relpath(p, root) for p in paths if os.path.commonpath([root, p]) == root]
+        self._muted.extend(muted)
+        changes: List[Change] = []
+
+        def report(path: str, kind: str, is_dir: bool) -> None:
+            if len(changes) > self.BULK_CHANGES or os.path.commonpath([root, path]) != root:
+                return
+            changes.append({"path": os.path.relpath(path, root), "kind": kind, "dir": is_dir})
+
+        try:
+            yield report
+        finally:
+            if len(changes) > self.BULK_CHANGES:
+                changes = [{"path": "", "kind": "rescan", "dir": True}]
+            # events of the operation itself may still be on their way through the debounce
+            loop.call_soon_threadsafe(loop.call_later, self.debounce_s * 2, self._end_bulk, sandbox_id, muted, changes)
+
+    def _end_bulk(self, sandbox_id: str, muted: List[str], changes: List[Change]) -> None:
+        for rel in muted:
+            self._muted.remove(rel)
+        if changes:
+            self._publish(sandbox_id, changes)
+
+    def _is_muted(self, rel: str) -> bool:
+        return any(rel == m or rel.startswith(m + "/") for m in self._muted)
+
+    # ---------- fan-out ---------- #
+    def _publish(self, sandbox_id: str, changes: List[Change]) -> None:
+        if sandbox_id != self.sandbox_id:
+            return
+        if self._muted:
+            changes = [c for c in changes if c["kind"] == "rescan" or not self._is_muted(c["path"])]
+            if not changes:
+                return
+        # batches are folded into the file index off the loop, one at a time, and announced in order
+        self._announcing = asyncio.ensure_future(self._announce(self._announcing, sandbox_id, changes))
+
+    async def _announce(self, previous: asyncio.Future | None, sandbox_id: str, changes: List[Change]) -> None:
+        if previous is not None:
+            await asyncio.wait([previous])
+        rescan = any(c["kind"] == "rescan" for c in changes)
+        if rescan:
+            self.sandboxes.cache = {}
+        else:
+            try:
+                await io_pool.run("watch-index", self.sandboxes.apply_file_changes, changes)
+            except Exception:
+                logger.exception("watcher: updating the file index failed")
+        for listener in list(self.listeners):
+            try:
+                listener(sandbox_id, changes)
+            except Exception:
+                logger.exception("watcher: listener failed")
+        seq = self.next_seq
+        self.next_seq += 1
+        self.history.append((seq, {"sandboxId": sandbox_id, "rescan": rescan, "changes": [] if rescan else changes}))
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = asyncio.Event()
+
+    async def events(self, after: int = 0) -> AsyncIterator[Tuple[int, str, Dict[str, Any]]]:
+        """Yield `(seq, "changes" | "rescan", batch)` after `after`, forever."""
+        oldest = self.history[0][0] if self.history else self.next_seq
+        if 0 < after < oldest - 1:
+            # the client missed batches we no longer have
+            yield self.next_seq - 1, "rescan", {"sandboxId": self.sandbox_id, "rescan": True, "changes": []}
+            after = self.next_seq - 1
+        elif after == 0:
+            after = self.next_seq - 1  # new clients start from now
+        while True:
+            changed = self._changed
+            for seq, batch in list(self.history):
+                if seq > after:
+                    after = seq
+                    yield seq, "rescan" if batch["rescan"] else "changes", batch
+            if changed is None:
+                return
+            await changed.wait()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sandboxId": self.sandbox_id,
+            "backend": self.watcher.backend if self.watcher else None,
+            "watchedDirs": len(self.watcher._wds) if self.watcher else 0,
+            "seq": self.next_seq - 1,
+        }
+
+
+watcher = FileWatchService(sandbox_manager, settings.watch_debounce_ms / 1000, settings.watch_poll_interval_s)
@@ -6,10 +6,14 @@ from pathlib import Path
 from typing import Any, Dict, List, Tuple
 import re
 import logging
+import time
 
 from backend.ai_providers import call_llm, AIProviderError
-from backend.tools import TOOLS_REGISTRY, build_function_schemas
+from backend.core import metrics
+from backend.core.logging import lazy_json, span
+from backend.tools import TOOLS_REGISTRY, begin_turn, build_function_schemas
 from backend.sandbox import manager as sandbox_manager
+from backend.sandbox_checkpoints import checkpoint_active
 from backend.models.ai import ChatRequest
 
 
@@ -42,6 +46,16 @@ class AIService:
         # ensure workspace exists for project
         sandbox_manager.init(project_name=project)
 
+        begin_turn()
+
+        # snapshot the workspace so this turn's tool edits can be reviewed and undone
+        checkpoint_id = None
+        try:
+            checkpoint = checkpoint_active(label="before agent turn")
+            checkpoint_id = checkpoint["id"] if checkpoint else None
+        except Exception:
+            logger.exception("checkpoint before agent turn failed")
+
         function_schemas = build_function_schemas()
 
         # Decide mode
@@ -95,10 +109,7 @@ class AIService:
         except AIProviderError as e:
             # Fallback: call without tools to at least produce a textual response
             resp = call_llm(provider, model_id, messages, None)
-        try:
-            logger.info("LLM initial response:\n%s", json.dumps(resp, indent=2)[:2000])
-        except Exception:
-            pass
+        logger.debug("LLM initial response:\n%s", lazy_json(resp))
 
         iterations = 0
         max_iterations = 8 if is_large else 4
@@ -123,10 +134,7 @@ class AIService:
                 messages.append(choice["message"])  # assistant invoking tool
                 messages.append({"role": "function", "name": fn_name, "content": json.dumps(tool_result)})
                 resp = call_llm(provider, model_id, messages, function_schemas)
-                try:
-                    logger.info("LLM response (function_call loop):\n%s", json.dumps(resp, indent=2)[:2000])
-                except Exception:
-                    pass
+                logger.debug("LLM response (function_call loop):\n%s", lazy_json(resp))
                 continue
 
             # OpenAI tool_calls (batch supported)
@@ -156,10 +164,7 @@ class AIService:
                         pass
                 # Follow-up without tools to avoid provider complaints
                 resp = call_llm(provider, model_id, messages, None)
-                try:
-                    logger.info("LLM response (tool_calls loop):\n%s", json.dumps(resp, indent=2)[:2000])
-                except Exception:
-                    pass
+                logger.debug("LLM response (tool_calls loop):\n%s", lazy_json(resp))
                 continue
 
             # Fallback: <tool-use>{...}</tool-use>
@@ -176,10 +181,7 @@ class AIService:
                         messages.append({"role": "assistant", "content": content})
                         messages.append({"role": "function", "name": fn_name, "content": json.dumps(tool_result)})
                         resp = call_llm(provider, model_id, messages, function_schemas)
-                        try:
-                            logger.info("LLM response (plain <tool-use> loop):\n%s", json.dumps(resp, indent=2)[:2000])
-                        except Exception:
-                            pass
+                        logger.debug("LLM response (plain <tool-use> loop):\n%s", lazy_json(resp))
                         continue
                     except Exception:
                         pass
@@ -213,10 +215,7 @@ class AIService:
                         except Exception:
                             pass
                     resp = call_llm(provider, model_id, messages, None)
-                    try:
-                        logger.info("LLM response (JSON tool_calls loop):\n%s", json.dumps(resp, indent=2)[:2000])
-                    except Exception:
-                        pass
+                    logger.debug("LLM response (JSON tool_calls loop):\n%s", lazy_json(resp))
                     continue
 
             # Nothing actionable
@@ -242,7 +241,7 @@ class AIService:
                         assistant_msg = assistant_msg.rstrip() + f" App is running at {url}."
                 except Exception:
                     pass
-        return {"assistant": assistant_msg, "messages": messages}
+        return {"assistant": assistant_msg, "messages": messages, "checkpoint": checkpoint_id}
 
     @staticmethod
     def _coerce_args(fn_name: str | None, raw_args: Any) -> Dict[str, Any]:
@@ -258,8 +257,14 @@ class AIService:
     def _execute_tool(fn_name: str | None, args: Dict[str, Any]) -> Dict[str, Any]:
         tool_fn = TOOLS_REGISTRY.get(fn_name or "")
         if not tool_fn:
+            metrics.tool_calls.observe(0, tool="unknown", outcome="error")
             return {"error": f"unknown tool {fn_name}"}
+        started = time.perf_counter()
         try:
-            return tool_fn(**args)
+            with span(f"tool {fn_name}"):
+                result = tool_fn(**args)
         except Exception as exc:
-            return {"error": str(exc)}
+            result = {"error": str(exc)}
+        outcome = "error" if isinstance(result, dict) and "error" in result else "ok"
+        metrics.tool_calls.observe(time.perf_counter() - started, tool=fn_name, outcome=outcome)
+        return result
@@ -0,0 +1,427 @@
+"""Archive extraction (as a background job) and streamed folder archives.
+
+Extraction reads one member at a time into a staging directory next to the
+target and renames it into place at the end, so a failed or cancelled job
+leaves nothing behind. Member names are validated (no absolute paths, no
+`..`), links and device files are skipped, and the bytes actually written are
+counted against `ARCHIVE_MAX_BYTES`, `ARCHIVE_MAX_MEMBERS` and
+`ARCHIVE_MAX_RATIO` (written bytes per archive byte) as they stream.
+Project imports extract a tar arriving as a request body the same way, as it
+arrives, without spooling it to disk first; sync pushes write such a tar over
+an existing tree, replacing each file atomically.
+
+Folder downloads are produced by a thread writing the zip / tar.gz into a
+bounded queue that the response drains, so nothing touches disk and memory
+stays at a few chunks however large the folder is.
+"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import io
+import os
+import shutil
+import stat
+import tarfile
+import threading
+import uuid
+import zipfile
+from typing import AsyncIterator, BinaryIO, Callable, Iterator, Set, Tuple
+
+from backend.core.fileio import atomic_copy
+from backend.core.settings import settings
+from backend.jobs import Job, jobs
+from backend.sandbox_watch import watcher
+
+CHUNK = 1024 * 1024
+STREAM_CHUNK = 256 * 1024  # bytes per streamed response chunk
+STREAM_QUEUE = 8  # chunks buffered between the archive writer and the response
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+ARCHIVE_FORMATS = {"zip": ("application/zip", ".zip"), "tar.gz": ("application/gzip", ".tar.gz")}
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+def is_archive(path: str) -> bool:
+    return path.lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def _member_path(name: str) -> str:
+    """Relative, normalised member path; raises `ArchiveError` for anything escaping the target."""
+    name = name.replace("\\", "/")
+    parts = [p for p in name.split("/") if p not in ("", ".")]
+    if name.startswith("/") or (parts and len(parts[0]) == 2 and parts[0][1] == ":") or ".." in parts:
+        raise ArchiveError(f"Unsafe path in archive: {name!r}")
+    return "/".join(parts)
+
+
+# ---------- extraction ---------- #
+
+def _zip_members(archive: str) -> Iterator[Tuple[str, bool, int, int, BinaryIO | None]]:
+    with zipfile.ZipFile(archive) as zf:
+        infos = zf.infolist()
+        _check_limits(len(infos), sum(i.file_size for i in infos), os.path.getsize(archive))
+        for info in infos:
+            mode = info.external_attr >> 16
+            if info.is_dir():
+                yield info.filename, True, 0, mode, None
+            elif stat.S_ISLNK(mode):
+                yield info.filename, False, 0, mode, None  # symlinks are skipped
+            else:
+                with zf.open(info) as src:
+                    yield info.filename, False, info.file_size, mode, src
+
+
+def _tar_members(archive: str | BinaryIO) -> Iterator[Tuple[str, bool, int, int, BinaryIO | None]]:
+    source = {"name": archive} if isinstance(archive, str) else {"fileobj": archive}
+    with tarfile.open(mode="r|*", **source) as tf:  # stream mode: members are read strictly in order
+        for member in tf:
+            if member.isdir():
+                yield member.name, True, 0, member.mode, None
+            elif member.isfile():
+                yield member.name, False, member.size, member.mode, tf.extractfile(member)
+            else:
+                yield member.name, False, 0, 0, None  # links, devices, fifos are skipped
+
+
+def _check_limits(members: int, total: int, archive_size: int) -> None:
+    if settings.archive_max_members and members > settings.archive_max_members:
+        raise ArchiveError(f"Archive has more than {settings.archive_max_members} members")
+    if settings.archive_max_bytes and total > settings.archive_max_bytes:
+        raise ArchiveError(f"Archive expands to more than {settings.archive_max_bytes} bytes")
+    if settings.archive_max_ratio and total > settings.archive_max_ratio * max(archive_size, 1):
+        raise ArchiveError(f"Archive compression ratio exceeds {settings.archive_max_ratio}")
+
+
+def extract_archive(job: Job, archive: str, dest: str) -> dict:
+    """Job body: extract `archive` into the new directory `dest`; progress is in bytes written."""
+    archive_size = os.path.getsize(archive)
+    members = _zip_members(archive) if archive.lower().endswith(".zip") else _tar_members(archive)
+    return _extract(job, members, dest, lambda: archive_size)
+
+
+def _extract(job: Job, members: Iterator[Tuple[str, bool, int, int, BinaryIO | None]], dest: str,
+             archive_size: Callable[[], int], strip_top: bool = False) -> dict:
+    """Write `members` to a staging directory and rename it to `dest`.
+
+    `archive_size` returns the archive bytes consumed so far (for the ratio
+    limit). With `strip_top`, a leading directory member becomes the root:
+    `name/src/app.py` is written as `src/app.py`.
+    """
+    staging = os.path.join(os.path.dirname(dest), f".{os.path.basename(dest)}.extracting-{uuid.uuid4().hex[:8]}")
+    os.mkdir(staging)
+    count = files = skipped = written = 0
+    top = None
+    job.progress(done=0, total=0, unit="bytes")
+    with watcher.bulk(dest, staging) as report:
+        try:
+            for name, is_dir, size, mode, src in members:
+                job.check_cancelled()
+                count += 1
+                rel = _member_path(name)
+                _check_limits(count, written, archive_size())
+                if strip_top:
+                    if top is None:
+                        top = rel + "/" if is_dir and rel and "/" not in rel else ""
+                    if top and (rel + "/").startswith(top):
+                        rel = rel[len(top):]
+                if not rel:
+                    continue
+                target = os.path.join(staging, rel)
+                if is_dir:
+                    os.makedirs(target, exist_ok=True)
+                    continue
+                if src is None:
+                    skipped += 1
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                job.progress(total=job.total + size, message=rel)
+                with open(target, "wb") as f:
+                    while True:
+                        job.check_cancelled()
+                        chunk = src.read(CHUNK)
+                        if not chunk:
+                            break
+                        written += len(chunk)
+                        _check_limits(count, written, archive_size())
+                        f.write(chunk)
+                        job.progress(advance=len(chunk))
+                if mode & 0o111:
+                    st = os.stat(target).st_mode
+                    os.chmod(target, st | (st & 0o444) >> 2)  # like `chmod +x`, within the umask
+                files += 1
+                report(os.path.join(dest, rel), "created", False)
+            if os.path.lexists(dest):
+                raise ArchiveError(f"{os.path.basename(dest)} already exists")
+            os.rename(staging, dest)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        finally:
+            members.close()
+    return {"extractedTo": dest, "files": files, "bytes": written, "skipped": skipped}
+
+
+class _Cancelled(Exception):
+    pass
+
+
+class _QueueReader(io.RawIOBase):
+    """Unseekable, read-only file over the chunks put into an asyncio queue (`None` ends it).
+
+    Raises `_Cancelled` once `stop` is set while it waits for data.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue, stop: threading.Event):
+        self.loop, self.queue, self.stop = loop, queue, stop
+        self.buf = memoryview(b"")
+        self.eof = False
+        self.consumed = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self.buf and not self.eof:
+            item = self.get()
+            if item is None:
+                self.eof = True
+            else:
+                self.buf = memoryview(item)
+                self.consumed += len(item)
+        n = min(len(b), len(self.buf))
+        b[:n] = self.buf[:n]
+        self.buf = self.buf[n:]
+        return n
+
+    def get(self):
+        fut = asyncio.run_coroutine_threadsafe(self.queue.get(), self.loop)
+        while True:
+            try:
+                return fut.result(timeout=1)
+            except concurrent.futures.TimeoutError:
+                if self.stop.is_set():
+                    fut.cancel()
+                    raise _Cancelled()
+
+
+def _extract_tar_stream(job: Job, src: _QueueReader, dest: str) -> dict:
+    members = _tar_members(io.BufferedReader(src, CHUNK))
+    return _extract(job, members, dest, lambda: src.consumed, strip_top=True)
+
+
+class _CheckedReader:
+    """Member data that reports every chunk read, so limits apply to bytes actually streamed."""
+
+    def __init__(self, f: BinaryIO, on_read: Callable[[int], None]):
+        self.f = f
+        self.on_read = on_read
+
+    def read(self, n: int = -1) -> bytes:
+        chunk = self.f.read(n)
+        self.on_read(len(chunk))
+        return chunk
+
+
+def _overlay_tar_stream(job: Job, src: _QueueReader, root: str, excluded: Set[str]) -> dict:
+    """Write the files of a streamed tar over the tree at `root`, each one atomically."""
+    count = files = skipped = written = 0
+    paths = []
+    real_root = os.path.realpath(root)
+    job.progress(done=0, total=0, unit="bytes")
+    members = _tar_members(io.BufferedReader(src, CHUNK))
+
+    def streamed(n: int) -> None:
+        nonlocal written
+        job.check_cancelled()
+        written += n
+        # checked on bytes written, like _extract: a member's declared size is not a compression ratio
+        _check_limits(count, written, src.consumed)
+        job.progress(advance=n)
+
+    try:
+        for name, is_dir, size, mode, fsrc in members:
+            job.check_cancelled()
+            count += 1
+            rel = _member_path(name)
+            _check_limits(count, written, src.consumed)
+            if not rel or is_dir:
+                continue
+            if fsrc is None or not excluded.isdisjoint(rel.split("/")[:-1]):
+                skipped += 1
+                continue
+            target = os.path.join(root, rel)
+            if os.path.commonpath([os.path.realpath(os.path.dirname(target)), real_root]) != real_root:
+                raise ArchiveError(f"Unsafe path in archive: {name!r}")  # through a symlinked folder
+            job.progress(total=job.total + size, message=rel)
+            atomic_copy(_CheckedReader(fsrc, streamed), target, chunk_size=CHUNK)
+            if mode & 0o111:
+                st = os.stat(target).st_mode
+                os.chmod(target, st | (st & 0o444) >> 2)
+            files += 1
+            paths.append(rel)
+    finally:
+        members.close()
+    return {"files": files, "bytes": written, "skipped": skipped, "paths": paths}
+
+
+async def _run_stream(job: Job, body: AsyncIterator[bytes], fn, *args) -> None:
+    """Run `job` as `fn(job, src, *args)` in a thread, `src` reading `body` while it still arrives.
+
+    At most `STREAM_QUEUE` chunks are buffered, so a slow disk slows the
+    upload down. The outcome is recorded on `job`; reading stops early if it fails.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(STREAM_QUEUE)
+    stop = threading.Event()
+    src = _QueueReader(loop, queue, stop)
+    work = asyncio.ensure_future(asyncio.to_thread(jobs.run, job, fn, src, *args))
+
+    async def put(item) -> None:
+        putter = asyncio.ensure_future(queue.put(item))
+        await asyncio.wait((putter, work), return_when=asyncio.FIRST_COMPLETED)
+        putter.cancel()
+
+    try:
+        async for chunk in body:
+            if work.done():
+                break
+            if chunk:
+                await put(chunk)
+    finally:
+        try:
+            await put(None)  # also when the client went away: the extraction sees a truncated archive
+            await work
+        finally:
+            stop.set()
+
+
+async def extract_stream(job: Job, body: AsyncIterator[bytes], dest: str) -> None:
+    """Run `job`: extract the tar / tar.gz arriving as `body` into the new directory `dest`."""
+    await _run_stream(job, body, _extract_tar_stream, dest)
+
+
+async def overlay_stream(job: Job, body: AsyncIterator[bytes], root: str, excluded: Set[str]) -> None:
+    """Run `job`: write the files of the tar / tar.gz arriving as `body` over `root`.
+
+    Files below an `excluded` directory name are skipped; the result lists the paths written.
+    """
+    await _run_stream(job, body, _overlay_tar_stream, root, excluded)
+
+
+# ---------- streamed folder archives ---------- #
+
+class _QueueWriter(io.RawIOBase):
+    """Unseekable, write-only file that hands `STREAM_CHUNK` pieces to an asyncio queue.
+
+    `put` blocks while the queue is full (the client reads slower than we
+    compress) and raises `_Cancelled` once the response has gone away.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue, stop: threading.Event):
+        self.loop, self.queue, self.stop = loop, queue, stop
+        self.buf = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self.buf += b
+        if len(self.buf) >= STREAM_CHUNK:
+            self.put(bytes(self.buf))
+            self.buf.clear()
+        return len(b)
+
+    def put(self, item) -> None:
+        fut = asyncio.run_coroutine_threadsafe(self.queue.put(item), self.loop)
+        while True:
+            try:
+                fut.result(timeout=1)
+                return
+            except concurrent.futures.TimeoutError:
+                if self.stop.is_set():
+                    fut.cancel()
+                    raise _Cancelled()
+
+    def finish(self) -> None:
+        if self.buf:
+            self.put(bytes(self.buf))
+            self.buf.clear()
+
+
+def _walk(root: str, excluded: Set[str]) -> Iterator[Tuple[str, str, bool]]:
+    """(absolute path, archive name, is_dir) below `root`, sorted; excluded dir names are not entered."""
+    base = os.path.basename(root.rstrip("/")) or "archive"
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if d not in excluded)
+        rel = os.path.relpath(dirpath, root)
+        prefix = base if rel == "." else f"{base}/{rel}"
+        yield dirpath, prefix, True
+        for name in sorted(filenames):
+            yield os.path.join(dirpath, name), f"{prefix}/{name}", False
+
+
+def _write_zip(out: _QueueWriter, root: str, excluded: Set[str], stop: threading.Event) -> None:
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+        for path, arcname, is_dir in _walk(root, excluded):
+            if stop.is_set():
+                raise _Cancelled()
+            if os.path.islink(path):
+                continue
+            try:
+                info = zipfile.ZipInfo.from_file(path, arcname)
+                if is_dir:
+                    zf.writestr(info, b"")
+                    continue
+                info.compress_type = zipfile.ZIP_DEFLATED
+                with open(path, "rb") as src, zf.open(info, "w", force_zip64=True) as dst:
+                    shutil.copyfileobj(src, dst, CHUNK)
+            except (FileNotFoundError, PermissionError):
+                continue  # vanished or unreadable meanwhile
+
+
+def _write_tar(out: _QueueWriter, root: str, excluded: Set[str], stop: threading.Event) -> None:
+    with tarfile.open(fileobj=out, mode="w|gz") as tf:
+        for path, arcname, is_dir in _walk(root, excluded):
+            if stop.is_set():
+                raise _Cancelled()
+            try:
+                tf.add(path, arcname, recursive=False)
+            except (FileNotFoundError, PermissionError):
+                continue
+
+
+async def stream_archive(root: str, fmt: str, excluded: Set[str]) -> AsyncIterator[bytes]:
+    """Yield the zip / tar.gz of directory `root` while a producer thread builds it."""
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(STREAM_QUEUE)
+    stop = threading.Event()
+    out = _QueueWriter(loop, queue, stop)
+
+    def produce() -> None:
+        try:
+            (_write_zip if fmt == "zip" else _write_tar)(out, root, excluded, stop)
+            out.finish()
+            out.put(None)
+        except _Cancelled:
+            pass
+        except Exception as e:  # noqa: BLE001
+            try:
+                out.put(e)
+            except _Cancelled:
+                pass
+
+    threading.Thread(target=produce, name="archive-stream", daemon=True).start()
+    try:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item  # the client sees a truncated archive
+            yield item
+    finally:
+        stop.set()
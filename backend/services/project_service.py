@@ -1,10 +1,35 @@
 import os
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 from backend.core.settings import WORKSPACES_ROOT
+from backend.sandbox import manager as sandbox_manager
 
 
 class ProjectService:
+    def check_name(self, name: str) -> str:
+        safe_name = os.path.basename(name or "")
+        if not safe_name or safe_name.startswith(".") or safe_name != name:
+            raise ValueError(f"Invalid project name: {name!r}")
+        return safe_name
+
+    def dirs(self, name: str) -> Tuple[str, str]:
+        """The project folder and its sandbox folder (either may not exist)."""
+        return os.path.join(WORKSPACES_ROOT, name), os.path.join(sandbox_manager.workspace_root, name)
+
+    def exists(self, name: str) -> bool:
+        return any(os.path.lexists(d) for d in self.dirs(name))
+
+    def source_dir(self, name: str) -> str | None:
+        """Where the project's files are: its sandbox folder once it has one."""
+        project_dir, sandbox_dir = self.dirs(name)
+        for d in (sandbox_dir, project_dir):
+            if os.path.isdir(d):
+                return d
+        return None
+
+    def clone_pairs(self, name: str, new_name: str) -> List[Tuple[str, str]]:
+        return [(src, dest) for src, dest in zip(self.dirs(name), self.dirs(new_name)) if os.path.isdir(src)]
+
     def create(self, name: str) -> Dict[str, str]:
         safe_name = os.path.basename(name)
         project_path = os.path.join(WORKSPACES_ROOT, safe_name)
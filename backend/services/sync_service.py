@@ -0,0 +1,129 @@
+"""Manifest-based sync of a local project into the active sandbox.
+
+The client sends the path, size and SHA-256 of each of its files; `diff`
+answers which of them the sandbox lacks or holds with other content (and,
+for a complete manifest, which sandbox files the client does not have). The
+client then pushes only those files as one tar stream (see
+`archive_service.overlay_stream`) and names the paths it deleted.
+
+Sandbox-side digests are cached by (mtime_ns, size, inode), so a re-sync only
+reads files that changed since they were last hashed; a different size is
+known to be stale without reading anything.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+import stat
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from backend.core.fileio import read_cache
+
+CHUNK = 1024 * 1024
+HASH_CACHE_MAX = 100_000
+
+_hashes: "OrderedDict[str, Tuple[Tuple[int, int, int], str]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _digest(path: str, st: os.stat_result) -> str:
+    key = (st.st_mtime_ns, st.st_size, st.st_ino)
+    with _lock:
+        cached = _hashes.get(path)
+        if cached is not None and cached[0] == key:
+            _hashes.move_to_end(path)
+            return cached[1]
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK)
+            if not chunk:
+                break
+            h.update(chunk)
+    digest = h.hexdigest()
+    with _lock:
+        _hashes[path] = (key, digest)
+        _hashes.move_to_end(path)
+        while len(_hashes) > HASH_CACHE_MAX:
+            _hashes.popitem(last=False)
+    return digest
+
+
+def _rel_path(path: str) -> str:
+    """Normalised client path; raises `ValueError` for anything escaping the root."""
+    parts = [p for p in path.replace("\\", "/").split("/") if p not in ("", ".")]
+    if not parts or ".." in parts:
+        raise ValueError(f"Invalid path: {path!r}")
+    return "/".join(parts)
+
+
+def _walk(root: str, excluded: Set[str]) -> Dict[str, os.stat_result]:
+    """Regular files below `root` (relative path → stat), not entering `excluded` dir names."""
+    files: Dict[str, os.stat_result] = {}
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        try:
+            entries = list(os.scandir(os.path.join(root, rel_dir)))
+        except OSError:
+            continue
+        for entry in entries:
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in excluded:
+                        stack.append(rel)
+                elif entry.is_file(follow_symlinks=False):
+                    files[rel] = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+    return files
+
+
+def diff(root: str, manifest: List[Dict[str, Any]], excluded: Set[str], complete: bool = False) -> Dict[str, Any]:
+    """`{ need, extra }`: manifest paths to upload, and (if `complete`) sandbox files not in it."""
+    need: List[str] = []
+    known: Set[str] = set()
+    for item in manifest:
+        rel = _rel_path(str(item.get("path", "")))
+        known.add(rel)
+        if not excluded.isdisjoint(rel.split("/")[:-1]):
+            continue
+        path = os.path.join(root, rel)
+        try:
+            st = os.stat(path, follow_symlinks=False)
+            same = (stat.S_ISREG(st.st_mode)
+                    and st.st_size == item.get("size", st.st_size)
+                    and _digest(path, st) == item.get("sha256"))
+        except OSError:
+            same = False
+        if not same:
+            need.append(rel)
+    extra = sorted(set(_walk(root, excluded)) - known) if complete else []
+    return {"need": need, "extra": extra}
+
+
+def delete(root: str, paths: Iterable[str], excluded: Set[str]) -> List[str]:
+    """Remove files or folders below `root`; returns the paths that existed."""
+    real_root = os.path.realpath(root)
+    deleted = []
+    for path in paths:
+        rel = _rel_path(path)
+        if not excluded.isdisjoint(rel.split("/")):
+            continue
+        target = os.path.join(root, rel)
+        if os.path.commonpath([os.path.realpath(os.path.dirname(target)), real_root]) != real_root:
+            raise ValueError(f"Invalid path: {path!r}")
+        try:
+            if os.path.isdir(target) and not os.path.islink(target):
+                shutil.rmtree(target)
+            else:
+                os.unlink(target)
+        except FileNotFoundError:
+            continue
+        read_cache.invalidate_tree(target)
+        deleted.append(rel)
+    return deleted
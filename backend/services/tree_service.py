@@ -0,0 +1,266 @@
+"""Recursive copy, move and delete, run as background jobs (see backend.jobs).
+
+Copies are built in a staging directory next to the destination and renamed
+into place when complete, so a failed or cancelled copy leaves nothing
+behind; file data is copied in the kernel (`fileio.copy_data`). A move is a
+single `rename` on the same filesystem and copy + delete across filesystems.
+A delete first renames the tree out of sight, then removes it bottom-up; if it
+is cancelled, what is left is put back. Meanwhile the file watcher is muted
+below the paths involved and gets one summary batch at the end.
+
+A clone is a copy that shares data instead of duplicating it: files are
+reflinked (copy-on-write) where the filesystem supports it, dependency
+folders (`node_modules`, the venv's packages) are hardlinked as a fallback,
+since package managers replace their files rather than editing them.
+"""
+from __future__ import annotations
+
+import errno
+import os
+import shutil
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from backend.core import fileio
+from backend.jobs import Job, JobCancelled
+from backend.sandbox_env import VENV_DIRNAME, clone_venv, relocate_venv
+from backend.sandbox_watch import watcher
+
+CHUNK = 8 * 1024 * 1024
+
+Report = Callable[[str, str, bool], None]
+
+
+def _is_dir(path: str) -> bool:
+    return os.path.isdir(path) and not os.path.islink(path)
+
+
+def _scan(path: str) -> Tuple[int, int]:
+    """(entries, bytes) of the tree at `path`; symlinks are not followed."""
+    if not _is_dir(path):
+        return 1, os.lstat(path).st_size
+    entries, size = 1, 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        entries += len(dirnames) + len(filenames)
+        for name in filenames:
+            try:
+                size += os.lstat(os.path.join(dirpath, name)).st_size
+            except FileNotFoundError:
+                pass
+    return entries, size
+
+
+def _staging(dest: str, what: str) -> str:
+    return os.path.join(os.path.dirname(dest), f".{os.path.basename(dest)}.{what}-{uuid.uuid4().hex[:8]}")
+
+
+def _report_tree(path: str, report: Report) -> None:
+    """Report everything at `path` as created."""
+    report(path, "created", _is_dir(path))
+    if _is_dir(path):
+        for dirpath, dirnames, filenames in os.walk(path):
+            for name in dirnames:
+                report(os.path.join(dirpath, name), "created", True)
+            for name in filenames:
+                report(os.path.join(dirpath, name), "created", False)
+
+
+# ---------- copy ---------- #
+
+def _copy_file(job: Job, src: str, dst: str) -> None:
+    if os.path.islink(src):
+        os.symlink(os.readlink(src), dst)
+        return
+
+    def step(n: int) -> None:
+        job.check_cancelled()
+        job.progress(advance=n)
+
+    with open(src, "rb") as fsrc:
+        fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        try:
+            fileio.copy_data(fsrc.fileno(), fd, CHUNK, step)
+        finally:
+            os.close(fd)
+    shutil.copystat(src, dst)
+
+
+def _copy_tree(job: Job, src: str, dst: str, final: str, report: Report) -> None:
+    """Copy `src` to the new path `dst`, reporting entries as if they were at `final`."""
+    if not _is_dir(src):
+        _copy_file(job, src, dst)
+        report(final, "created", False)
+        return
+    for dirpath, dirnames, filenames in os.walk(src):
+        rel = os.path.relpath(dirpath, src)
+        target = dst if rel == "." else os.path.join(dst, rel)
+        shown = final if rel == "." else os.path.join(final, rel)
+        os.mkdir(target)
+        shutil.copymode(dirpath, target)
+        report(shown, "created", True)
+        for name in [d for d in dirnames if os.path.islink(os.path.join(dirpath, d))]:
+            dirnames.remove(name)  # a link to a directory is copied as the link
+            filenames.append(name)
+        for name in filenames:
+            job.check_cancelled()
+            job.progress(message=os.path.join(rel, name) if rel != "." else name)
+            _copy_file(job, os.path.join(dirpath, name), os.path.join(target, name))
+            report(os.path.join(shown, name), "created", False)
+
+
+def _copy_into_place(job: Job, src: str, dest: str, staging: str, report: Report) -> None:
+    try:
+        _copy_tree(job, src, staging, dest, report)
+        if os.path.lexists(dest):
+            raise FileExistsError(errno.EEXIST, f"{os.path.basename(dest)} already exists")
+        os.rename(staging, dest)
+    except BaseException:
+        _remove(staging)
+        raise
+
+
+def copy_tree(job: Job, src: str, dest: str) -> dict:
+    """Job body: copy file or directory `src` to the new path `dest`."""
+    entries, size = _scan(src)
+    job.progress(done=0, total=size, unit="bytes")
+    staging = _staging(dest, "copying")
+    with watcher.bulk(dest, staging) as report:
+        _copy_into_place(job, src, dest, staging, report)
+    return {"path": dest, "entries": entries, "bytes": size}
+
+
+# ---------- clone ---------- #
+
+SHARED_DIRS = {"node_modules"}  # hardlinked when reflinks are unavailable
+
+
+def _clone_into(job: Job, src: str, dst: str, final: str, methods: Dict[str, int]) -> None:
+    """Clone directory `src` to the new path `dst` (to be renamed to `final`); `methods` counts files per clone method."""
+    reflinks = True  # until the first file shows the filesystem cannot share extents
+    for dirpath, dirnames, filenames in os.walk(src):
+        rel = os.path.relpath(dirpath, src)
+        target = dst if rel == "." else os.path.join(dst, rel)
+        os.mkdir(target)
+        shutil.copymode(dirpath, target)
+        if rel == "." and VENV_DIRNAME in dirnames and not os.path.islink(os.path.join(dirpath, VENV_DIRNAME)):
+            dirnames.remove(VENV_DIRNAME)
+            job.progress(message=VENV_DIRNAME)
+            venv = Path(target, VENV_DIRNAME)
+            clone_venv(Path(dirpath, VENV_DIRNAME), venv)
+            relocate_venv(venv, venv, Path(final, VENV_DIRNAME))
+            methods["venv"] = 1
+        for name in [d for d in dirnames if os.path.islink(os.path.join(dirpath, d))]:
+            dirnames.remove(name)
+            filenames.append(name)
+        shared = not SHARED_DIRS.isdisjoint(rel.split(os.sep))
+        for name in filenames:
+            job.check_cancelled()
+            path = os.path.join(dirpath, name)
+            if os.path.islink(path):
+                os.symlink(os.readlink(path), os.path.join(target, name))
+                method = "symlink"
+            elif shared:
+                method = fileio.clone_file(path, os.path.join(target, name), "auto" if reflinks else "hardlink")
+            else:
+                method = fileio.clone_file(path, os.path.join(target, name), "reflink" if reflinks else "copy")
+            reflinks = reflinks and method in ("reflink", "symlink")
+            methods[method] = methods.get(method, 0) + 1
+        job.progress(advance=len(filenames) + len(dirnames), message=rel)
+
+
+def clone_tree(job: Job, pairs: List[Tuple[str, str]]) -> dict:
+    """Job body: clone each `(src, dest)` directory pair; all or nothing."""
+    entries = sum(_scan(src)[0] for src, _ in pairs)
+    job.progress(done=0, total=entries, unit="entries")
+    methods: Dict[str, int] = {}
+    placed = []
+    try:
+        for src, dest in pairs:
+            staging = _staging(dest, "cloning")
+            try:
+                _clone_into(job, src, staging, dest, methods)
+                if os.path.lexists(dest):
+                    raise FileExistsError(errno.EEXIST, f"{os.path.basename(dest)} already exists")
+                os.rename(staging, dest)
+            except BaseException:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+            placed.append(dest)
+    except BaseException:
+        for dest in placed:
+            shutil.rmtree(dest, ignore_errors=True)
+        raise
+    job.progress(done=entries)
+    return {"paths": [dest for _, dest in pairs], "entries": entries, "methods": methods}
+
+
+# ---------- move ---------- #
+
+def move_tree(job: Job, src: str, dest: str) -> dict:
+    """Job body: move `src` to the new path `dest` (rename, or copy + delete across filesystems)."""
+    is_dir = _is_dir(src)
+    staging = _staging(dest, "moving")
+    with watcher.bulk(src, dest, staging) as report:
+        if os.path.lexists(dest):
+            raise FileExistsError(errno.EEXIST, f"{os.path.basename(dest)} already exists")
+        try:
+            os.rename(src, dest)
+            fileio.read_cache.invalidate_tree(src)
+            report(src, "deleted", is_dir)
+            _report_tree(dest, report)
+            return {"path": dest, "renamed": True}
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+        entries, size = _scan(src)
+        job.progress(done=0, total=size, unit="bytes")
+        _copy_into_place(job, src, dest, staging, report)
+        job.progress(message="Removing source")
+        _remove(src)
+        fileio.read_cache.invalidate_tree(src)
+        report(src, "deleted", is_dir)
+    return {"path": dest, "renamed": False, "entries": entries, "bytes": size}
+
+
+# ---------- delete ---------- #
+
+def _remove(path: str, job: Job | None = None) -> None:
+    if not _is_dir(path):
+        if os.path.lexists(path):
+            os.unlink(path)
+        return
+    for dirpath, dirnames, filenames in os.walk(path, topdown=False):
+        for name in filenames:
+            if job is not None:
+                job.check_cancelled()
+            os.unlink(os.path.join(dirpath, name))
+        for name in dirnames:
+            child = os.path.join(dirpath, name)
+            if os.path.islink(child):
+                os.unlink(child)
+            else:
+                os.rmdir(child)
+        if job is not None:
+            job.progress(advance=len(filenames) + len(dirnames))
+    os.rmdir(path)
+
+
+def delete_tree(job: Job, path: str) -> dict:
+    """Job body: remove `path` and everything below it."""
+    entries, _ = _scan(path)
+    job.progress(done=0, total=entries, unit="entries")
+    trash = _staging(path, "deleting")
+    with watcher.bulk(path, trash) as report:
+        os.rename(path, trash)  # gone at once for everybody else
+        fileio.read_cache.invalidate_tree(path)
+        report(path, "deleted", True)
+        try:
+            _remove(trash, job)
+        except JobCancelled:
+            if not os.path.lexists(path):
+                os.rename(trash, path)
+                _report_tree(path, report)
+            raise
+        job.progress(done=entries)
+    return {"path": path, "entries": entries}
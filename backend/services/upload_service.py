@@ -0,0 +1,209 @@
+"""Resumable chunked uploads.
+
+Protocol: `create` (target directory, file name, total size) → any number of
+chunk writes at explicit offsets, each optionally verified against a SHA-256
+→ `finalize`, which moves the assembled file into place atomically. Received
+byte ranges are recorded per upload, so a client that lost its connection
+asks for the status and resends only what is missing. State lives on disk
+under `<workspace_root>/.uploads/<uploadId>/{meta.json,data}`; uploads not
+touched for `UPLOAD_EXPIRY_H` are removed.
+"""
+from __future__ import annotations
+
+import errno
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncIterator, BinaryIO, Dict, List
+
+from fastapi import HTTPException
+
+from backend.core.fileio import (
+    SizeLimitExceeded,
+    atomic_copy,
+    atomic_open,
+    atomic_write,
+    executor as io_pool,
+    path_lock,
+    read_cache,
+)
+from backend.core.settings import settings
+from backend.sandbox import SandboxManager, manager as sandbox_manager
+
+WRITE_BLOCK = 1024 * 1024  # chunk bodies are written to disk in pieces of this size
+
+
+def _merge(ranges: List[List[int]], start: int, end: int) -> List[List[int]]:
+    merged: List[List[int]] = []
+    for s, e in sorted(ranges + [[start, end]]):
+        if merged and s <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], e)
+        else:
+            merged.append([s, e])
+    return merged
+
+
+class UploadService:
+    STAGING_DIR: Path = sandbox_manager.workspace_root / SandboxManager.UPLOADS_DIRNAME
+    META = "meta.json"
+    DATA = "data"
+
+    _lock = threading.Lock()  # guards meta.json read-modify-write across requests
+
+    def _dir(self, upload_id: str) -> Path:
+        if not upload_id or "/" in upload_id or upload_id.startswith("."):
+            raise HTTPException(status_code=404, detail="Unknown upload")
+        return self.STAGING_DIR / upload_id
+
+    def _load(self, upload_id: str) -> Dict[str, Any]:
+        try:
+            return json.loads((self._dir(upload_id) / self.META).read_text())
+        except (OSError, ValueError):
+            raise HTTPException(status_code=404, detail="Unknown or expired upload")
+
+    def _save(self, meta: Dict[str, Any]) -> None:
+        meta["updatedAt"] = time.time()
+        atomic_write(self._dir(meta["uploadId"]) / self.META, json.dumps(meta))
+
+    @staticmethod
+    def _public(meta: Dict[str, Any]) -> Dict[str, Any]:
+        received = sum(e - s for s, e in meta["received"])
+        return {
+            "uploadId": meta["uploadId"],
+            "filename": meta["filename"],
+            "size": meta["size"],
+            "received": meta["received"],
+            "receivedBytes": received,
+            "complete": received == meta["size"],
+            "chunkSize": settings.upload_chunk_max_bytes,
+            "expiresAt": meta["updatedAt"] + settings.upload_expiry_h * 3600,
+        }
+
+    # ---------- protocol ---------- #
+    def create(self, dest_dir: str, filename: str, size: int, sha256: str | None = None) -> Dict[str, Any]:
+        filename = os.path.basename(filename or "")
+        if not filename:
+            raise HTTPException(status_code=400, detail="Missing file name")
+        if size < 0:
+            raise HTTPException(status_code=400, detail="Invalid size")
+        if settings.upload_max_bytes and size > settings.upload_max_bytes:
+            raise HTTPException(status_code=413, detail=f"File exceeds the {settings.upload_max_bytes} byte limit")
+        self.purge_expired()
+        upload_id = uuid.uuid4().hex
+        d = self._dir(upload_id)
+        d.mkdir(parents=True)
+        with open(d / self.DATA, "wb") as f:
+            f.truncate(size)  # sparse; chunks may arrive in any order
+        meta = {
+            "uploadId": upload_id,
+            "dest": os.path.join(dest_dir, filename),
+            "filename": filename,
+            "size": size,
+            "sha256": (sha256 or "").lower() or None,
+            "received": [],
+            "createdAt": time.time(),
+        }
+        self._save(meta)
+        return self._public(meta)
+
+    def status(self, upload_id: str) -> Dict[str, Any]:
+        return self._public(self._load(upload_id))
+
+    async def write_chunk(self, upload_id: str, offset: int, body: AsyncIterator[bytes],
+                          sha256: str | None = None) -> Dict[str, Any]:
+        """Stream `body` into the upload at `offset`; the range only counts once fully written and verified."""
+        meta = await io_pool.run("upload", self._load, upload_id)
+        if offset < 0 or offset > meta["size"]:
+            raise HTTPException(status_code=400, detail="Offset out of range")
+        limit = min(settings.upload_chunk_max_bytes or meta["size"], meta["size"] - offset)
+        digest = hashlib.sha256()
+        fd = await io_pool.run("upload", os.open, self._dir(upload_id) / self.DATA, os.O_WRONLY)
+        pos, buf = offset, bytearray()
+        try:
+            async for piece in body:
+                if pos - offset + len(buf) + len(piece) > limit:
+                    raise HTTPException(status_code=413, detail=f"Chunk larger than {limit} bytes")
+                digest.update(piece)
+                buf += piece
+                if len(buf) >= WRITE_BLOCK:
+                    await io_pool.run("upload", os.pwrite, fd, bytes(buf), pos, bulk=True)
+                    pos += len(buf)
+                    buf.clear()
+            if buf:
+                await io_pool.run("upload", os.pwrite, fd, bytes(buf), pos, bulk=True)
+                pos += len(buf)
+        finally:
+            os.close(fd)
+        if sha256 and digest.hexdigest() != sha256.lower():
+            raise HTTPException(status_code=422, detail="Chunk checksum mismatch")
+        return await io_pool.run("upload", self._record, upload_id, offset, pos)
+
+    def _record(self, upload_id: str, start: int, end: int) -> Dict[str, Any]:
+        with self._lock:
+            meta = self._load(upload_id)
+            if end > start:
+                meta["received"] = _merge(meta["received"], start, end)
+            self._save(meta)
+        return self._public(meta)
+
+    def finalize(self, upload_id: str) -> Dict[str, Any]:
+        with self._lock:
+            meta = self._load(upload_id)
+            if meta["received"] != ([[0, meta["size"]]] if meta["size"] else []):
+                raise HTTPException(status_code=409, detail="Upload incomplete")
+            data = self._dir(upload_id) / self.DATA
+            if meta["sha256"]:
+                digest = hashlib.sha256()
+                with open(data, "rb") as f:
+                    for block in iter(lambda: f.read(WRITE_BLOCK), b""):
+                        digest.update(block)
+                if digest.hexdigest() != meta["sha256"]:
+                    raise HTTPException(status_code=422, detail="File checksum mismatch")
+            dest = Path(meta["dest"])
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                with path_lock(dest):
+                    os.replace(data, dest)
+                read_cache.invalidate(dest)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                with open(data, "rb") as fsrc, atomic_open(dest) as fdst:
+                    shutil.copyfileobj(fsrc, fdst, WRITE_BLOCK)
+            shutil.rmtree(self._dir(upload_id), ignore_errors=True)
+        return {"success": True, "filename": meta["filename"], "size": meta["size"]}
+
+    def abort(self, upload_id: str) -> None:
+        d = self._dir(upload_id)
+        if not d.is_dir():
+            raise HTTPException(status_code=404, detail="Unknown upload")
+        shutil.rmtree(d, ignore_errors=True)
+
+    def purge_expired(self) -> int:
+        """Remove uploads not touched for `UPLOAD_EXPIRY_H`; returns how many."""
+        if not self.STAGING_DIR.is_dir():
+            return 0
+        cutoff = time.time() - settings.upload_expiry_h * 3600
+        removed = 0
+        for entry in os.scandir(self.STAGING_DIR):
+            try:
+                touched = os.stat(Path(entry.path) / self.META).st_mtime
+            except FileNotFoundError:
+                touched = entry.stat().st_mtime  # create() died before writing meta
+            if touched < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+        return removed
+
+
+def save_upload(fsrc: BinaryIO, dest: str) -> int:
+    """Stream a (spooled) multipart upload into `dest` atomically, enforcing `UPLOAD_MAX_BYTES`."""
+    try:
+        return atomic_copy(fsrc, dest, max_bytes=settings.upload_max_bytes)
+    except SizeLimitExceeded as e:
+        raise HTTPException(status_code=413, detail=str(e))
@@ -4,12 +4,19 @@ from pathlib import Path
 from datetime import datetime
 from typing import Dict, Any, List
 import shutil
+from contextvars import ContextVar
+from .core.fileio import atomic_write, executor as io_pool, read_cache
 from .sandbox import manager as sandbox_manager
+from .sandbox_tests import run_tests as _run_affected_tests
 
 REPO_ROOT = Path(__file__).resolve().parent.parent
 WORKSPACES_ROOT = REPO_ROOT / "workspaces"
 WORKSPACES_ROOT.mkdir(exist_ok=True)
 
+# files written/deleted/renamed by tools during the current agent turn (see begin_turn); a context
+# variable, so concurrent chat requests (each in its own threadpool context) keep separate sets
+_turn_changes: ContextVar[set[str] | None] = ContextVar("turn_changes", default=None)
+
 # ------------- helpers -------------
 
 def _workspace_path(rel: str) -> Path:
@@ -32,13 +39,23 @@ def _unwrap_markdown_fences(text: str) -> str:
         return m.group(1)
     return text
 
+def begin_turn() -> None:
+    """Start tracking the files the agent changes in a new turn."""
+    _turn_changes.set(set())
+
+
+def _touched(*paths: str) -> None:
+    changes = _turn_changes.get()
+    if changes is not None:
+        changes.update(p.lstrip("/\\") for p in paths)
+
 # ------------- tool implementations -------------
 
 def write_file(path: str, content: str) -> Dict[str, Any]:
     content = _unwrap_markdown_fences(content)
     p = _workspace_path(path)
-    p.parent.mkdir(parents=True, exist_ok=True)
-    p.write_text(content)
+    io_pool.call("write", atomic_write, p, content)
+    _touched(path)
     if sandbox_manager.meta:
         sandbox_manager.write_file_and_cache(path, content)
     return {"result": "written", "path": path}
@@ -47,25 +64,28 @@ def write_file(path: str, content: str) -> Dict[str, Any]:
 def append_file(path: str, content: str) -> Dict[str, Any]:
     content = _unwrap_markdown_fences(content)
     p = _workspace_path(path)
-    p.parent.mkdir(parents=True, exist_ok=True)
-    with p.open("a", encoding="utf-8") as f:
-        f.write(content)
-    sandbox_manager.write_file_and_cache(path, p.read_text())
+    # rewrite rather than append in place so checkpoints sharing the inode keep the old content
+    old = io_pool.call("read", read_cache.read_text, p) if io_pool.call("stat", p.exists) else ""
+    io_pool.call("write", atomic_write, p, old + content)
+    _touched(path)
+    sandbox_manager.write_file_and_cache(path, old + content)
     return {"result": "appended", "path": path}
 
 
 def read_file(path: str) -> Dict[str, Any]:
     p = _workspace_path(path)
-    if not p.exists():
+    if not io_pool.call("stat", p.exists):
         return {"error": "not found"}
-    return {"content": p.read_text(errors="ignore")}
+    return {"content": io_pool.call("read", read_cache.read_text, p, errors="ignore")}
 
 
 def delete_file(path: str) -> Dict[str, Any]:
     p = _workspace_path(path)
-    if not p.exists():
+    if not io_pool.call("stat", p.exists):
         return {"error": "not found"}
-    p.unlink()
+    io_pool.call("delete", p.unlink)
+    read_cache.invalidate(p)
+    _touched(path)
     if sandbox_manager.meta and path in sandbox_manager.cache:
         del sandbox_manager.cache[path]
     return {"result": "deleted", "path": path}
@@ -73,10 +93,12 @@ def delete_file(path: str) -> Dict[str, Any]:
 
 def rename_file(path: str, new_name: str) -> Dict[str, Any]:
     p = _workspace_path(path)
-    if not p.exists():
+    if not io_pool.call("stat", p.exists):
         return {"error": "not found"}
     new_path = p.parent / new_name
-    p.rename(new_path)
+    io_pool.call("rename", p.rename, new_path)
+    read_cache.invalidate_tree(p)
+    _touched(path, str(new_path.relative_to(_workspace_path(""))))
     if sandbox_manager.meta and path in sandbox_manager.cache:
         sandbox_manager.cache[new_name] = sandbox_manager.cache.pop(path)
     return {"result": "renamed", "old": path, "new": str(new_path)}
@@ -84,22 +106,41 @@ def rename_file(path: str, new_name: str) -> Dict[str, Any]:
 
 def list_files(dir: str = "") -> Dict[str, Any]:
     d = _workspace_path(dir)
-    if not d.is_dir():
+    if not io_pool.call("stat", d.is_dir):
         return {"error": "dir not found"}
-    return {"files": [f.name for f in d.iterdir() if f.is_file()], "dirs": [f.name for f in d.iterdir() if f.is_dir()]}
+    entries = io_pool.call("list", lambda: [(f.name, f.is_dir()) for f in os.scandir(d)])
+    return {"files": [name for name, is_dir in entries if not is_dir], "dirs": [name for name, is_dir in entries if is_dir]}
 
 
 def make_dir(path: str) -> Dict[str, Any]:
     p = _workspace_path(path)
-    p.mkdir(parents=True, exist_ok=True)
+    io_pool.call("mkdir", p.mkdir, parents=True, exist_ok=True)
     return {"result": "created", "path": path}
 
 
 def start_dev() -> Dict[str, Any]:
     sandbox_manager.start_dev()
+    # give the server a moment so build errors surface in this turn
+    if not sandbox_manager.dev.wait_ready(20):
+        return {"result": sandbox_manager.dev.state, "url": sandbox_manager.meta.get("url"), "logs": sandbox_manager.dev.tail(30)}
     return {"result": "started", "url": sandbox_manager.meta.get("url")}
 
 
+def read_dev_logs(lines: int = 50) -> Dict[str, Any]:
+    dev = sandbox_manager.dev
+    return {"state": dev.state, "exit_code": dev.exit_code, "lines": dev.tail(max(1, min(int(lines), 500)))}
+
+
+def run_tests(paths: List[str] | None = None, all: bool = False, timeout: int = 120) -> Dict[str, Any]:
+    if all:
+        changed = None
+    else:
+        changed = paths or sorted(_turn_changes.get() or ())
+        if not changed:
+            return {"result": "no files changed in this turn; pass paths or all=true"}
+    return _run_affected_tests(changed, timeout=max(1, min(int(timeout), 600)))
+
+
 def stop_dev() -> Dict[str, Any]:
     sandbox_manager.kill()
     return {"result": "stopped"}
@@ -118,6 +159,8 @@ TOOLS_REGISTRY = {
     "mkdir": make_dir,
     "start_dev": start_dev,
     "stop_dev": stop_dev,
+    "read_dev_logs": read_dev_logs,
+    "run_tests": run_tests,
 }
 
 _TOOL_DESCRIPTIONS = {
@@ -132,6 +175,8 @@ _TOOL_DESCRIPTIONS = {
     "mkdir": "Create a directory (and parents) at path.",
     "start_dev": "Start the dev server for current project.",
     "stop_dev": "Stop the dev server.",
+    "read_dev_logs": "Return the dev server state and its most recent output lines (compile errors etc.).",
+    "run_tests": "Run only the tests affected by the files changed in this turn (or by `paths`; `all` runs every test) and return failures.",
 }
 
 
@@ -155,6 +200,18 @@ def build_function_schemas() -> List[Dict[str, Any]]:
                 params = {"type": "object", "properties": {"path": {"type": "string"}}, "required": ["path"]}
             else:
                 params = {"type": "object", "properties": {"path": {"type": "string"}}, "required": []}
+        elif name == "read_dev_logs":
+            params = {"type": "object", "properties": {"lines": {"type": "integer"}}, "required": []}
+        elif name == "run_tests":
+            params = {
+                "type": "object",
+                "properties": {
+                    "paths": {"type": "array", "items": {"type": "string"}},
+                    "all": {"type": "boolean"},
+                    "timeout": {"type": "integer"},
+                },
+                "required": [],
+            }
         elif name == "rename_file":
             params = {
                 "type": "object",
@@ -38,6 +38,12 @@ class FileManager {
         this.elements.terminalSend = document.getElementById('terminal-send');
         this.chatHistory = [];
         this.venvName = 'venv';
+        this.activeCommand = null;
+        this.ptySocket = null;
+        this.ptyReady = false;
+        this.watchSource = null;
+        this.watchRefreshTimer = null;
+        this.fileVersions = {};  // path -> { version, content } as last read from / saved to the server
 
         // Bind events (needs elements ready)
         this.bindEvents();
@@ -539,19 +545,35 @@ class FileManager {
                 }, 2000);
             }
 
-            const response = await fetch(`${this.apiBase}/save`, {
+            const base = this.fileVersions[filePath];
+            const body = base
+                ? { path: filePath, baseVersion: base.version, edits: this.diffEdits(base.content, content) }
+                : { path: filePath, content: content };
+            let response = await fetch(`${this.apiBase}/save`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 credentials: 'include',
-                body: JSON.stringify({ 
-                    path: filePath, 
-                    content: content,
-                    timestamp: new Date().toISOString()
-                })
+                body: JSON.stringify(body)
             });
 
+            if (response.status === 409) {
+                // changed on disk (e.g. by the agent) since it was opened
+                const conflict = await response.json();
+                if (!confirm(`${filePath} was changed on disk since you opened it. Overwrite it with your version?`)) {
+                    this.showError('Save cancelled: file changed on disk');
+                    return false;
+                }
+                response = await fetch(`${this.apiBase}/save`, {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    credentials: 'include',
+                    body: JSON.stringify({ path: filePath, baseVersion: conflict.version, content: content })
+                });
+            }
+
             if (response.ok) {
                 const result = await response.json();
+                if (result.version) this.fileVersions[filePath] = { version: result.version, content };
                 this.showSuccess(`File saved successfully! ${result.message || ''}`);
                 
                 // Update the file in the current list if it exists
@@ -577,6 +599,29 @@ class FileManager {
         }
     }
 
+    // Single replacement covering everything between the common prefix and suffix.
+    // Offsets are JS string indices (UTF-16 code units), which is what the server expects.
+    diffEdits(oldText, newText) {
+        if (oldText === newText) return [];
+        let start = 0;
+        const maxStart = Math.min(oldText.length, newText.length);
+        while (start < maxStart && oldText.charCodeAt(start) === newText.charCodeAt(start)) start++;
+        let oldEnd = oldText.length;
+        let newEnd = newText.length;
+        while (oldEnd > start && newEnd > start && oldText.charCodeAt(oldEnd - 1) === newText.charCodeAt(newEnd - 1)) {
+            oldEnd--;
+            newEnd--;
+        }
+        // do not cut a surrogate pair in half
+        const isLow = code => code >= 0xDC00 && code <= 0xDFFF;
+        if (start > 0 && isLow(oldText.charCodeAt(start))) start--;
+        if (oldEnd < oldText.length && isLow(oldText.charCodeAt(oldEnd))) {
+            oldEnd++;
+            newEnd++;
+        }
+        return [{ start, end: oldEnd, text: newText.slice(start, newEnd) }];
+    }
+
     updateFileInList(filePath, content) {
         // Find the file in the current files list and update its size
         const fileName = filePath.split('/').pop();
@@ -824,6 +869,7 @@ class FileManager {
         if (this.elements.terminalToggle) {
             this.elements.terminalToggle.addEventListener('click', () => {
                 this.elements.terminalPane.style.display = 'block';
+                this.connectPty();
                 this.elements.terminalCmd.focus();
             });
         }
@@ -840,6 +886,15 @@ class FileManager {
                     this.sendTerminalCmd();
                 }
             });
+            this.elements.terminalCmd.addEventListener('keydown', (e) => {
+                if (e.ctrlKey && e.key === 'c' && this.ptyReady) {
+                    e.preventDefault();
+                    this.ptySocket.send(JSON.stringify({ type: 'input', session: 'main', data: '\x03' }));
+                } else if (e.ctrlKey && e.key === 'c' && this.activeCommand) {
+                    e.preventDefault();
+                    this.cancelTerminalCmd();
+                }
+            });
         }
     }
 
@@ -933,7 +988,8 @@ class FileManager {
         
         this.showLoading();
         try {
-            const response = await fetch(`${this.apiBase}/list?path=${encodeURIComponent(this.currentPath)}`, {
+            // depth=2: the sidebar tree gets the subfolders of every folder in the same response
+            const response = await fetch(`${this.apiBase}/list?path=${encodeURIComponent(this.currentPath)}&depth=2`, {
                 credentials: 'include'
             });
             if (!response.ok) throw new Error('Failed to load directory');
@@ -978,6 +1034,14 @@ class FileManager {
                 <i class="fas fa-folder"></i>
                 <span>${folder.name}</span>
             </div>`;
+            ((folder.children && folder.children.folders) || [])
+                .filter(child => !child.name.startsWith('.'))
+                .forEach(child => {
+                    treeHtml += `<div class="folder-item nested" data-path="${child.path}">
+                        <i class="fas fa-folder"></i>
+                        <span>${child.name}</span>
+                    </div>`;
+                });
         });
         this.elements.folderTree.innerHTML = treeHtml;
         this.elements.folderTree.querySelectorAll('.folder-item').forEach(item => {
@@ -1160,6 +1224,7 @@ class FileManager {
     }
 
     async uploadFile(file) {
+        if (file.size > 8 * 1024 * 1024) return this.uploadFileChunked(file);
         const formData = new FormData();
         formData.append('file', file);
         formData.append('path', this.currentPath);
@@ -1171,6 +1236,65 @@ class FileManager {
         if (!response.ok) throw new Error('Upload failed');
     }
 
+    // Resumable upload: chunks are sent at explicit offsets; after a failure the
+    // server's list of received ranges tells us what is still missing.
+    async uploadFileChunked(file) {
+        const init = await fetch(`${this.apiBase}/uploads`, {
+            method: 'POST',
+            credentials: 'include',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ path: this.currentPath, filename: file.name, size: file.size })
+        });
+        if (!init.ok) throw new Error('Upload failed');
+        let status = await init.json();
+        const chunkSize = Math.min(status.chunkSize, 8 * 1024 * 1024);
+        for (let attempt = 0; !status.complete; attempt++) {
+            try {
+                for (const [start, end] of this.missingRanges(status.received, file.size)) {
+                    for (let offset = start; offset < end; offset += chunkSize) {
+                        const blob = file.slice(offset, Math.min(offset + chunkSize, end));
+                        const headers = {};
+                        if (window.crypto && crypto.subtle) {
+                            const digest = await crypto.subtle.digest('SHA-256', await blob.arrayBuffer());
+                            headers['X-Chunk-Sha256'] = Array.from(new Uint8Array(digest))
+                                .map(b => b.toString(16).padStart(2, '0')).join('');
+                        }
+                        const resp = await fetch(`${this.apiBase}/uploads/${status.uploadId}?offset=${offset}`, {
+                            method: 'PUT',
+                            credentials: 'include',
+                            headers,
+                            body: blob
+                        });
+                        if (!resp.ok) throw new Error(`Chunk at ${offset} failed`);
+                        status = await resp.json();
+                    }
+                }
+            } catch (error) {
+                if (attempt >= 4) throw error;
+                console.warn('Upload interrupted, resuming:', error);
+                await new Promise(resolve => setTimeout(resolve, 1000 * (attempt + 1)));
+                const resp = await fetch(`${this.apiBase}/uploads/${status.uploadId}`, { credentials: 'include' });
+                if (resp.ok) status = await resp.json();
+            }
+        }
+        const done = await fetch(`${this.apiBase}/uploads/${status.uploadId}/finalize`, {
+            method: 'POST',
+            credentials: 'include'
+        });
+        if (!done.ok) throw new Error('Upload failed');
+    }
+
+    missingRanges(received, size) {
+        const missing = [];
+        let pos = 0;
+        for (const [start, end] of received) {
+            if (start > pos) missing.push([pos, start]);
+            pos = Math.max(pos, end);
+        }
+        if (pos < size) missing.push([pos, size]);
+        return missing;
+    }
+
     downloadFile(filePath) {
         // Use backend download endpoint
         const url = `${this.apiBase}/download?path=${encodeURIComponent(filePath)}`;
@@ -1182,6 +1306,65 @@ class FileManager {
         document.body.removeChild(link);
     }
 
+    downloadFolder(folderPath) {
+        // Streamed as it is zipped; node_modules, venv etc. are left out
+        const link = document.createElement('a');
+        link.href = `${this.apiBase}/download-archive?path=${encodeURIComponent(folderPath)}&exclude=true`;
+        link.download = (folderPath.split('/').pop() || 'workspace') + '.zip';
+        document.body.appendChild(link);
+        link.click();
+        document.body.removeChild(link);
+    }
+
+    isArchive(name) {
+        return /\.(zip|tar|tar\.gz|tgz|tar\.bz2|tbz2|tar\.xz|txz)$/i.test(name);
+    }
+
+    followJob(jobId) {
+        // Background jobs (extract, copy, move, recursive delete): show progress until they end
+        return new Promise((resolve) => {
+            this.showUploadProgress();
+            const events = new EventSource(`${this.apiBase}/jobs/${jobId}/events`, { withCredentials: true });
+            const onUpdate = (e) => {
+                const job = JSON.parse(e.data);
+                if (job.total) this.updateProgress(100 * job.done / job.total);
+                if (e.type !== 'end') return;
+                events.close();
+                this.hideUploadProgress();
+                resolve(job);
+            };
+            events.addEventListener('progress', onUpdate);
+            events.addEventListener('end', onUpdate);
+            events.onerror = () => {
+                events.close();
+                this.hideUploadProgress();
+                resolve({ state: 'failed', error: 'Lost connection to the job' });
+            };
+        });
+    }
+
+    async extractArchive(filePath) {
+        try {
+            const resp = await fetch(`${this.apiBase}/unzip`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                credentials: 'include',
+                body: JSON.stringify({ path: filePath })
+            });
+            const data = await resp.json().catch(() => ({}));
+            if (!resp.ok) {
+                this.showError(data.detail || 'Failed to extract archive');
+                return;
+            }
+            const job = await this.followJob(data.jobId);
+            if (job.state === 'failed') this.showError(job.error || 'Failed to extract archive');
+            this.loadCurrentDirectory();
+        } catch (error) {
+            console.error('Extract failed:', error);
+            this.showError('Failed to extract archive');
+        }
+    }
+
     handleSearch(query) {
         const items = this.elements.filesContainer.querySelectorAll('.file-item');
         items.forEach(item => {
@@ -1210,6 +1393,8 @@ class FileManager {
     showContextMenu(event, fileItem) {
         this.selectedFile = fileItem;
         const menu = this.elements.contextMenu;
+        const extractItem = menu.querySelector('[data-action="extract"]');
+        extractItem.style.display = !fileItem.classList.contains('folder') && this.isArchive(fileItem.dataset.name) ? '' : 'none';
         menu.style.display = 'block';
         menu.style.left = event.pageX + 'px';
         menu.style.top = event.pageY + 'px';
@@ -1232,10 +1417,16 @@ class FileManager {
         this.hideContextMenu();
         switch (action) {
             case 'download':
-                if (this.selectedFile && !this.selectedFile.classList.contains('folder')) {
+                if (!this.selectedFile) break;
+                if (this.selectedFile.classList.contains('folder')) {
+                    this.downloadFolder(this.selectedFile.dataset.path);
+                } else {
                     this.downloadFile(this.selectedFile.dataset.path);
                 }
                 break;
+            case 'extract':
+                if (this.selectedFile) this.extractArchive(this.selectedFile.dataset.path);
+                break;
             case 'rename':
                 this.showRenameModal();
                 break;
@@ -1313,16 +1504,25 @@ class FileManager {
 
     async deleteFile() {
         if (!this.selectedFile) return;
-        if (!confirm(`Are you sure you want to delete "${this.selectedFile.dataset.name}"?`)) {
+        const isFolder = this.selectedFile.classList.contains('folder');
+        const question = isFolder
+            ? `Delete the folder "${this.selectedFile.dataset.name}" and everything in it?`
+            : `Are you sure you want to delete "${this.selectedFile.dataset.name}"?`;
+        if (!confirm(question)) {
             return;
         }
         try {
-            await fetch(`${this.apiBase}/delete`, {
+            const resp = await fetch(`${this.apiBase}/delete`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 credentials: 'include',
-                body: JSON.stringify({ path: this.selectedFile.dataset.path })
+                body: JSON.stringify({ path: this.selectedFile.dataset.path, recursive: isFolder })
             });
+            const data = await resp.json().catch(() => ({}));
+            if (data.jobId) {
+                const job = await this.followJob(data.jobId);
+                if (job.state === 'failed') this.showError(job.error || 'Failed to delete folder');
+            }
             this.loadCurrentDirectory();
         } catch (error) {
             console.error('Delete failed:', error);
@@ -1493,6 +1693,10 @@ class FileManager {
 
         const tab = this.openTabs.find(t => t.path === this.activeTab);
         if (!tab) return;
+        if (this.logFollow) {
+            this.logFollow.close();
+            this.logFollow = null;
+        }
 
         const fileType = tab.type;
         const filePath = tab.path;
@@ -1514,6 +1718,12 @@ class FileManager {
                 return;
             }
             
+            if (fileName.endsWith('.log') && fileSize > MAX_PREVIEW_SIZE) {
+                // large logs: show the tail and follow appends instead of loading the whole file
+                this.renderLogTail(filePath);
+                return;
+            }
+
             if (fileType !== 'video' && fileType !== 'image' && fileSize > MAX_PREVIEW_SIZE) {
                 this.elements.ideContent.innerHTML = `
                     <div style="padding: 20px; color: #dc3545;">
@@ -1550,6 +1760,7 @@ class FileManager {
                 if (!resp.ok) throw new Error('Failed to load file content');
                 const data = await resp.json();
                 const content = data.content ?? '';
+                if (data.version) this.fileVersions[filePath] = { version: data.version, content };
 
                 // Insert a container for Monaco Editor
                 this.elements.ideContent.innerHTML = '<div id="monaco-container" style="width:100%;height:100%;"></div>';
@@ -1561,6 +1772,36 @@ class FileManager {
         }
     }
 
+    async renderLogTail(filePath) {
+        const MAX_LOG_CHARS = 2 * 1024 * 1024;
+        try {
+            const resp = await fetch(`${this.apiBase}/read?path=${encodeURIComponent(filePath)}&tail=2000`, {
+                credentials: 'include'
+            });
+            if (!resp.ok) throw new Error('Failed to load file content');
+            const data = await resp.json();
+            this.elements.ideContent.innerHTML = '<pre class="log-tail" style="margin:0;padding:10px;height:100%;overflow:auto;font-size:12px;"></pre>';
+            const pre = this.elements.ideContent.querySelector('.log-tail');
+            pre.textContent = data.content;
+            pre.scrollTop = pre.scrollHeight;
+            const source = new EventSource(
+                `${this.apiBase}/read?path=${encodeURIComponent(filePath)}&follow=true&position=${data.position}`,
+                { withCredentials: true }
+            );
+            source.addEventListener('append', e => {
+                const atBottom = pre.scrollTop + pre.clientHeight >= pre.scrollHeight - 20;
+                pre.textContent = (pre.textContent + JSON.parse(e.data).text).slice(-MAX_LOG_CHARS);
+                if (atBottom) pre.scrollTop = pre.scrollHeight;
+            });
+            source.addEventListener('truncate', () => { pre.textContent = ''; });
+            source.addEventListener('deleted', () => source.close());
+            this.logFollow = source;
+        } catch (error) {
+            console.error('Failed to load file:', error);
+            this.elements.ideContent.innerHTML = '<div style="padding:20px;color:#dc3545;">Failed to load file.</div>';
+        }
+    }
+
     // ---------- IDE Pane Utilities ---------- //
     startResizing(e) {
         this.isResizing = true;
@@ -1608,10 +1849,10 @@ class FileManager {
     // ---------- Dashboard stub ---------- //
     async loadProjects() {
         try {
-            const resp = await fetch(`${this.apiBase}/projects`, { credentials: 'include' });
+            const resp = await fetch(`${this.apiBase}/projects?sort=opened&order=desc`, { credentials: 'include' });
             if (!resp.ok) throw new Error('Failed to fetch projects');
             const data = await resp.json();
-            this.renderProjects(data.projects || []);
+            this.renderProjects(data.items || []);
         } catch (err) {
             console.error('Error loading projects:', err);
             this.renderProjects([]);
@@ -1624,12 +1865,17 @@ class FileManager {
             this.elements.projectsContainer.innerHTML = '<p style="padding:10px;color:#999;">No projects yet.</p>';
             return;
         }
-        this.elements.projectsContainer.innerHTML = projects.map(name => `
-            <div class="project-card" data-name="${name}">
+        this.elements.projectsContainer.innerHTML = projects.map(project => {
+            const modified = project.modified ? new Date(project.modified * 1000).toLocaleString() : '';
+            const details = `${this.formatFileSize(project.bytes)} · ${project.files} files${modified ? ' · ' + modified : ''}`;
+            return `
+            <div class="project-card" data-name="${project.name}" title="${details}">
                 <i class="fas fa-folder-open"></i>
-                <span>${name}</span>
+                <span>${project.name}</span>
+                <small class="project-meta">${details}</small>
             </div>
-        `).join('');
+        `;
+        }).join('');
     }
 
     async createProject() {
@@ -1672,11 +1918,35 @@ class FileManager {
                 credentials: 'include',
                 body: JSON.stringify({ project: projectName })
             });
+            // shells belong to the previous sandbox; reattach on next open
+            this.disconnectPty();
+            this.watchSandbox();
         } catch (err) {
             console.error('Sandbox init error', err);
         }
     }
 
+    watchSandbox() {
+        // file changes made by the terminal, npm or the agent are pushed; refresh only what is on screen
+        if (this.watchSource) this.watchSource.close();
+        const source = new EventSource(`${this.apiBase}/sandbox/watch`, { withCredentials: true });
+        const refresh = () => {
+            clearTimeout(this.watchRefreshTimer);
+            this.watchRefreshTimer = setTimeout(() => this.loadCurrentDirectory(), 150);
+        };
+        source.addEventListener('changes', e => {
+            const batch = JSON.parse(e.data);
+            const current = this.currentPath.replace(/^\/+|\/+$/g, '');
+            const affected = (batch.changes || []).some(change => {
+                const parent = change.path.split('/').slice(0, -1).join('/');
+                return parent === current;
+            });
+            if (affected) refresh();
+        });
+        source.addEventListener('rescan', refresh);
+        this.watchSource = source;
+    }
+
     async runSandbox() {
         const projectName = (this.currentPath.split('/').filter(Boolean)[0]) || '';
         if (!projectName) {
@@ -1688,10 +1958,16 @@ class FileManager {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 credentials: 'include',
-                body: JSON.stringify({ project: projectName })
+                body: JSON.stringify({ project: projectName, wait: true, timeout: 120 })
             });
             if (!resp.ok) throw new Error(await resp.text());
-            window.open('http://localhost:5173', '_blank');
+            const data = await resp.json();
+            if (!data.ready) {
+                console.error('Dev server not ready:', (data.logs || []).join('\n'));
+                this.showError(`Dev server ${data.status ? data.status.state : 'not ready'} – see /api/sandbox/logs`);
+                return;
+            }
+            window.open(data.url || 'http://localhost:5173', '_blank');
         } catch (err) {
             console.error('Sandbox start failed:', err);
             this.showError('Failed to start sandbox');
@@ -1757,15 +2033,83 @@ class FileManager {
     }
 
     appendTerminal(text, cls = '') {
+        this.appendTerminalRaw(text + '\n', cls);
+    }
+
+    appendTerminalRaw(text, cls = '') {
         const span = document.createElement('span');
-        span.textContent = text + '\n';
+        span.textContent = text;
         if (cls) span.className = cls;
         this.elements.terminalOutput.appendChild(span);
         this.elements.terminalOutput.scrollTop = this.elements.terminalOutput.scrollHeight;
     }
 
+    connectPty() {
+        if (this.ptySocket) return;
+        const ws = new WebSocket(`${this.apiBase.replace(/^http/, 'ws')}/sandbox/pty`);
+        this.ptySocket = ws;
+        ws.onopen = () => ws.send(JSON.stringify({ type: 'open', session: 'main', cols: 120, rows: 30 }));
+        ws.onmessage = (e) => {
+            const msg = JSON.parse(e.data);
+            if (msg.type === 'opened') {
+                this.ptyReady = true;
+                this.elements.terminalOutput.innerHTML = '';
+                this.appendTerminalRaw(this.cleanPtyOutput(msg.scrollback || ''));
+            } else if (msg.type === 'output') {
+                this.appendTerminalRaw(this.cleanPtyOutput(msg.data), 'stdout');
+            } else if (msg.type === 'exit') {
+                this.appendTerminal(`[shell exited with code ${msg.code}]`, 'stderr');
+                // a fresh shell is started on demand
+                ws.send(JSON.stringify({ type: 'open', session: 'main' }));
+            } else if (msg.type === 'error') {
+                this.appendTerminal(msg.detail, 'stderr');
+            }
+        };
+        ws.onclose = () => {
+            // fall back to one-shot exec until the pane is reopened
+            if (this.ptySocket === ws) {
+                this.ptySocket = null;
+                this.ptyReady = false;
+            }
+        };
+    }
+
+    disconnectPty() {
+        if (this.ptySocket) this.ptySocket.close();
+        this.ptySocket = null;
+        this.ptyReady = false;
+        this.watchSource = null;
+        this.watchRefreshTimer = null;
+    }
+
+    cleanPtyOutput(text) {
+        // strip escape sequences and carriage returns; the pane is a plain <pre>
+        return text
+            .replace(/\x1b\[[0-9;?]*[ -\/]*[@-~]|\x1b\][^\x07]*(\x07|\x1b\\)/g, '')
+            .replace(/\r+\n/g, '\n')
+            .replace(/\r/g, '');
+    }
+
     async sendTerminalCmd() {
-        const cmd = (this.elements.terminalCmd.value || '').trim();
+        const raw = this.elements.terminalCmd.value || '';
+        if (this.ptyReady) {
+            this.elements.terminalCmd.value = '';
+            this.ptySocket.send(JSON.stringify({ type: 'input', session: 'main', data: raw + '\n' }));
+            return;
+        }
+        // While a command is running, input lines go to its stdin
+        if (this.activeCommand) {
+            this.elements.terminalCmd.value = '';
+            this.appendTerminal(raw, 'user-cmd');
+            await fetch(`${this.apiBase}/sandbox/exec/${this.activeCommand}/stdin`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                credentials: 'include',
+                body: JSON.stringify({ data: raw + '\n' })
+            }).catch(err => this.appendTerminal('Error: ' + err.message, 'stderr'));
+            return;
+        }
+        const cmd = raw.trim();
         if (!cmd) return;
         this.elements.terminalCmd.value = '';
         const prompt = `(${this.venvName})user@${this.currentProject || 'sandbox'}$`;
@@ -1775,20 +2119,49 @@ class FileManager {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 credentials: 'include',
-                body: JSON.stringify({ cmd })
+                body: JSON.stringify({ cmd, stream: true })
             });
             const data = await resp.json();
-            if (data.stdout) this.appendTerminal(data.stdout, 'stdout');
-            if (data.stderr) this.appendTerminal(data.stderr, 'stderr');
-            if (data.error) this.appendTerminal(data.error, 'stderr');
-            // refocus
-            this.elements.terminalCmd.focus();
+            if (!resp.ok) throw new Error(data.detail || resp.statusText);
+            this.followTerminalCmd(data.id);
         } catch (err) {
             this.appendTerminal('Error: ' + err.message, 'stderr');
             this.elements.terminalCmd.focus();
         }
     }
 
+    followTerminalCmd(id) {
+        this.activeCommand = id;
+        const source = new EventSource(`${this.apiBase}/sandbox/exec/${id}/events`, { withCredentials: true });
+        const done = () => {
+            source.close();
+            this.activeCommand = null;
+            this.elements.terminalCmd.focus();
+        };
+        source.addEventListener('stdout', e => this.appendTerminalRaw(JSON.parse(e.data), 'stdout'));
+        source.addEventListener('stderr', e => this.appendTerminalRaw(JSON.parse(e.data), 'stderr'));
+        source.addEventListener('truncated', () => this.appendTerminal('[earlier output truncated]', 'stderr'));
+        source.addEventListener('exit', e => {
+            const info = JSON.parse(e.data);
+            if (info.error) this.appendTerminal(info.error, 'stderr');
+            done();
+        });
+        source.onerror = () => {
+            // EventSource reconnects on its own (resuming via Last-Event-ID) unless closed
+            if (source.readyState === EventSource.CLOSED) done();
+        };
+        this.elements.terminalCmd.focus();
+    }
+
+    async cancelTerminalCmd() {
+        if (!this.activeCommand) return;
+        this.appendTerminal('^C', 'user-cmd');
+        await fetch(`${this.apiBase}/sandbox/exec/${this.activeCommand}/cancel`, {
+            method: 'POST',
+            credentials: 'include'
+        }).catch(() => {});
+    }
+
     ensureChatSessionUI() {
         // Insert after model-select
         const header = document.querySelector('#chat-pane .chat-header');
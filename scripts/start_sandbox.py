@@ -1,7 +1,12 @@
 import argparse
+import hashlib
 import os
 import pathlib
 import json
+import queue
+import tarfile
+import threading
+import time
 import requests
 from dotenv import load_dotenv
 
@@ -11,31 +16,172 @@ EXCLUDED_PATTERNS = [
     "dist",
     "build",
     "__pycache__",
+    "venv",
 ]
 
+CHUNK = 256 * 1024  # bytes per chunk of the pushed tar stream
 
-def should_exclude(path: pathlib.Path):
-    parts = path.parts
-    for p in parts:
-        if p in EXCLUDED_PATTERNS:
-            return True
-    return False
 
+def scan(root: pathlib.Path):
+    """Return ({relative file path: (mtime_ns, size)}, {relative dir path}) for the local project."""
+    files, dirs = {}, set()
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in EXCLUDED_PATTERNS]
+        rel_dir = os.path.relpath(dirpath, root).replace("\\", "/")
+        prefix = "" if rel_dir == "." else rel_dir + "/"
+        for d in dirnames:
+            dirs.add(prefix + d)
+        for name in filenames:
+            try:
+                st = os.stat(os.path.join(dirpath, name))
+            except OSError:
+                continue
+            files[prefix + name] = (st.st_mtime_ns, st.st_size)
+    return files, dirs
 
-def gather_files(root: pathlib.Path):
-    files = []
-    for file in root.rglob("*"):
-        if file.is_file() and not should_exclude(file) and file.stat().st_size < 100 * 1024:
-            rel = str(file.relative_to(root)).replace("\\", "/")
-            files.append({"path": rel, "content": file.read_text(errors="ignore")})
-    return files
+
+def file_digest(root: pathlib.Path, rel: str, key, hashes: dict):
+    """SHA-256 of a local file, cached while its (mtime_ns, size) stays the same."""
+    cached = hashes.get(rel)
+    if cached and cached[0] == key:
+        return cached[1]
+    h = hashlib.sha256()
+    with open(root / rel, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    hashes[rel] = (key, h.hexdigest())
+    return hashes[rel][1]
+
+
+def build_manifest(root: pathlib.Path, files: dict, paths, hashes: dict):
+    manifest = []
+    for rel in paths:
+        try:
+            manifest.append({"path": rel, "size": files[rel][1], "sha256": file_digest(root, rel, files[rel], hashes)})
+        except OSError:
+            continue  # vanished meanwhile; the next scan reports it as deleted
+    return manifest
+
+
+class _QueueWriter:
+    """File-like object handing CHUNK sized pieces of what tarfile writes to a queue."""
+
+    def __init__(self, q: queue.Queue):
+        self.q = q
+        self.buf = bytearray()
+
+    def write(self, b):
+        self.buf += b
+        if len(self.buf) >= CHUNK:
+            self.q.put(bytes(self.buf))
+            self.buf.clear()
+        return len(b)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.buf:
+            self.q.put(bytes(self.buf))
+            self.buf.clear()
+
+
+def tar_stream(root: pathlib.Path, paths):
+    """Yield a tar.gz of `paths` while a thread builds it (memory stays at a few chunks)."""
+    q = queue.Queue(8)
+
+    def produce():
+        out = _QueueWriter(q)
+        try:
+            with tarfile.open(fileobj=out, mode="w|gz") as tf:
+                for rel in paths:
+                    try:
+                        tf.add(root / rel, rel, recursive=False)
+                    except FileNotFoundError:
+                        continue
+            out.close()
+            q.put(None)
+        except Exception as e:  # noqa: BLE001
+            q.put(e)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        item = q.get()
+        if item is None:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+def check(resp, what):
+    if resp.status_code != 200:
+        raise SystemExit(f"Failed to {what}: {resp.text}")
+    return resp.json()
+
+
+def sync(session, api, root, files, hashes, paths=None, deleted=(), complete=False, prune=False):
+    """Send a manifest of `paths` (default: all files), push what the sandbox is missing."""
+    manifest = build_manifest(root, files, sorted(files) if paths is None else sorted(paths), hashes)
+    result = check(session.post(f"{api}/api/sandbox/sync", json={
+        "files": manifest, "complete": complete, "delete": sorted(deleted),
+    }), "compare files")
+    need = result["need"]
+    pushed = {"files": 0, "bytes": 0}
+    if need:
+        size = sum(files[rel][1] for rel in need if rel in files)
+        print(f"Uploading {len(need)} of {len(manifest)} files ({size} bytes) ...")
+        pushed = check(session.post(
+            f"{api}/api/sandbox/sync/push",
+            data=tar_stream(root, need),
+            headers={"Content-Type": "application/gzip"},
+        ), "upload files")
+    removed = list(result.get("deleted", []))
+    if prune and result.get("extra"):
+        removed += check(session.post(f"{api}/api/sandbox/sync", json={"files": [], "delete": result["extra"]}),
+                         "delete files")["deleted"]
+    return {"checked": len(manifest), "uploaded": pushed["files"], "bytes": pushed["bytes"],
+            "deleted": len(removed), "extra": 0 if prune else len(result.get("extra", []))}
+
+
+def watch(session, api, root, files, dirs, hashes, interval, debounce):
+    """Poll the project and push changes once they have settled for `debounce` seconds."""
+    changed, deleted = set(), set()
+    last_change = 0.0
+    print("Watching for changes (Ctrl+C to stop) ...")
+    while True:
+        time.sleep(interval)
+        new_files, new_dirs = scan(root)
+        modified = {rel for rel, key in new_files.items() if files.get(rel) != key}
+        gone_dirs = dirs - new_dirs
+        gone_dirs = {d for d in gone_dirs if not any(d.startswith(g + "/") for g in gone_dirs)}
+        gone = {rel for rel in files if rel not in new_files and not any(rel.startswith(g + "/") for g in gone_dirs)}
+        gone |= gone_dirs
+        if modified or gone:
+            changed = (changed | modified) - gone
+            deleted = (deleted | gone) - modified
+            last_change = time.monotonic()
+        files, dirs = new_files, new_dirs
+        if (changed or deleted) and time.monotonic() - last_change >= debounce:
+            try:
+                result = sync(session, api, root, files, hashes, paths=changed & set(files), deleted=deleted)
+            except requests.RequestException as e:
+                print("Sync failed, retrying:", e)
+                continue
+            print(f"Synced {result['uploaded']} changed, {result['deleted']} deleted")
+            changed, deleted = set(), set()
 
 
 def main():
     load_dotenv()
-    parser = argparse.ArgumentParser(description="Start sandbox and upload project files")
+    parser = argparse.ArgumentParser(description="Start sandbox and sync project files into it")
     parser.add_argument("project", help="Path to project directory")
+    parser.add_argument("--name", help="Sandbox project name (default: the directory name)")
     parser.add_argument("--api", default="http://localhost:8000", help="Backend API base URL")
+    parser.add_argument("--prune", action="store_true", help="Delete sandbox files that do not exist locally")
+    parser.add_argument("--watch", action="store_true", help="Keep running and push changes as they happen")
+    parser.add_argument("--interval", type=float, default=0.5, help="Seconds between scans in --watch mode")
+    parser.add_argument("--debounce", type=float, default=0.5, help="Quiet seconds before pushing changes")
     args = parser.parse_args()
 
     project_dir = pathlib.Path(args.project).resolve()
@@ -43,22 +189,27 @@ def main():
         raise SystemExit(f"Project dir {project_dir} not found")
 
     api_key = os.getenv("E2B_API_KEY")
+    name = args.name or project_dir.name
+    session = requests.Session()
     print("Creating sandbox ...")
-    resp = requests.post(f"{args.api}/api/sandbox/create", json={"apiKey": api_key})
-    if resp.status_code != 200:
-        raise SystemExit(f"Failed to create sandbox: {resp.text}")
-    meta = resp.json()
-    print("Sandbox URL:", meta.get("url"))
+    check(session.post(f"{args.api}/api/sandbox/init", json={"project": name, "apiKey": api_key}), "create sandbox")
 
-    files = gather_files(project_dir)
-    print(f"Uploading {len(files)} files ...")
-    batch = {"files": files}
-    resp = requests.post(f"{args.api}/api/sandbox/apply-code", json=batch)
-    if resp.status_code != 200:
-        raise SystemExit(f"Failed to upload files: {resp.text}")
-    result = resp.json()
+    # files first, so the dev server installs and serves this project's package.json
+    files, dirs = scan(project_dir)
+    hashes = {}
+    print(f"Comparing {len(files)} files ...")
+    result = sync(session, args.api, project_dir, files, hashes, complete=True, prune=args.prune)
     print("Sync complete:", json.dumps(result, indent=2))
 
+    print("Starting dev server ...")
+    meta = check(session.post(f"{args.api}/api/sandbox/start", json={"project": name}), "start dev server")
+    print("Sandbox URL:", meta.get("url"))
+    if args.watch:
+        try:
+            watch(session, args.api, project_dir, files, dirs, hashes, args.interval, args.debounce)
+        except KeyboardInterrupt:
+            pass
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,43 @@
+import os
+
+import pytest
+
+from backend.core.paths import InvalidPath
+from backend.sandbox_checkpoints import CheckpointStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CheckpointStore(tmp_path / "checkpoints", keep=5, max_age_s=0)
+
+
+@pytest.fixture
+def src(tmp_path):
+    root = tmp_path / "sandbox"
+    root.mkdir()
+    (root / "app.py").write_text("print('v1')\n")
+    return root
+
+
+def test_file_diff(store, src):
+    checkpoint = store.create("s", src)
+    os.replace(src / "app.py", src / "old.py")
+    (src / "app.py").write_text("print('v2')\n")
+    diff = store.file_diff("s", checkpoint["id"], src, "/app.py")
+    assert "-print('v1')" in diff and "+print('v2')" in diff
+
+
+@pytest.mark.parametrize("rel", ["../../../../etc/passwd", "src/../../outside.txt", "/"])
+def test_file_diff_rejects_paths_outside_the_sandbox(store, src, rel):
+    checkpoint = store.create("s", src)
+    (src.parent / "outside.txt").write_text("secret\n")
+    with pytest.raises(InvalidPath):
+        store.file_diff("s", checkpoint["id"], src, rel)
+
+
+def test_file_diff_rejects_symlinks_out_of_the_sandbox(store, src):
+    (src.parent / "outside.txt").write_text("secret\n")
+    os.symlink(src.parent / "outside.txt", src / "link.txt")
+    checkpoint = store.create("s", src)
+    with pytest.raises(InvalidPath):
+        store.file_diff("s", checkpoint["id"], src, "link.txt")